@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:26:53 2026
+
+Local HTTP service that renders Snow to Flow charts on request, backed by the
+same series cache used by stf_gen.py and stf_service.py.
+"""
+
+import json
+import threading
+import datetime
+from os import path
+from datetime import datetime as dt
+from urllib.parse import unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from stf_utils import create_awdb, index_by_triplet
+from stf_cache import SeriesCache, ChartCache, ClimoCache
+from stf_gen import print_and_log, create_log
+from stf_gen import get_frcsts, updtChart, get_chart_html, get_swe_meta
+from stf_gen import get_active_frcst_trips
+
+def get_data_date():
+    today = dt.utcnow() - datetime.timedelta(hours=8)
+    return today.date().isoformat()
+
+class ChartApi:
+    def __init__(self, series_cache, chart_cache, climo_cache=None, logger=None):
+        self.series_cache = series_cache
+        self.chart_cache = chart_cache
+        self.climo_cache = climo_cache
+        self.logger = logger
+        self.awdb = create_awdb()
+        self.lock = threading.Lock()
+        self.meta_date = None
+        self.load_metadata()
+
+    def load_metadata(self):
+        with self.lock:
+            data_date = get_data_date()
+            if self.meta_date == data_date:
+                return
+            print_and_log('Loading snotel and forecast point metadata.', self.logger)
+            self.swe_meta = get_swe_meta(
+                self.series_cache.cache_dir, logger=self.logger
+            ) or {}
+            all_frcsts = get_frcsts(huc='all', awdb=self.awdb, logger=self.logger)
+            self.frcsts = index_by_triplet(all_frcsts)
+            self.all_frcst_trips = get_active_frcst_trips(
+                all_frcsts, logger=self.logger
+            )
+            self.meta_date = data_date
+
+    def build_chart(self, frcst_triplet, data_date):
+        import plotly.graph_objs as go
+        site_name = self.frcsts[frcst_triplet]['name']
+        chart = {
+            'triplet': frcst_triplet,
+            'name': site_name,
+            'data_date': data_date,
+            'json': None,
+            'html': None,
+            'message': None
+        }
+        chart_data = updtChart(
+            frcstTriplet=frcst_triplet,
+            siteName=site_name,
+            swe_meta=self.swe_meta,
+            all_frcst_trips=self.all_frcst_trips,
+            awdb=self.awdb,
+            logger=self.logger,
+            cache=self.series_cache,
+            climo_cache=self.climo_cache
+        )
+        if type(chart_data) == str:
+            chart['message'] = chart_data
+            return chart
+        fig = go.Figure(chart_data)
+        chart['json'] = fig.to_json()
+        chart['html'] = get_chart_html(fig, site_name)
+        return chart
+
+    def get_chart(self, frcst_triplet):
+        self.load_metadata()
+        if not frcst_triplet in self.frcsts:
+            return None
+        data_date = get_data_date()
+        return self.chart_cache.get_or_compute(
+            f'{frcst_triplet}/{data_date}',
+            lambda: self.build_chart(frcst_triplet, data_date)
+        )
+
+    def get_sites(self):
+        self.load_metadata()
+        return [
+            {'triplet': k, 'name': v['name'], 'huc': str(v.get('huc', ''))[:8]}
+            for k, v in sorted(self.frcsts.items())
+        ]
+
+def get_handler(chart_api):
+    class ChartHandler(BaseHTTPRequestHandler):
+        def send_body(self, status, body, content_type='application/json'):
+            if isinstance(body, str):
+                body = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            req_path = unquote(self.path.split('?')[0]).rstrip('/')
+            if req_path in ['', '/sites']:
+                self.send_body(200, json.dumps(chart_api.get_sites()))
+                return
+            if not req_path.startswith('/chart/'):
+                self.send_error(404)
+                return
+            chart_id = req_path[len('/chart/'):]
+            out_format = 'html'
+            if chart_id.endswith('.json'):
+                out_format = 'json'
+            chart_id = chart_id.replace('.json', '').replace('.html', '')
+            frcst_triplet = chart_id.replace('_', ':')
+            try:
+                chart = chart_api.get_chart(frcst_triplet)
+            except Exception as err:
+                print_and_log(
+                    f'    Something went wrong creating {frcst_triplet} - {err}',
+                    chart_api.logger
+                )
+                self.send_body(500, json.dumps({'message': str(err)}))
+                return
+            if not chart:
+                self.send_body(
+                    404,
+                    json.dumps({'message': f'Unknown forecast point {frcst_triplet}'})
+                )
+            elif chart['message']:
+                self.send_body(404, json.dumps({'message': chart['message']}))
+            elif out_format == 'json':
+                self.send_body(200, chart['json'])
+            else:
+                self.send_body(200, chart['html'], 'text/html; charset=utf-8')
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChartHandler
+
+if __name__ == '__main__':
+
+    import argparse
+
+    cli_desc = 'Serves snow to flow chart html/json on request'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-p", "--port", help="Port to serve charts on, defaults to 8050", default=8050, type=int)
+    parser.add_argument("--host", help="Host to bind to, defaults to 127.0.0.1", default='127.0.0.1')
+    parser.add_argument("-t", "--ttl", help="Minutes a rendered chart or downloaded series stays valid, defaults to 60", default=60, type=float)
+    parser.add_argument("--cache-dir", help="Folder to persist cached series and charts to, defaults to data_store")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_api.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    logger = create_log(path.join(this_dir, 'stf_charts.log'))
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
+    chart_api = ChartApi(
+        SeriesCache(cache_dir=cache_dir, max_age=args.ttl * 60),
+        ChartCache(cache_dir=path.join(cache_dir, 'charts'), ttl=args.ttl * 60),
+        climo_cache=ClimoCache(path.join(cache_dir, 'climo')),
+        logger=logger
+    )
+    server = ThreadingHTTPServer((args.host, args.port), get_handler(chart_api))
+    print_and_log(
+        f'Serving snow to flow charts at http://{args.host}:{args.port}/chart/<triplet>.html',
+        logger
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 08:12:41 2026
+
+Resident (and optionally disk backed) caches for AWDB/sitedata time series,
+rendered charts and basin statistics.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from os import path, makedirs, replace, utime, listdir, remove
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+def get_cache_key(element, triplet):
+    return f'{element}/{triplet}'
+
+def split_cache_key(key):
+    element, triplet = key.split('/', 1)
+    return element, triplet
+
+def get_series_sig(data):
+    if not data:
+        return None
+    if not isinstance(data, dict):
+        return hashlib.md5(json.dumps(data, default=str).encode()).hexdigest()
+    values = data.get('values') or []
+    sig_str = json.dumps(
+        [data.get('beginDate'), data.get('endDate'), values], default=str
+    )
+    return hashlib.md5(sig_str.encode()).hexdigest()
+
+def compact_series(data):
+    import numpy as np
+    if not isinstance(data, dict) or not data.get('values'):
+        return data
+    data = dict(data)
+    data['values'] = np.array(data['values'], dtype=np.float32)
+    return data
+
+def expand_series(data):
+    import numpy as np
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    values = data.get('values')
+    if isinstance(values, np.ndarray):
+        values = np.round(values.astype(np.float64), 3)
+        expanded = values.astype(object)
+        expanded[np.isnan(values)] = None
+        data['values'] = expanded.tolist()
+    return data
+
+def get_entry_size(data):
+    values = data.get('values') if isinstance(data, dict) else None
+    if hasattr(values, 'nbytes'):
+        return values.nbytes + 512
+    return 8 * len(values or []) + 512
+
+class SeriesCache:
+    def __init__(self, cache_dir=None, max_age=None, compact=False, 
+                 max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.compact = compact
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.entries = OrderedDict()
+        self.dependents = {}
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        if cache_dir:
+            makedirs(cache_dir, exist_ok=True)
+
+    def get_cache_path(self, key):
+        element, triplet = split_cache_key(key)
+        return path.join(
+            self.cache_dir, element, f'{triplet.replace(":", "_")}.json'
+        )
+
+    def load(self, key):
+        if not self.cache_dir:
+            return None
+        cache_path = self.get_cache_path(key)
+        if not path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r') as j:
+                entry = json.load(j)
+            entry['fetched'] = max(entry['fetched'], path.getmtime(cache_path))
+        except (ValueError, OSError, KeyError, TypeError):
+            return None
+        entry['sig'] = get_series_sig(entry['data'])
+        if self.compact:
+            entry['data'] = compact_series(entry['data'])
+        return entry
+
+    def dump(self, key, entry):
+        if not self.cache_dir:
+            return
+        cache_path = self.get_cache_path(key)
+        makedirs(path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as j:
+            json.dump(
+                {
+                    'fetched': entry['fetched'], 
+                    'data': expand_series(entry['data']),
+                    'validators': entry.get('validators')
+                },
+                j,
+                default=str
+            )
+        replace(tmp_path, cache_path)
+
+    def touch(self, key):
+        with self.lock:
+            entry = self.get_entry(key)
+            if not entry:
+                return None
+            entry['fetched'] = time.time()
+        if self.cache_dir:
+            try:
+                utime(self.get_cache_path(key), (entry['fetched'],) * 2)
+            except OSError:
+                self.dump(key, entry)
+        return self.get_data(entry)
+
+    def get_validators(self, key):
+        entry = self.get_entry(key)
+        if not entry:
+            return None
+        return entry.get('validators')
+
+    def get_data(self, entry):
+        data = entry['data']
+        if self.compact:
+            return expand_series(data)
+        if isinstance(data, dict):
+            return dict(data)
+        return data
+
+    def get_entry(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+            else:
+                entry = self.load(key)
+                if entry:
+                    self.remember(key, entry)
+            return entry
+
+    def remember(self, key, entry):
+        with self.lock:
+            prev_entry = self.entries.pop(key, None)
+            if prev_entry:
+                self.resident_bytes -= prev_entry['size']
+            entry['size'] = get_entry_size(entry['data'])
+            self.entries[key] = entry
+            self.resident_bytes += entry['size']
+            if self.max_bytes is not None:
+                self.trim(self.max_bytes, keep=key)
+
+    def trim(self, max_bytes, keep=None):
+        if not self.cache_dir:
+            return
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if self.resident_bytes <= max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self.resident_bytes -= self.entries.pop(key)['size']
+
+    def age(self, key):
+        entry = self.get_entry(key)
+        if not entry:
+            return None
+        return time.time() - entry['fetched']
+
+    def sig(self, key):
+        entry = self.get_entry(key)
+        if not entry:
+            return None
+        return entry['sig']
+
+    def get(self, key, max_age=None):
+        self.track(key)
+        if max_age is None:
+            max_age = self.max_age
+        entry = self.get_entry(key)
+        if not entry:
+            return None
+        if max_age is not None and time.time() - entry['fetched'] > max_age:
+            return None
+        return self.get_data(entry)
+
+    def put(self, key, data, validators=None):
+        self.track(key)
+        sig = get_series_sig(data)
+        if isinstance(data, dict):
+            data = dict(data)
+        with self.lock:
+            prev_entry = self.get_entry(key)
+            changed = not prev_entry or not prev_entry['sig'] == sig
+            entry = {
+                'fetched': time.time(), 
+                'data': data, 
+                'sig': sig, 
+                'validators': validators
+            }
+        self.dump(key, entry)
+        if self.compact:
+            entry['data'] = compact_series(data)
+        self.remember(key, entry)
+        return changed
+
+    def invalidate(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry:
+                self.resident_bytes -= entry['size']
+
+    def keys(self):
+        with self.lock:
+            return list(self.entries.keys())
+
+    def stale_keys(self, max_age):
+        now = time.time()
+        with self.lock:
+            return [
+                k for k, v in self.entries.items()
+                if now - v['fetched'] > max_age
+            ]
+
+    @contextmanager
+    def tracking(self, consumer):
+        self.local.consumer = consumer
+        try:
+            yield self
+        finally:
+            self.local.consumer = None
+
+    def track(self, key):
+        consumer = getattr(self.local, 'consumer', None)
+        if consumer:
+            with self.lock:
+                self.dependents.setdefault(key, set()).add(consumer)
+
+    def get_dependents(self, keys):
+        with self.lock:
+            dependents = set()
+            for key in keys:
+                dependents.update(self.dependents.get(key, set()))
+            return dependents
+
+class ChartCache:
+    def __init__(self, cache_dir=None, ttl=3600, max_items=256):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        if cache_dir:
+            makedirs(cache_dir, exist_ok=True)
+
+    def get_cache_path(self, key):
+        safe_key = key.replace(':', '_').replace('/', '__')
+        return path.join(self.cache_dir, f'{safe_key}.json')
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+        if not entry and self.cache_dir:
+            cache_path = self.get_cache_path(key)
+            if path.exists(cache_path):
+                try:
+                    with open(cache_path, 'r') as j:
+                        entry = json.load(j)
+                except (ValueError, OSError):
+                    entry = None
+        if not entry or now - entry['created'] > self.ttl:
+            return None
+        self.remember(key, entry)
+        return entry['value']
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+
+    def put(self, key, value):
+        entry = {'created': time.time(), 'value': value}
+        self.remember(key, entry)
+        if self.cache_dir:
+            cache_path = self.get_cache_path(key)
+            tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as j:
+                json.dump(entry, j)
+            replace(tmp_path, cache_path)
+
+    def invalidate(self, prefix):
+        safe_prefix = prefix.replace(':', '_').replace('/', '__')
+        with self.lock:
+            for key in [i for i in self.entries if i.startswith(prefix)]:
+                self.entries.pop(key)
+        if self.cache_dir and path.isdir(self.cache_dir):
+            for filename in listdir(self.cache_dir):
+                if filename.startswith(safe_prefix):
+                    remove(path.join(self.cache_dir, filename))
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self.lock:
+            future = self.inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.inflight[key] = future
+        if not is_owner:
+            return future.result()
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as err:
+            future.set_exception(err)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+class BasinSweMemo:
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.computed = 0
+        self.shared = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.shared += 1
+                return self.entries[key]
+            future = self.inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.inflight[key] = future
+        if not is_owner:
+            value = future.result()
+            with self.lock:
+                self.shared += 1
+            return value
+        try:
+            value = compute()
+            with self.lock:
+                self.computed += 1
+                self.entries[key] = value
+                while len(self.entries) > self.max_items:
+                    self.entries.popitem(last=False)
+            future.set_result(value)
+            return value
+        except Exception as err:
+            future.set_exception(err)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def trim(self, max_items):
+        with self.lock:
+            while len(self.entries) > max_items:
+                self.entries.popitem(last=False)
+
+    def get_stats(self):
+        with self.lock:
+            return {'computed': self.computed, 'shared': self.shared}
+
+class ClimoCache:
+    def __init__(self, cache_dir=None, max_items=None):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        if cache_dir:
+            makedirs(cache_dir, exist_ok=True)
+
+    def get_cache_path(self, frcst_triplet):
+        return path.join(
+            self.cache_dir, f'{frcst_triplet.replace(":", "_")}.json'
+        )
+
+    def get_current_path(self, frcst_triplet):
+        return path.join(
+            self.cache_dir, 'current', f'{frcst_triplet.replace(":", "_")}.json'
+        )
+
+    def get_entry(self, frcst_triplet):
+        with self.lock:
+            entry = self.entries.get(frcst_triplet)
+        if not entry and self.cache_dir:
+            cache_path = self.get_cache_path(frcst_triplet)
+            if path.exists(cache_path):
+                try:
+                    with open(cache_path, 'r') as j:
+                        entry = json.load(j)
+                except (ValueError, OSError):
+                    entry = None
+        return entry
+
+    def get(self, frcst_triplet, key):
+        entry = self.get_entry(frcst_triplet)
+        if not entry or not entry['key'] == key:
+            return None
+        self.remember(frcst_triplet, entry)
+        return entry['climo']
+
+    def get_latest(self, frcst_triplet):
+        entry = self.get_entry(frcst_triplet)
+        if not entry:
+            return None
+        return entry['climo']
+
+    def remember(self, frcst_triplet, entry):
+        with self.lock:
+            self.entries[frcst_triplet] = entry
+            self.entries.move_to_end(frcst_triplet)
+            if self.max_items is not None and self.cache_dir:
+                self.trim(self.max_items)
+
+    def trim(self, max_items):
+        if not self.cache_dir:
+            return
+        with self.lock:
+            while len(self.entries) > max_items:
+                self.entries.popitem(last=False)
+
+    def remove(self, frcst_triplet):
+        with self.lock:
+            self.entries.pop(frcst_triplet, None)
+        if self.cache_dir:
+            for cache_path in [
+                self.get_cache_path(frcst_triplet), 
+                self.get_current_path(frcst_triplet)
+            ]:
+                if path.exists(cache_path):
+                    remove(cache_path)
+
+    def put(self, frcst_triplet, key, climo):
+        entry = {'key': key, 'created': time.time(), 'climo': climo}
+        self.remember(frcst_triplet, entry)
+        if self.cache_dir:
+            cache_path = self.get_cache_path(frcst_triplet)
+            tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as j:
+                json.dump(entry, j)
+            replace(tmp_path, cache_path)
+
+    def put_current(self, frcst_triplet, current):
+        if not self.cache_dir:
+            return
+        current_path = self.get_current_path(frcst_triplet)
+        makedirs(path.dirname(current_path), exist_ok=True)
+        tmp_path = f'{current_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as j:
+            json.dump(current, j)
+        replace(tmp_path, current_path)
+
+    def get_current(self, frcst_triplet):
+        if not self.cache_dir:
+            return None
+        current_path = self.get_current_path(frcst_triplet)
+        if not path.exists(current_path):
+            return None
+        try:
+            with open(current_path, 'r') as j:
+                return json.load(j)
+        except (ValueError, OSError):
+            return None
+
+    def get_current_triplets(self):
+        if not self.cache_dir:
+            return []
+        current_dir = path.join(self.cache_dir, 'current')
+        if not path.isdir(current_dir):
+            return []
+        return sorted([
+            path.splitext(i)[0].replace('_', ':') for i in listdir(current_dir)
+            if i.endswith('.json')
+        ])
+
+class IneligibleRegistry:
+    def __init__(self, registry_path=None, revalidate_days=7):
+        self.registry_path = registry_path
+        self.revalidate_days = revalidate_days
+        self.entries = {}
+        self.lock = threading.Lock()
+        if registry_path and path.exists(registry_path):
+            try:
+                with open(registry_path, 'r') as j:
+                    self.entries = json.load(j)
+            except (ValueError, OSError):
+                self.entries = {}
+
+    def get(self, frcst_triplet):
+        with self.lock:
+            entry = self.entries.get(frcst_triplet)
+        if not entry:
+            return None
+        age = time.time() - entry['checked']
+        if age > self.revalidate_days * 86400:
+            return None
+        return entry
+
+    def add(self, frcst_triplet, reason):
+        with self.lock:
+            entry = self.entries.get(frcst_triplet, {})
+            if not entry.get('reason') == reason:
+                entry['since'] = time.strftime('%Y-%m-%d')
+            entry.update({'reason': reason, 'checked': time.time()})
+            self.entries[frcst_triplet] = entry
+
+    def remove(self, frcst_triplet):
+        with self.lock:
+            self.entries.pop(frcst_triplet, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def save(self):
+        if not self.registry_path:
+            return
+        makedirs(path.dirname(path.abspath(self.registry_path)), exist_ok=True)
+        with self.lock:
+            entries = dict(self.entries)
+        tmp_path = f'{self.registry_path}.tmp'
+        with open(tmp_path, 'w') as j:
+            json.dump(entries, j, indent=1, sort_keys=True)
+        replace(tmp_path, self.registry_path)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:40:05 2026
+
+Basin SWE and flow climatology used by the Snow to Flow charts. Statistics
+from completed water years are cached per forecast point so only the current
+water year has to be recomputed each run, and basin SWE statistics can be
+shared by forecast points that use the same snotels.
+"""
+
+import json
+import hashlib
+import warnings
+import numpy as np
+
+BAND_NAMES = ['min', '10th', '30th', '50th', '70th', '90th', 'max']
+BAND_PERCENTILES = [10, 30, 50, 70, 90]
+
+def get_climo_key(frcst_triplet, water_year, s_year, swe_trips, flow_element,
+                  site_threshold, equation):
+    key_str = json.dumps(
+        [
+            frcst_triplet,
+            int(water_year),
+            int(s_year),
+            sorted(swe_trips),
+            flow_element,
+            site_threshold,
+            equation
+        ],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(key_str.encode()).hexdigest()
+
+def get_water_year(e_date):
+    if int(e_date.split('-')[1]) >= 10:
+        return int(e_date[:4]) + 1
+    return int(e_date[:4])
+
+def get_curr_start(num_days):
+    return 366 * ((num_days - 1) // 366)
+
+def pad_year(values):
+    values = list(values)
+    return values + [np.nan] * (366 - len(values))
+
+def get_stats_bands(years_data):
+    if len(years_data) < 2:
+        return None
+    stats_data = np.array(years_data, dtype=float)
+    stats_data[:, 151] = stats_data[:, 150]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        percentiles = np.nanpercentile(stats_data, BAND_PERCENTILES, axis=0)
+        bands = [np.nanmin(stats_data, axis=0)]
+        bands.extend(percentiles)
+        bands.append(np.nanmax(stats_data, axis=0))
+    return {k: v.tolist() for k, v in zip(BAND_NAMES, bands)}
+
+def get_basin_swe(swe_values):
+    swe_arr = np.array(swe_values, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        basin_swe = np.nanmean(swe_arr, axis=0)
+    daily_sites = np.sum(~np.isnan(swe_arr), axis=0)
+    return basin_swe, daily_sites
+
+def get_yearly_sites(daily_sites):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return [
+            int(np.nanmedian(daily_sites[i:i + 366]))
+            for i in range(0, len(daily_sites), 366)
+        ]
+
+def get_values_sig(values):
+    values = np.array(values or [], dtype=float)
+    return hashlib.md5(values.tobytes()).hexdigest()
+
+def get_swe_memo_key(swe_data, s_year, e_date):
+    return (
+        tuple(sorted([
+            (
+                str(i.get('stationTriplet')), 
+                str(i.get('beginDate')), 
+                str(i.get('endDate')), 
+                len(i.get('values') or []),
+                get_values_sig(i.get('values'))
+            ) 
+            for i in swe_data
+        ])),
+        int(s_year),
+        e_date
+    )
+
+def get_current_swe(swe_values):
+    curr_start = get_curr_start(len(swe_values[0]))
+    basin_swe, daily_sites = get_basin_swe(
+        [i[curr_start:] for i in swe_values]
+    )
+    return {
+        'swe': pad_year(basin_swe),
+        'daily_sites': daily_sites,
+        'sites': get_yearly_sites(daily_sites)[-1],
+        'num_years': curr_start // 366
+    }
+
+def get_current_year(swe_values, flow_values, curr_swe=None):
+    if not curr_swe:
+        curr_swe = get_current_swe(swe_values)
+    curr_start = curr_swe['num_years'] * 366
+    return {
+        'swe': curr_swe['swe'],
+        'q': pad_year(np.array(flow_values[curr_start:], dtype=float)),
+        'sites': curr_swe['sites'],
+        'num_years': curr_swe['num_years']
+    }
+
+def get_swe_climo(swe_values, s_year, curr_sites):
+    basin_swe, daily_sites = get_basin_swe(swe_values)
+    yearly_sites = get_yearly_sites(daily_sites)
+    por_swe = [basin_swe[i:i + 366] for i in range(0, len(basin_swe), 366)]
+    stats_data = [
+        por_swe[i] for i, x in enumerate(yearly_sites) if
+        int(x) > curr_sites * 0.5
+    ]
+    del stats_data[-1]
+    return {
+        'basin_swe': basin_swe.astype(np.float32),
+        'daily_sites': daily_sites.astype(np.int16),
+        'swe_bands': get_stats_bands(stats_data),
+        'swe_years': {
+            str(s_year + i + 1): x.tolist() for i, x in enumerate(por_swe[:-1])
+        },
+        'swe_sites': {
+            str(s_year + i + 1): x for i, x in enumerate(yearly_sites[:-1])
+        },
+    }
+
+def get_climo(swe_values, flow_values, s_year, curr_sites, swe_climo=None):
+    if not swe_climo:
+        swe_climo = get_swe_climo(swe_values, s_year, curr_sites)
+    flow_arr = np.array(flow_values, dtype=float)
+    por_q = [flow_arr[i:i + 366] for i in range(0, len(flow_arr), 366)]
+    del por_q[-1]
+    return {
+        's_year': s_year,
+        'swe_bands': swe_climo['swe_bands'],
+        'q_bands': get_stats_bands(por_q),
+        'swe_years': swe_climo['swe_years'],
+        'swe_sites': swe_climo['swe_sites'],
+        'q_years': {
+            str(s_year + i + 1): x.tolist() for i, x in enumerate(por_q)
+        },
+    }
+
+def get_basin_climo(frcst_triplet, swe_values, flow_values, s_year, e_date,
+                    swe_trips, flow_element, equation, climo_cache=None,
+                    swe_memo=None, swe_key=None):
+    curr_swe = None
+    if swe_memo and swe_key:
+        curr_swe = swe_memo.get_or_compute(
+            (swe_key, 'current'), lambda: get_current_swe(swe_values)
+        )
+    curr_year = get_current_year(swe_values, flow_values, curr_swe)
+    water_year = get_water_year(e_date)
+    climo_key = get_climo_key(
+        frcst_triplet,
+        water_year,
+        s_year,
+        swe_trips,
+        flow_element,
+        curr_year['sites'],
+        equation
+    )
+    climo = None
+    if climo_cache:
+        climo = climo_cache.get(frcst_triplet, climo_key)
+        if climo and not len(climo['swe_sites']) == curr_year['num_years']:
+            climo = None
+    if not climo:
+        swe_climo = None
+        if swe_memo and swe_key:
+            swe_climo = swe_memo.get_or_compute(
+                (swe_key, 'por', curr_year['sites']), 
+                lambda: get_swe_climo(swe_values, s_year, curr_year['sites'])
+            )
+        climo = get_climo(
+            swe_values, flow_values, s_year, curr_year['sites'], swe_climo
+        )
+        if climo_cache:
+            climo_cache.put(frcst_triplet, climo_key, climo)
+    if climo_cache:
+        climo_cache.put_current(frcst_triplet, {
+            'updated': e_date,
+            'water_year': water_year,
+            's_year': int(s_year),
+            'swe_trips': sorted(swe_trips),
+            'flow_element': flow_element,
+            'sites': curr_year['sites'],
+            'swe': [float(i) for i in curr_year['swe']],
+            'q': [float(i) for i in curr_year['q']]
+        })
+    climo = dict(climo)
+    climo['curr_year'] = str(water_year)
+    climo['curr_swe'] = curr_year['swe']
+    climo['curr_q'] = curr_year['q']
+    climo['curr_sites'] = curr_year['sites']
+    return climo
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 08:41:17 2026
+
+Dependency free constants, URL builders and small helpers shared by the snow
+to flow scripts. Only the standard library is imported here so light CLIs
+like stf_nav.py start without loading pandas, folium or zeep.
+"""
+
+import math
+from functools import lru_cache
+from datetime import datetime as dt
+
+STATIC_URL = 'https://www.usbr.gov/uc/water/hydrodata/assets'
+NRCS_DATA_URL = r'https://www.nrcs.usda.gov/Internet/WCIS/sitedata'
+AWDB_HOST = 'wcc.sc.egov.usda.gov'
+PLOTLY_CDN_URL = 'https://cdn.plot.ly'
+
+def get_awdb_wsdl():
+    return f'https://{AWDB_HOST}/awdbWebService/services?WSDL'
+
+def get_sitedata_url(element, triplet):
+    if element == 'WTEQ':
+        element = 'DAILY/WTEQ'
+    return f'{NRCS_DATA_URL}/{element}/{triplet.replace(":", "_")}.json'
+
+def get_metadata_url(element='WTEQ'):
+    return f'{NRCS_DATA_URL}/metadata/{element}/metadata.json'
+
+def get_huc_geojson_url(huc_level):
+    return f'{STATIC_URL}/gis/HUC{huc_level}.geojson'
+
+@lru_cache(maxsize=None)
+def parse_awdb_date(date_str, date_format="%Y-%m-%d %H:%M:%S"):
+    return dt.strptime(date_str, date_format).date()
+
+def isActive(x):
+    endDate = parse_awdb_date(x['endDate'])
+    if endDate > dt.today().date():
+        return True
+
+def index_by_triplet(meta):
+    return {x['stationTriplet']: x for x in meta}
+
+def ordinal(n):
+    return "%d%s" % (n,"tsnrhtdd"[(math.floor(n//10)%10!=1)*(n%10<4)*n%10::4])
+
+@lru_cache(maxsize=None)
+def get_plotly_js():
+    from plotly.offline import get_plotlyjs_version
+    return f'{PLOTLY_CDN_URL}/plotly-{get_plotlyjs_version()}.min.js'
+
+def get_favicon():
+    
+    return f'{STATIC_URL}/img/favicon.ico'
+
+def get_bootstrap():
+    
+    return {
+        'css': f'{STATIC_URL}/bootstrap/css/bootstrap.min.css',
+        'js': f'{STATIC_URL}/bootstrap/js/bootstrap.bundle.js',
+        'jquery': f'{STATIC_URL}/jquery.js',
+        'popper': f'{STATIC_URL}/popper.js',
+        'fa': f'{STATIC_URL}/font-awesome/css/font-awesome.min.css',
+    }
+
+def get_bor_seal(orient='default', grey=False):
+    
+    color = 'cmyk'
+    if grey:
+        color = 'grey'
+    seal_dict = {
+        'default': f'BofR-horiz-{color}.png',
+        'shield': 'BofR-shield-cmyk.png',
+        'vert': f'BofR-vert-{color}.png',
+        'horz': f'BofR-horiz-{color}.png'
+        }
+    return f'{STATIC_URL}/img/{seal_dict[orient]}'
+
+def get_default_js():
+    
+    bootstrap_dict = get_bootstrap()
+    return [
+        ('leaflet', 
+         f'{STATIC_URL}/leaflet/js/leaflet.js'),
+        ('jquery', 
+         bootstrap_dict['jquery']),
+        ('popper', 
+         bootstrap_dict['popper']),
+        ('bootstrap', 
+         bootstrap_dict['js']),
+        ('awesome_markers', 
+         f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome-markers.min.js'),
+    ]
+
+def get_default_css():
+    
+    bootstrap_dict = get_bootstrap()
+    return [
+        ('leaflet_css', 
+         f'{STATIC_URL}/leaflet/css/leaflet.css'),
+        ('bootstrap_css', 
+         bootstrap_dict['css']),
+        ('awesome_markers_font_css', 
+          bootstrap_dict['fa']),
+        ('awesome_markers_css', 
+        f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome-markers.css'),
+        ('awesome_rotate_css', 
+         f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome.rotate.css'),
+    ]
+
+def get_plot_config(img_filename):
+    return {
+        'modeBarButtonsToRemove': [
+            'sendDataToCloud',
+            'lasso2d',
+            'select2d'
+        ],
+        'showAxisDragHandles': True,
+        'showAxisRangeEntryBoxes': True,
+        'displaylogo': False,
+        'toImageButtonOptions': {
+            'filename': img_filename,
+            'width': 1200,
+            'height': 700
+        }
+    }
+
+def get_obj_type_name(obj_type='default'):
+    
+    obj_type_dict = {
+            'default': 'map-pin',
+            0: 'reservoir',
+            1: 'basin',
+            2: 'climate site (rain)',
+            3: 'confluence',
+            4: 'diversion',
+            5: 'hydro power plant',
+            6: 'reach',
+            7: 'reservoir',
+            8: 'climate site (snow)',
+            9: 'stream gage',
+            10: 'hydro plant unit',
+            11: 'canal',
+            12: 'acoustic velocity meter',
+            13: 'water quality site',
+            14: 'riverware data object',
+            300: 'bio eval. site',
+            305: 'agg. diversion site',
+            'SCAN': 'climate site (rain)',
+            'PRCP': 'climate site (rain)',
+            'BOR': 'reservoir',
+            'SNTL': 'climate site (snow)',
+            'SNOW': 'climate site (snow)',
+            'SNTLT': 'climate site (snow)',
+            'USGS': 'stream gage',
+            'MSNT': 'climate site (snow)',
+            'MPRC': 'climate site (rain)'
+        }
+    return obj_type_dict.get(obj_type, 'N/A')
+
+def get_icon_color(row, source='awdb'):
+    
+    if source.lower() == 'hdb':
+        obj_owner = 'BOR'
+        if not row.empty:
+            if row['site_metadata.scs_id']:
+                obj_owner = 'NRCS'
+            if row['site_metadata.usgs_id']:
+                obj_owner = 'USGS'
+    if source.lower() == 'awdb':
+        obj_owner = row
+    color_dict = {
+        'BOR': 'blue',
+        'NRCS': 'red',
+        'USGS': 'green',
+        'COOP': 'gray',
+        'SNOW': 'darkred',
+        'PRCP': 'lightred',
+        'SNTL': 'red',
+        'SNTLT': 'lightred',
+        'SCAN': 'lightred',
+        'MSNT': 'orange',
+        'MPRC': 'beige',
+        
+    }
+    icon_color = color_dict.get(obj_owner, 'black')
+    return icon_color
+
+def get_fa_icon(obj_type='default', source='hdb'):
+    
+    if source.lower() == 'hdb':
+        fa_dict = {
+            'default': 'map-pin',
+            0: 'tint',
+            1: 'sitemap',
+            2: 'umbrella',
+            3: 'arrow-down',
+            4: 'exchange',
+            5: 'plug',
+            6: 'arrows-v',
+            7: 'tint',
+            8: 'snowflake-o',
+            9: 'tachometer',
+            10: 'cogs',
+            11: 'arrows-h',
+            12: 'rss',
+            13: 'flask',
+            14: 'table',
+            300: 'info',
+            305: 'exchange'
+        }
+    if source.lower() == 'awdb':
+        fa_dict = {
+            'default': 'map-pin',
+            'SCAN': 'umbrella',
+            'PRCP': 'umbrella',
+            'BOR': 'tint',
+            'SNTL': 'snowflake-o',
+            'SNOW': 'snowflake-o',
+            'SNTLT': 'snowflake-o',
+            'USGS': 'tachometer',
+            'MSNT': 'snowflake-o',
+            'MPRC': 'umbrella'
+        }
+    fa_icon = fa_dict.get(obj_type, 'map-pin')
+    return fa_icon
+
+def get_log_scale_dd():
+    log_scale_dd = [
+        {
+            'active': 0,
+            'showactive': True,
+            'x': 1.1,
+            'y': -0.025,
+            'xanchor': 'left',
+            'yanchor': 'top',
+            'bgcolor': 'rgba(0,0,0,0)',
+            'type': 'buttons',
+            'direction': 'down',
+            'font': {
+                'size': 10
+            },
+            'buttons': [
+                {
+                    'label': 'Linear Scale',
+                    'method': 'relayout',
+                    'args': [
+                        'yaxis2', 
+                            {
+                                'type': 'linear', 'rangemode': 'nonnegative',
+                                'overlaying': 'y', 'side':'right', 
+                                'anchor':'free', 'position': 1,
+                                'title': 'Q (cfs)','tickformat': "f", 
+                                'tick0': 0
+                            }
+                    ]
+                },
+                {
+                    'label': 'Log Scale',
+                    'method': 'relayout',
+                    'args': [
+                        'yaxis2',
+                            {
+                                'type': 'log', 'rangemode': 'nonnegative',
+                                'overlaying': 'y', 'side':'right', 
+                                'anchor':'free', 'position': 1,
+                                'title': 'Q (cfs)','tickformat': "f", 
+                                'tick0': 1, 'dtick': 'D2'
+                            }
+                    ]
+                },
+            ]
+        }
+    ]
+    return log_scale_dd
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:14:52 2026
+
+Exports the basin SWE and flow statistics behind every Snow to Flow chart
+(percentile bands, yearly traces, current year and site counts) from the
+climatology cache to one columnar dataset partitioned by HUC. Each row is a
+366 day water year series, written as Parquet when pyarrow is installed and
+as memory mappable .npy columns otherwise.
+"""
+
+import json
+import time
+from os import path, makedirs, listdir, replace
+from shutil import rmtree
+import numpy as np
+from stf_cache import ClimoCache
+from stf_climo import BAND_NAMES
+
+EXPORT_FORMATS = ['parquet', 'npy']
+EXPORT_COLUMNS = [
+    'triplet', 'name', 'huc', 'flow_element', 'element', 'row_type',
+    'series', 'water_year', 'sites', 'values'
+]
+NUM_DAYS = 366
+
+def get_export_format(export_format=None):
+    if export_format:
+        return export_format
+    try:
+        import pyarrow
+        return 'parquet'
+    except ImportError:
+        return 'npy'
+
+def get_partition_name(huc, huc_level):
+    return f'huc{huc_level}={str(huc)[:int(huc_level)]}'
+
+def get_point_rows(frcst, climo, current):
+    rows = []
+    point = {
+        'triplet': frcst['stationTriplet'],
+        'name': frcst.get('name') or '',
+        'huc': str(frcst.get('huc') or ''),
+        'flow_element': current.get('flow_element') or '',
+    }
+
+    def add_row(element, row_type, series, values, water_year=0, sites=-1):
+        rows.append(dict(
+            point,
+            element=element,
+            row_type=row_type,
+            series=series,
+            water_year=water_year,
+            sites=sites,
+            values=values
+        ))
+
+    for element, bands in [('swe', climo['swe_bands']), ('q', climo['q_bands'])]:
+        for band in BAND_NAMES:
+            if bands:
+                add_row(element, 'band', band, bands[band])
+    swe_sites = climo['swe_sites']
+    for year, values in climo['swe_years'].items():
+        add_row('swe', 'year', year, values, int(year), swe_sites.get(year, -1))
+    for year, values in climo['q_years'].items():
+        add_row('q', 'year', year, values, int(year))
+    water_year = current['water_year']
+    add_row(
+        'swe', 'current', str(water_year), current['swe'], water_year,
+        current['sites']
+    )
+    add_row('q', 'current', str(water_year), current['q'], water_year)
+    return rows
+
+def get_columns(rows):
+    values = np.full((len(rows), NUM_DAYS), np.nan, dtype=np.float32)
+    for i, row in enumerate(rows):
+        row_values = np.array(row['values'][:NUM_DAYS], dtype=np.float32)
+        values[i, :len(row_values)] = row_values
+    columns = {
+        k: np.array([row[k] for row in rows]) for k in EXPORT_COLUMNS[:-1]
+    }
+    columns['water_year'] = columns['water_year'].astype(np.int16)
+    columns['sites'] = columns['sites'].astype(np.int16)
+    columns['values'] = values
+    return columns
+
+def write_parquet_partition(partition_dir, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrays = [pa.array(columns[k]) for k in EXPORT_COLUMNS[:-1]]
+    arrays.append(pa.FixedSizeListArray.from_arrays(
+        pa.array(columns['values'].ravel()), NUM_DAYS
+    ))
+    table = pa.Table.from_arrays(arrays, names=EXPORT_COLUMNS)
+    pq.write_table(
+        table, path.join(partition_dir, 'basin_stats.parquet'),
+        compression='zstd'
+    )
+
+def write_npy_partition(partition_dir, columns):
+    for column, values in columns.items():
+        np.save(path.join(partition_dir, f'{column}.npy'), values)
+
+def write_partition(out_dir, partition, columns, export_format):
+    partition_dir = path.join(out_dir, partition)
+    tmp_dir = f'{partition_dir}.tmp'
+    if path.isdir(tmp_dir):
+        rmtree(tmp_dir)
+    makedirs(tmp_dir)
+    if export_format == 'parquet':
+        write_parquet_partition(tmp_dir, columns)
+    else:
+        write_npy_partition(tmp_dir, columns)
+    if path.isdir(partition_dir):
+        rmtree(partition_dir)
+    replace(tmp_dir, partition_dir)
+
+def export_basin_stats(cache_dir, out_dir, frcsts, huc_level='4',
+                       export_format=None):
+    bt = time.time()
+    export_format = get_export_format(export_format)
+    climo_cache = ClimoCache(path.join(cache_dir, 'climo'))
+    frcsts = {i['stationTriplet']: i for i in frcsts}
+    partitions = {}
+    skipped = 0
+    for frcst_triplet in climo_cache.get_current_triplets():
+        frcst = frcsts.get(frcst_triplet)
+        climo = climo_cache.get_latest(frcst_triplet)
+        current = climo_cache.get_current(frcst_triplet)
+        if not frcst or not climo or not current:
+            skipped += 1
+            continue
+        partition = get_partition_name(frcst.get('huc') or '', huc_level)
+        partitions.setdefault(partition, []).append((frcst, climo, current))
+    if not partitions:
+        return f'No basin statistics found in {cache_dir}, run charts first.'
+    makedirs(out_dir, exist_ok=True)
+    manifest = {
+        'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'format': export_format,
+        'huc_level': str(huc_level),
+        'columns': EXPORT_COLUMNS,
+        'num_days': NUM_DAYS,
+        'first_day': '10-01',
+        'partitions': {}
+    }
+    for partition, points in sorted(partitions.items()):
+        rows = []
+        for frcst, climo, current in points:
+            rows.extend(get_point_rows(frcst, climo, current))
+        write_partition(out_dir, partition, get_columns(rows), export_format)
+        manifest['partitions'][partition] = {
+            'points': len(points), 'rows': len(rows)
+        }
+    for partition in listdir(out_dir):
+        partition_dir = path.join(out_dir, partition)
+        if (partition.startswith('huc') and path.isdir(partition_dir) and
+                not partition in manifest['partitions']):
+            rmtree(partition_dir)
+    manifest_path = path.join(out_dir, 'manifest.json')
+    with open(f'{manifest_path}.tmp', 'w') as j:
+        json.dump(manifest, j, indent=1)
+    replace(f'{manifest_path}.tmp', manifest_path)
+    num_points = sum([len(i) for i in partitions.values()])
+    skipped_str = f', {skipped} without metadata skipped' if skipped else ''
+    return (
+        f'Exported basin statistics for {num_points} forecast points in '
+        f'{len(partitions)} HUC{huc_level} partitions ({export_format}'
+        f'{skipped_str}) to {out_dir} in {round(time.time()-bt,2)} seconds.'
+    )
+
+def load_basin_stats(out_dir, partitions=None):
+    with open(path.join(out_dir, 'manifest.json'), 'r') as j:
+        manifest = json.load(j)
+    if partitions is None:
+        partitions = list(manifest['partitions'].keys())
+    if manifest['format'] == 'parquet':
+        import pyarrow.parquet as pq
+        return {
+            i: pq.read_table(
+                path.join(out_dir, i, 'basin_stats.parquet'), memory_map=True
+            )
+            for i in partitions
+        }
+    return {
+        i: {
+            k: np.load(path.join(out_dir, i, f'{k}.npy'), mmap_mode='r')
+            for k in manifest['columns']
+        }
+        for i in partitions
+    }
+
+if __name__ == '__main__':
+
+    import argparse
+    from stf_gen import get_frcsts
+
+    cli_desc = 'Exports basin SWE and flow statistics for all charts to a columnar dataset'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("--cache-dir", help="Data store folder with cached climatology, defaults to data_store")
+    parser.add_argument("-o", "--out", help="Folder to write the dataset to, defaults to data_store/basin_stats")
+    parser.add_argument("-l", "--huc-level", help="HUC level to partition by, defaults to 4", default='4', choices=['2', '4', '6', '8'])
+    parser.add_argument("-f", "--format", help="parquet (requires pyarrow) or npy, defaults to parquet when pyarrow is installed", choices=EXPORT_FORMATS)
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_export.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
+    print(export_basin_stats(
+        cache_dir,
+        args.out or path.join(cache_dir, 'basin_stats'),
+        get_frcsts(huc='all'),
+        huc_level=args.huc_level,
+        export_format=args.format
+    ))
@@ -7,31 +7,44 @@ Created on Fri Feb 16 07:40:44 2018
 
 import json
 import time
+import heapq
+import hashlib
+import threading
 import random
 import asyncio
 import logging
 import decimal
-import warnings
 import datetime
 from datetime import datetime as dt
 from datetime import date as date
-from os import path, makedirs
+from os import path, makedirs, remove, link, listdir, replace
+from shutil import copy2
 from itertools import chain
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import TimedRotatingFileHandler
 import numpy as np
 import pandas as pd
-import plotly.graph_objs as go
-import plotly.offline as py
-from requests import get as r_get
-from zeep.helpers import serialize_object as serialize
+from requests.exceptions import RequestException
+from stf_core import get_sitedata_url, get_metadata_url
 from stf_utils import padMissingData, get_plot_config, get_bor_seal
-from stf_utils import get_favicon, get_plotly_js, getSWEsites
+from stf_utils import get_favicon, get_plotly_js, getSWEsites, get_typed_array
+from stf_utils import FrcstIndex, index_by_triplet, parse_awdb_date
 from stf_utils import isActive, create_awdb, getUpstreamUSGS, get_log_scale_dd
-from stf_nav import create_nav
-from stf_site_map import create_map
+from stf_nav import create_nav, create_search_nav
+from stf_cache import get_cache_key, split_cache_key
+from stf_cache import SeriesCache, ClimoCache, IneligibleRegistry, BasinSweMemo
+from stf_cache import ChartCache
+from stf_climo import get_basin_climo, get_swe_memo_key
+from stf_http import UpstreamUnavailable, awdb_call, cached_get
+from stf_http import set_run_budget, get_breaker_status, get_http_stats
+from stf_http import set_offline, get_blocked_calls
+from stf_huc_stats import update_huc_stats, load_huc_stats
+from stf_mem import MemoryBudget, map_bounded, get_memory_report
+from stf_export import export_basin_stats
+from stf_summary import create_summary
 
-NRCS_DATA_URL = r'https://www.nrcs.usda.gov/Internet/WCIS/sitedata'
+DAY_MS = 86400000
 
 def create_log(path='stf_charts.log'):
     logger = logging.getLogger('stf_charts rotating log')
@@ -51,6 +64,19 @@ def print_and_log(log_str, logger=None):
     print(log_str)
     if logger:
         logger.info(log_str)
+
+AWDB_CLIENT = {}
+
+def serialize(obj):
+    from zeep.helpers import serialize_object
+    return serialize_object(obj)
+
+def get_awdb(awdb=None):
+    if awdb:
+        return awdb
+    if not AWDB_CLIENT.get('awdb'):
+        AWDB_CLIENT['awdb'] = create_awdb()
+    return AWDB_CLIENT['awdb']
                   
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -58,27 +84,46 @@ class DecimalEncoder(json.JSONEncoder):
             return str(obj)
         return json.JSONEncoder.default(self, obj)
 
-async def async_get_equations(frcsts_meta, workers=8, indent=None):
-    this_dir = path.dirname(path.abspath(__file__))
-    frcst_eq_dir = path.join(this_dir, 'frcst_eq')
+def updt_frcst_eq(frcst_meta, frcst_eq_dir, awdb=None, logger=None, 
+                  indent=None):
+    print_and_log(
+        f'    Updating {frcst_meta["name"]} equation.', 
+        logger
+    )
+    frcst_triplet = frcst_meta['stationTriplet']
+    frcst_filename = f'{frcst_triplet.replace(":", "_")}.frcst'
+    frcst_path = path.join(frcst_eq_dir, frcst_filename)
+    equation = serialize(awdb.getForecastEquations(frcst_triplet))
+    equation_str = json.dumps(equation, indent=indent, cls=DecimalEncoder)
+    equation = json.loads(equation_str)
+    prev_equation = None
+    if path.exists(frcst_path):
+        try:
+            with open(frcst_path, 'r') as j:
+                prev_equation = json.load(j)
+        except ValueError:
+            prev_equation = None
+    if prev_equation == equation:
+        return equation, False
+    with open(frcst_path, 'w') as j:
+        j.write(equation_str)
+    return equation, True
+
+async def async_get_equations(frcsts_meta, frcst_eq_dir, awdb=None, 
+                              logger=None, workers=8, indent=None):
     def get_frcst_eq(frcst_meta):
-        print_and_log(
-            f'    Updating {frcst_meta["name"]} equation.', 
-            logger
-        )
-        frcst_triplet = frcst_meta['stationTriplet']
-        frcst_filename = f'{frcst_triplet.replace(":", "_")}.frcst'
-        frcst_path = path.join(frcst_eq_dir, frcst_filename)
         try:
-            equation = serialize(awdb.getForecastEquations(frcst_triplet))
+            return updt_frcst_eq(
+                frcst_meta, frcst_eq_dir, awdb=awdb, logger=logger, 
+                indent=indent
+            )
         except Exception as err:            
             print_and_log(
-                f'    Could not get equation for {frcst_triplet} - {err}',
+                f'    Could not get equation for '
+                f'{frcst_meta["stationTriplet"]} - {err}',
                 logger
             )
-            return frcst_meta
-        with open(frcst_path, 'w') as j:
-            json.dump(equation, j, indent=indent, cls=DecimalEncoder)
+            return None
 
     with ThreadPoolExecutor(max_workers=workers) as executor:
         loop = asyncio.get_event_loop()
@@ -92,29 +137,130 @@ async def async_get_equations(frcsts_meta, workers=8, indent=None):
         ]
         
         result = await asyncio.gather(*futures)
-        return [i for i in result if i]
+        equations = {
+            i['stationTriplet']: j for i, j in zip(frcsts_meta, result) if j
+        }
+        failed = [i for i, j in zip(frcsts_meta, result) if not j]
+        return equations, failed
 
-def get_equations(frcsts_meta, logger=None, indent=None):
-    this_dir = path.dirname(path.abspath(__file__))
-    frcst_eq_dir = path.join(this_dir, 'frcst_eq')
+def get_equations(frcsts_meta, frcst_eq_dir, awdb=None, logger=None, 
+                  indent=None):
+    equations = {}
     for frcst_meta in frcsts_meta:
-        print_and_log(
-            f'    Updating {frcst_meta["name"]} equation.', 
-            logger
+        equations[frcst_meta['stationTriplet']] = updt_frcst_eq(
+            frcst_meta, frcst_eq_dir, awdb=awdb, logger=logger, indent=indent
         )
-        frcst_triplet = frcst_meta['stationTriplet']
-        frcst_filename = f'{frcst_triplet.replace(":", "_")}.frcst'
-        frcst_path = path.join(frcst_eq_dir, frcst_filename)
-        equation = serialize(awdb.getForecastEquations(frcst_triplet))
-        with open(frcst_path, 'w') as j:
-            json.dump(equation, j, indent=indent, cls=DecimalEncoder)
-            
-def updt_frcst_eqs(awdb=create_awdb(), logger=None, indent=None, workers=1):
+    return equations
+
+def get_upstream_dependents(frcst_triplets, equations):
+    downstream = {}
+    for frcst_triplet, equation in equations.items():
+        terms = [j['equationTerms'] for j in equation or []]
+        for upstream_trip in getUpstreamUSGS(terms):
+            downstream.setdefault(upstream_trip, set()).add(frcst_triplet)
+    dependents = set()
+    to_check = list(frcst_triplets)
+    while to_check:
+        for frcst_triplet in downstream.get(to_check.pop(), []):
+            if not frcst_triplet in dependents:
+                dependents.add(frcst_triplet)
+                to_check.append(frcst_triplet)
+    return dependents - set(frcst_triplets)
+
+def get_frcst_changes(prev_frcsts, frcsts, changed_eqs, equations):
+    prev_frcsts = index_by_triplet(prev_frcsts)
+    frcsts = index_by_triplet(frcsts)
+    added = sorted(set(frcsts) - set(prev_frcsts))
+    removed = sorted(set(prev_frcsts) - set(frcsts))
+    modified = {}
+    for frcst_triplet in sorted(set(frcsts) & set(prev_frcsts)):
+        reasons = []
+        if frcst_triplet in changed_eqs:
+            reasons.append('equation')
+        if not frcsts[frcst_triplet] == prev_frcsts[frcst_triplet]:
+            reasons.append('metadata')
+        if reasons:
+            modified[frcst_triplet] = reasons
+    changed = set(added) | set(removed) | set(modified)
+    dependents = sorted(get_upstream_dependents(changed, equations))
+    return {
+        'updated': dt.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'dependents': dependents,
+        'invalidate': sorted(changed | set(dependents))
+    }
+
+def print_frcst_changes(changes, logger=None):
+    print_and_log(
+        f'Forecast point changes: {len(changes["added"])} added, '
+        f'{len(changes["removed"])} removed, {len(changes["modified"])} '
+        f'modified, {len(changes["dependents"])} downstream dependents.',
+        logger
+    )
+    for frcst_triplet, reasons in changes['modified'].items():
+        print_and_log(f'  {frcst_triplet}: {", ".join(reasons)} changed', logger)
+
+def get_changes_path(cache_dir):
+    return path.join(cache_dir, 'frcst_changes.json')
+
+def load_frcst_changes(cache_dir):
+    changes_path = get_changes_path(cache_dir)
+    if not path.exists(changes_path):
+        return None
+    with open(changes_path, 'r') as j:
+        return json.load(j)
+
+def write_frcst_changes(cache_dir, changes):
+    makedirs(cache_dir, exist_ok=True)
+    changes_path = get_changes_path(cache_dir)
+    tmp_path = f'{changes_path}.tmp'
+    with open(tmp_path, 'w') as j:
+        json.dump(changes, j, indent=1)
+    replace(tmp_path, changes_path)
+    return changes_path
+
+def invalidate_frcst_changes(cache_dir, changes, logger=None):
+    invalidate = changes['invalidate']
+    registry = IneligibleRegistry(path.join(cache_dir, 'ineligible.json'))
+    climo_cache = ClimoCache(path.join(cache_dir, 'climo'))
+    chart_cache = ChartCache(path.join(cache_dir, 'charts'))
+    for frcst_triplet in invalidate:
+        registry.remove(frcst_triplet)
+        climo_cache.remove(frcst_triplet)
+        chart_cache.invalidate(f'{frcst_triplet}/')
+    registry.save()
+    if changes['removed']:
+        flow_winners_path = path.join(cache_dir, 'flow_elements.json')
+        timings_path = path.join(cache_dir, 'chart_timings.json')
+        load_flow_winners(flow_winners_path)
+        load_chart_timings(timings_path)
+        for frcst_triplet in changes['removed']:
+            FLOW_WINNERS.pop(frcst_triplet, None)
+            CHART_TIMINGS.pop(frcst_triplet, None)
+        save_flow_winners(flow_winners_path)
+        save_chart_timings(timings_path)
+    print_and_log(
+        f'Invalidated cached climatology, charts and ineligible entries for '
+        f'{len(invalidate)} forecast point(s).',
+        logger
+    )
+
+def updt_frcst_eqs(awdb=None, logger=None, indent=None, workers=1, 
+                   cache_dir=None):
+    awdb = get_awdb(awdb)
     this_dir = path.dirname(path.abspath(__file__))
     frcst_eq_dir = path.join(this_dir, 'frcst_eq')
     makedirs(frcst_eq_dir, exist_ok=True)
+    all_frcst_path = path.join(frcst_eq_dir, 'all_frcsts.json')
+    prev_frcsts = []
+    if path.exists(all_frcst_path):
+        with open(all_frcst_path, 'r') as j:
+            prev_frcsts = json.load(j)
     hucs = [10,11,12,13,14,15,16,17,18]
     all_frcsts = []
+    equations = {}
     print_and_log('Updating equations for all HUCs.', logger)
     for huc in hucs:
         print_and_log(f'  Updating equations for {huc} HUC.', logger)
@@ -122,6 +268,9 @@ def updt_frcst_eqs(awdb=create_awdb(), logger=None, indent=None, workers=1):
             awdb.getForecastPoints('*', '*', '*', '*', f'{huc}*', '*', True)
         )
         if not frcsts:
+            all_frcsts.extend(
+                [i for i in prev_frcsts if str(i['huc']).startswith(str(huc))]
+            )
             continue
         frcst_triplets = [x['stationTriplet'] for x in frcsts]
         frcsts_meta = serialize(
@@ -131,39 +280,77 @@ def updt_frcst_eqs(awdb=create_awdb(), logger=None, indent=None, workers=1):
         all_frcsts.extend(frcsts_meta)
         
         if workers > 1:
-            failed_soaps = []
             loop = asyncio.get_event_loop()
-            failed_soaps.extend(
-                loop.run_until_complete(
-                    async_get_equations(frcsts_meta, workers, indent)
+            huc_equations, failed_soaps = loop.run_until_complete(
+                async_get_equations(
+                    frcsts_meta, frcst_eq_dir, awdb, logger, workers, indent
                 )
             )
+            equations.update(huc_equations)
             if failed_soaps:
                 num_failed = len(failed_soaps)
                 print_and_log(
                     f'  Getting {num_failed} sites that failed during async routine',
                     logger
                 )
-                get_equations(failed_soaps, logger=logger, indent=indent)
+                equations.update(get_equations(
+                    failed_soaps, frcst_eq_dir, awdb=awdb, logger=logger, 
+                    indent=indent
+                ))
         else:
-            get_equations(frcsts_meta, logger=logger, indent=indent)
-        
-    all_frcst_path = path.join(frcst_eq_dir, 'all_frcsts.json')
-    with open(all_frcst_path, 'w') as j:
-        json.dump(all_frcsts, j, indent=indent, cls=DecimalEncoder)
+            equations.update(get_equations(
+                frcsts_meta, frcst_eq_dir, awdb=awdb, logger=logger, 
+                indent=indent
+            ))
+    
+    all_frcsts = json.loads(json.dumps(all_frcsts, cls=DecimalEncoder))
+    changed_eqs = [k for k, v in equations.items() if v[1]]
+    equations = {k: v[0] for k, v in equations.items()}
+    for frcst_meta in all_frcsts:
+        frcst_triplet = frcst_meta['stationTriplet']
+        if not frcst_triplet in equations:
+            equations[frcst_triplet] = get_frcst_eq(frcst_triplet, awdb=awdb)
+    changes = get_frcst_changes(prev_frcsts, all_frcsts, changed_eqs, equations)
+    for frcst_triplet in changes['removed']:
+        frcst_path = path.join(
+            frcst_eq_dir, f'{frcst_triplet.replace(":", "_")}.frcst'
+        )
+        if path.exists(frcst_path):
+            remove(frcst_path)
+    if not all_frcsts == prev_frcsts:
+        with open(all_frcst_path, 'w') as j:
+            json.dump(all_frcsts, j, indent=indent)
+    FRCST_INDEX.clear()
+    FRCST_EQS.clear()
+    FRCST_ELEMENTS.clear()
     print_and_log('\nSuccessfully updated equations for all HUCs.', logger)
+    print_frcst_changes(changes, logger)
+    if cache_dir:
+        print_and_log(
+            f'Change set written to {write_frcst_changes(cache_dir, changes)}',
+            logger
+        )
+        if changes['invalidate']:
+            invalidate_frcst_changes(cache_dir, changes, logger)
+    return changes
 
-def get_frcsts(huc='all', awdb=create_awdb(), logger=None):
-    try:
-        this_dir = path.dirname(path.abspath(__file__))
-        frcst_eq_dir = path.join(this_dir, 'frcst_eq')
-        all_frcst_path = path.join(frcst_eq_dir, 'all_frcsts.json')
+FRCST_INDEX = {}
+
+def get_frcst_index(logger=None):
+    this_dir = path.dirname(path.abspath(__file__))
+    frcst_eq_dir = path.join(this_dir, 'frcst_eq')
+    all_frcst_path = path.join(frcst_eq_dir, 'all_frcsts.json')
+    mtime = path.getmtime(all_frcst_path)
+    if not FRCST_INDEX.get('mtime') == mtime:
         with open(all_frcst_path, 'r') as j:
-           frcsts =  json.load(j)
-        if huc == 'all':
-            return frcsts
-        frcsts[:] = [i for i in frcsts if str(i['huc'])[:len(str(huc))] == huc]
-        return frcsts
+            frcsts = json.load(j)
+        FRCST_INDEX['index'] = FrcstIndex(frcsts)
+        FRCST_INDEX['mtime'] = mtime
+    return FRCST_INDEX['index']
+
+def get_frcsts(huc='all', awdb=None, logger=None):
+    try:
+        return get_frcst_index(logger=logger).by_huc(huc)
     except Exception as err:
         print_and_log(
             f'    Error using local file: {err}.\n'
@@ -172,11 +359,21 @@ def get_frcsts(huc='all', awdb=create_awdb(), logger=None):
         )
         if huc == 'all':
             huc = ''
-        return serialize(
-            awdb.getForecastPoints('*', '*', '*', '*', f'{huc}*', '*', True)
-        )
+        return serialize(get_awdb(awdb).getForecastPoints(
+            '*', '*', '*', '*', f'{huc}*', '*', True
+        ))
 
-def get_frcst_eq(frcst_triplet, awdb=create_awdb(), logger=None):
+def get_active_frcst_trips(frcsts=None, logger=None):
+    try:
+        return set(get_frcst_index(logger=logger).get_active_triplets())
+    except Exception:
+        return set([x['stationTriplet'] for x in frcsts or [] if isActive(x)])
+
+FRCST_EQS = {}
+
+def get_frcst_eq(frcst_triplet, awdb=None, logger=None):
+    if frcst_triplet in FRCST_EQS:
+        return FRCST_EQS[frcst_triplet]
     try:
         this_dir = path.dirname(path.abspath(__file__))
         frcst_eq_dir = path.join(this_dir, 'frcst_eq')
@@ -184,6 +381,7 @@ def get_frcst_eq(frcst_triplet, awdb=create_awdb(), logger=None):
         frcst_eq_path = path.join(frcst_eq_dir, frcst_filename)
         with open(frcst_eq_path, 'r') as j:
            frcst_eq =  json.load(j)
+        FRCST_EQS[frcst_triplet] = frcst_eq
         return frcst_eq
     except FileNotFoundError as err:
         print_and_log(
@@ -192,7 +390,9 @@ def get_frcst_eq(frcst_triplet, awdb=create_awdb(), logger=None):
             logger
         )
         try:
-            return serialize(awdb.getForecastEquations(frcst_triplet))
+            return serialize(
+                get_awdb(awdb).getForecastEquations(frcst_triplet)
+            )
         except Exception as err:
             print_and_log(
                 f'    Error using nrcs webservice: {err}', 
@@ -200,7 +400,8 @@ def get_frcst_eq(frcst_triplet, awdb=create_awdb(), logger=None):
             )
     return None
         
-def get_upstream_snotels(terms, swe_trips, frcst_triplets):
+def get_upstream_snotels(terms, swe_trips, frcst_triplets, awdb=None, 
+                         logger=None):
     upstream_trips = getUpstreamUSGS(terms)
     for trip in upstream_trips:
         if trip in frcst_triplets:
@@ -250,54 +451,260 @@ def get_site_list_link(meta):
         )
     return sites_link
 
-def get_swe_data_soap(swe_trips, sDate, eDate, awdb=create_awdb()):
-    swe_data = awdb.getData(
-        swe_trips,'WTEQ', 1, None, 'DAILY', False, sDate, eDate, True
-    )
-    return serialize(swe_data)
+SOAP_CHUNK_SIZE = 25
+
+def get_swe_data_soap(swe_trips, sDate, eDate, awdb=None, swe_meta=None, 
+                      chunk_size=SOAP_CHUNK_SIZE):
+    awdb = get_awdb(awdb)
+    begin_dates = {}
+    for swe_trip in swe_trips:
+        site_meta = (swe_meta or {}).get(swe_trip) or {}
+        if site_meta.get('beginDate'):
+            begin_dates[swe_trip] = max(str(site_meta['beginDate'])[:10], sDate)
+    swe_trips = sorted(swe_trips, key=lambda x: begin_dates.get(x, sDate))
+    swe_data = []
+    for i in range(0, len(swe_trips), chunk_size):
+        chunk_trips = swe_trips[i:i + chunk_size]
+        chunk_sDate = min([begin_dates.get(x, sDate) for x in chunk_trips])
+        swe_data.extend(serialize(awdb_call(
+            awdb, 'getData', chunk_trips,'WTEQ', 1, None, 'DAILY', False, 
+            chunk_sDate, eDate, True
+        )))
+    return swe_data
+
+FRCST_ELEMENTS = {}
 
-def get_frcst_element(frcstTriplet, awdb=create_awdb(), logger=None):
-    elements = serialize(awdb.getStationElements(frcstTriplet))
-    has_srdoo = False
+def get_frcst_element(frcstTriplet, awdb=None, logger=None):
+    if frcstTriplet in FRCST_ELEMENTS:
+        return FRCST_ELEMENTS[frcstTriplet]
+    try:
+        elements = serialize(
+            awdb_call(get_awdb(awdb), 'getStationElements', frcstTriplet)
+        )
+    except (UpstreamUnavailable, RequestException) as err:
+        flow_element = FLOW_WINNERS.get(frcstTriplet, 'SRDOX')
+        print_and_log(
+            f'    Could not get elements for {frcstTriplet}, trying '
+            f'{flow_element} - {err}',
+            logger
+        )
+        return flow_element
+    flow_element = None
     for element in elements:
         if element['elementCd'].upper() == 'SRDOX':
             if element['duration'] == 'DAILY':
-                return 'SRDOX'
+                flow_element = 'SRDOX'
+                break
         if element['elementCd'].upper() == 'SRDOO':
             if element['duration'] == 'DAILY':
-                has_srdoo = True
-    if has_srdoo:
-        return 'SRDOO'
-    return None
+                flow_element = 'SRDOO'
+    FRCST_ELEMENTS[frcstTriplet] = flow_element
+    return flow_element
 
-def get_swe_data(swe_trips, sDate, eDate, awdb=create_awdb()):
+def get_swe_data(swe_trips, sDate, eDate, awdb=None, cache=None, 
+                 swe_meta=None):
     swe_data = []
+    missing_trips = []
     for swe_trip in swe_trips:
-        swe_trip_url = swe_trip.replace(":", "_")
-        swe_url = f'{NRCS_DATA_URL}/DAILY/WTEQ/{swe_trip_url}.json'
-        swe_results = r_get(swe_url)
-        if swe_results.status_code == 200:
-            swe_data.append(swe_results.json())
+        cache_key = get_cache_key('WTEQ', swe_trip)
+        if cache:
+            cached_data = cache.get(cache_key)
+            if cached_data:
+                swe_data.append(cached_data)
+                continue
+        swe_url = get_sitedata_url('WTEQ', swe_trip)
+        try:
+            site_data = cached_get(swe_url, cache_key, cache)
+        except (UpstreamUnavailable, RequestException):
+            site_data = None
+        if site_data:
+            swe_data.append(site_data)
         else:
-            return get_swe_data_soap(swe_trips, sDate, eDate, awdb)
+            missing_trips.append(swe_trip)
+    if missing_trips:
+        try:
+            soap_data = get_swe_data_soap(
+                missing_trips, sDate[:10], eDate, awdb, swe_meta=swe_meta
+            )
+        except (UpstreamUnavailable, RequestException):
+            if not cache:
+                raise
+            soap_data = [
+                cache.get(get_cache_key('WTEQ', i), max_age=float('inf'))
+                for i in missing_trips
+            ]
+            if not all(soap_data):
+                raise
+        for site_data in soap_data:
+            if not site_data:
+                continue
+            swe_data.append(site_data)
+            if cache and site_data.get('stationTriplet'):
+                cache.put(
+                    get_cache_key('WTEQ', site_data['stationTriplet']), 
+                    site_data
+                )
     return swe_data
 
-def get_flow_data(triplet, sDate, eDate, element):
+def get_flow_data(triplet, sDate, eDate, element, awdb=None, cache=None):
+    cache_key = get_cache_key(element, triplet)
+    if cache:
+        cached_data = cache.get(cache_key)
+        if cached_data:
+            return cached_data
+    flowData = None
     if element in ['SRDOO', 'SRDOX']:
-        flow_url = f'{NRCS_DATA_URL}/{element}/{triplet.replace(":", "_")}.json'
-        flow_results = r_get(flow_url)
-        if flow_results.status_code == 200:
-            flowData = flow_results.json()
-            return flowData
-    flowData = serialize(awdb.getData(
-        triplet, element, 1, None, 'DAILY', False, sDate, eDate, 
-        True)
-    )
-    return flowData[0]
+        flow_url = get_sitedata_url(element, triplet)
+        try:
+            flowData = cached_get(
+                flow_url, 
+                cache_key, 
+                cache, 
+                is_valid=lambda x: bool(x.get('values'))
+            )
+        except (UpstreamUnavailable, RequestException):
+            pass
+    if not flowData:
+        try:
+            flowData = serialize(awdb_call(
+                get_awdb(awdb), 'getData', triplet, element, 1, None, 'DAILY', False, 
+                sDate, eDate, True
+            ))[0]
+        except (UpstreamUnavailable, RequestException):
+            stale_data = None
+            if cache:
+                stale_data = cache.get(cache_key, max_age=float('inf'))
+            if not stale_data:
+                raise
+            return stale_data
+        if cache and flowData and flowData.get('values'):
+            cache.put(cache_key, flowData)
+    return flowData
+
+def load_frcst_elements(elements_path):
+    if path.exists(elements_path):
+        with open(elements_path, 'r') as j:
+            FRCST_ELEMENTS.update(json.load(j))
+
+def save_frcst_elements(elements_path):
+    makedirs(path.dirname(path.abspath(elements_path)), exist_ok=True)
+    with open(elements_path, 'w') as j:
+        json.dump(FRCST_ELEMENTS, j, indent=1, sort_keys=True)
+
+def get_swe_meta(cache_dir, offline=False, logger=None):
+    meta_cache = SeriesCache(cache_dir=cache_dir)
+    meta_key = get_cache_key('metadata', 'WTEQ')
+    if not offline:
+        try:
+            swe_meta = cached_get(get_metadata_url('WTEQ'), meta_key, meta_cache)
+            if swe_meta:
+                return index_by_triplet(swe_meta)
+        except (UpstreamUnavailable, RequestException, ValueError) as err:
+            print_and_log(
+                f'Could not download snotel metadata, using saved copy - {err}',
+                logger
+            )
+    swe_meta = meta_cache.get(meta_key, max_age=float('inf'))
+    if not swe_meta:
+        return None
+    return index_by_triplet(swe_meta)
+
+FLOW_WINNERS = {}
+
+def load_flow_winners(winners_path):
+    if path.exists(winners_path):
+        with open(winners_path, 'r') as j:
+            FLOW_WINNERS.update(json.load(j))
+
+def save_flow_winners(winners_path):
+    makedirs(path.dirname(path.abspath(winners_path)), exist_ok=True)
+    with open(winners_path, 'w') as j:
+        json.dump(FLOW_WINNERS, j, indent=1, sort_keys=True)
+
+FLOW_FETCH_WORKERS = 4
+FLOW_EXECUTOR = {}
+FLOW_EXECUTOR_LOCK = threading.Lock()
+
+def get_flow_executor():
+    with FLOW_EXECUTOR_LOCK:
+        if not FLOW_EXECUTOR.get('executor'):
+            FLOW_EXECUTOR['executor'] = ThreadPoolExecutor(
+                max_workers=FLOW_FETCH_WORKERS, 
+                thread_name_prefix='flow'
+            )
+        return FLOW_EXECUTOR['executor']
+
+def get_best_flow_data(triplet, sDate, eDate, flow_element, awdb=None, 
+                       cache=None):
+    winner = FLOW_WINNERS.get(triplet)
+    candidates = [winner, flow_element, 'SRDOX', 'SRDOO']
+    candidates = [i for i in dict.fromkeys(candidates) if i]
+    if cache and not winner:
+        for element in candidates:
+            cached_data = cache.get(get_cache_key(element, triplet))
+            if cached_data and cached_data.get('values'):
+                FLOW_WINNERS[triplet] = element
+                return cached_data
+    if winner:
+        try:
+            flowData = get_flow_data(
+                triplet, sDate, eDate, winner, awdb=awdb, cache=cache
+            )
+            if flowData and flowData['values']:
+                return flowData
+        except Exception:
+            pass
+        candidates.remove(winner)
+    found = threading.Event()
+
+    def get_candidate(element):
+        if found.is_set():
+            return None
+        return get_flow_data(
+            triplet, sDate, eDate, element, awdb=awdb, cache=cache
+        )
+
+    executor = get_flow_executor()
+    futures = [executor.submit(get_candidate, i) for i in candidates]
+    flowData = None
+    flow_err = None
+    try:
+        for element, future in zip(candidates, futures):
+            try:
+                result = future.result()
+            except Exception as err:
+                flow_err = err
+                continue
+            if result and result['values']:
+                flowData = result
+                FLOW_WINNERS[triplet] = element
+                if cache:
+                    cache.track(get_cache_key(element, triplet))
+                break
+    finally:
+        found.set()
+        for future in futures:
+            future.cancel()
+    if not flowData and flow_err:
+        raise flow_err
+    return flowData
+
+def fetch_series(cache_key, awdb=None, cache=None):
+    element, triplet = split_cache_key(cache_key)
+    today = dt.utcnow() - datetime.timedelta(hours=8)
+    sDate = date(1900, 10, 1).strftime("%Y-%m-%d")
+    eDate = today.date().strftime("%Y-%m-%d 00:00:00")
+    if element == 'WTEQ':
+        swe_data = get_swe_data([triplet], sDate, eDate, awdb=awdb, cache=cache)
+        return swe_data[0] if swe_data else None
+    return get_flow_data(triplet, sDate, eDate, element, awdb=awdb, cache=cache)
             
         
+SWE_MEMO = BasinSweMemo()
+
 def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
-              awdb=create_awdb(), logger=None):
+              awdb=None, logger=None, cache=None, climo_cache=None):
+    import plotly.graph_objs as go
     print_and_log(f'  Creating Snow to Flow Chart for {siteName}', logger)
     today = dt.utcnow() - datetime.timedelta(hours=8)
     sDate = date(1900, 10, 1).strftime("%Y-%m-%d")
@@ -313,18 +720,24 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
         return f'No valid flow element exists for {siteName} - {frcstTriplet}.'
     terms = [j['equationTerms'] for j in equation]
     swe_trips = getSWEsites(terms)
-    swe_trips = get_upstream_snotels(terms, swe_trips, all_frcst_trips)
+    swe_trips = get_upstream_snotels(
+        terms, swe_trips, all_frcst_trips, awdb=awdb, logger=logger
+    )
     if not swe_trips:
         return (
             f'No snotels used in the forecast equation for '
             f'{siteName} - {frcstTriplet}.'
         )
 
-    meta = [x for x in swe_meta if x['stationTriplet'] in swe_trips] 
+    if not isinstance(swe_meta, dict):
+        swe_meta = index_by_triplet(swe_meta)
+    meta = [swe_meta[x] for x in sorted(swe_trips) if x in swe_meta]
     
     sites_link = get_site_list_link(meta)
     # site_anno = get_site_anno(meta)
-    sweData = get_swe_data(swe_trips, sDate, eDate, awdb)
+    sweData = get_swe_data(
+        swe_trips, sDate, eDate, awdb, cache=cache, swe_meta=swe_meta
+    )
     sweData[:] = [x for x in sweData if x]
     if not sweData:
         return (
@@ -332,16 +745,14 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
             f'{siteName} - {frcstTriplet}.'
         )
     
-    flowData = get_flow_data(frcstTriplet, sDate, eDate, flow_element)
-    if not flowData['values']:
-        flowData = get_flow_data(frcstTriplet, sDate, eDate, 'SRDOX')
-        if not flowData['values']:
-            flowData = get_flow_data(frcstTriplet, sDate, eDate, 'SRDOO')
-            if not flowData['values']:
-                return (
-                    f'No flow data available for '
-                    f'{siteName} - {frcstTriplet} - {flow_element}.'
-                )
+    flowData = get_best_flow_data(
+        frcstTriplet, sDate, eDate, flow_element, awdb=awdb, cache=cache
+    )
+    if not flowData:
+        return (
+            f'No flow data available for '
+            f'{siteName} - {frcstTriplet} - {flow_element}.'
+        )
     
     date_series = [date(2015,10,1) + datetime.timedelta(days=x)
                     for x in range(0, 366)]
@@ -349,10 +760,7 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     beginDateDict = {}
     for siteMeta in meta:
         if siteMeta['beginDate']:
-            beginDate = dt.strptime(
-                str(siteMeta['beginDate']),
-                "%Y-%m-%d %H:%M:%S"
-            )
+            beginDate = parse_awdb_date(str(siteMeta['beginDate']))
             beginDateDict.update({str(siteMeta['stationTriplet']): beginDate}) 
     
     basinBeginDate = min(beginDateDict.values())
@@ -369,135 +777,61 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     
     sDate = date(sYear, 10, 1).strftime("%Y-%m-%d")             
     eDate = today.date().strftime("%Y-%m-%d")
+    swe_key = get_swe_memo_key(sweData, sYear, eDate)
 
     for dataSite in sweData:
         if dataSite:
             dataSite = padMissingData(dataSite, sDate, eDate)
+    flowData = padMissingData(flowData, sDate, eDate)
     
-            
-    plotData = [np.array(x['values'], dtype=float) for x in sweData if x]
-    
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", category=RuntimeWarning)
-        basinPlotData = list(np.nanmean(
-                np.array([i for i in plotData]), axis=0))
-        nonNan = [[0 if np.isnan(x) else 1 for x in i] for i in plotData]
-        nonNanSum = [np.nansum(i) for i in zip(*nonNan)]
-        dailySitesNum = list([nonNanSum[i:i+366] 
-            for i in range(0,len(nonNanSum),366)])
-        yearlySitesNum = {
-            str(sYear + idx + 1): int(np.nanmedian(i)) for 
-            idx, i in enumerate(dailySitesNum)
-        }
-    lastYearOfData = str(np.max([int(i) for i in yearlySitesNum.keys()]))
-    currNumBasinSites = yearlySitesNum[str(lastYearOfData)]
-    PORplotData = list([basinPlotData[i:i+366] 
-                    for i in range(0,len(basinPlotData),366)])
-
-    allButCurrWY = list(PORplotData)
-    del allButCurrWY[-1]
-    
-    statsData = [
-        PORplotData[i] for i, x in enumerate(yearlySitesNum.values()) if 
-        int(x) > currNumBasinSites * 0.5
-    ]
-    del statsData[-1]
-    statsData = list(map(list,zip(*statsData)))
-    
-    if len(statsData[0]) > 1:
-        statsData[151] = statsData[150]
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-            minData = [np.nanmin(a) for a in statsData]
-            maxData = [np.nanmax(a) for a in statsData]
-            lowestData = [np.nanpercentile(a,10) for a in statsData]
-            highestData = [np.nanpercentile(a,90) for a in statsData]
-            medianData = [np.nanpercentile(a,50) for a in statsData]
-            lowData = [np.nanpercentile(a,30) for a in statsData]
-            highData = [np.nanpercentile(a,70) for a in statsData]
-        sliderDates = list(chain([(date_series[0])] + 
-                                      [date_series[-1]]))
-    else:
-        sliderDates = list(chain([(date_series[0])] + [date_series[-1]]))
-    
-    dfSWE ={
-        'min': minData,
-        '10th': lowestData,
-        '30th': lowData,
-        '50th': medianData,
-        '70th': highData,
-        '90th': highestData,
-        'max': maxData
-    }
-    
-    for i, eachYear in enumerate(allButCurrWY):
-        dfSWE[str(sYear + i + 1)] = eachYear
-
-    PORplotData[-1].extend([np.nan]*(366-len(PORplotData[-1])))
-    if int(eDate.split('-')[1]) >= 10:
-      dfSWE[str(int(eDate[:4]) + 1)] = PORplotData[-1]
-    else:
-      dfSWE[str(eDate[:4])] = PORplotData[-1]
+    climo = get_basin_climo(
+        frcstTriplet,
+        [x['values'] for x in sweData if x],
+        flowData['values'],
+        sYear,
+        eDate,
+        swe_trips,
+        flow_element,
+        equation,
+        climo_cache=climo_cache,
+        swe_memo=SWE_MEMO,
+        swe_key=swe_key
+    )
+    if not climo['swe_bands']:
+        return (
+            f'Not enough years of snotel data to compute statistics for '
+            f'{siteName} - {frcstTriplet}.'
+        )
+    sliderDates = list(chain([(date_series[0])] + [date_series[-1]]))
+    lastYearOfData = climo['curr_year']
+    currNumBasinSites = climo['curr_sites']
+    yearlySitesNum = dict(climo['swe_sites'])
+    yearlySitesNum[lastYearOfData] = currNumBasinSites
     
+    dfSWE = dict(climo['swe_bands'])
+    dfSWE.update(climo['swe_years'])
+    dfSWE[lastYearOfData] = climo['curr_swe']
     dfSWE = pd.DataFrame(dfSWE)
     if dfSWE.empty:
         return (
             f'No snotel data available in forecast equation for '
             f'{siteName} - {frcstTriplet}.'
         )
-    jDay = dfSWE[str(eDate[:4])].last_valid_index()
-    jDayData = dfSWE.iloc[jDay]
-    dropCols = [i for i in dfSWE.columns.tolist() if not i.isdigit()]
-    jDayData.drop(dropCols,inplace=True)
-    jDayData.sort_values(inplace=True)
-    maxData = dfSWE.max(axis=0)
-    maxData.drop(dropCols,inplace=True)
-    maxData.sort_values(inplace=True)
-    
-    flowData = padMissingData(flowData, sDate, eDate)
-    
-    plotData = np.array(flowData['values'], dtype=float)
-    
-    PORplotData = list([plotData[i:i+366] 
-                    for i in range(0,len(plotData),366)])
-    PORplotData[:] = [list(x) for x in PORplotData]
-
-    allButCurrWY = list(PORplotData)
-    del allButCurrWY[-1]
-    statsData = list(map(list,zip(*allButCurrWY)))
-    
-    if len(statsData[0]) > 1:
-        statsData[151] = statsData[150]
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-            minData = [np.nanmin(a) for a in statsData]
-            maxData = [np.nanmax(a) for a in statsData]
-            lowestData = [np.nanpercentile(a,10) for a in statsData]
-            highestData = [np.nanpercentile(a,90) for a in statsData]
-            medianData = [np.nanpercentile(a,50) for a in statsData]
-            lowData = [np.nanpercentile(a,30) for a in statsData]
-            highData = [np.nanpercentile(a,70) for a in statsData]
-   
-    dfQ ={
-        'min': minData,
-        '10th': lowestData,
-        '30th': lowData,
-        '50th': medianData,
-        '70th': highData,
-        '90th': highestData,
-        'max': maxData
-    }
     
-    for i, eachYear in enumerate(allButCurrWY):
-        if str(sYear + i + 1) in dfSWE.columns:
-            dfQ[str(sYear + i + 1)] = eachYear
-    
-    PORplotData[-1].extend([np.nan]*(366-len(PORplotData[-1])))
-    if int(eDate.split('-')[1]) >= 10:
-      dfQ[str(int(eDate[:4]) + 1)] = PORplotData[-1]
-    else:
-      dfQ[str(eDate[:4])] = PORplotData[-1]
+    q_bands = climo['q_bands']
+    if not q_bands:
+        q_bands = {k: [np.nan] * 366 for k in climo['swe_bands'].keys()}
+    dfQ = dict(q_bands)
+    dfQ.update(
+        {k: v for k, v in climo['q_years'].items() if k in dfSWE.columns}
+    )
+    dfQ[lastYearOfData] = climo['curr_q']
     dfQ = pd.DataFrame(dfQ)
+    x0 = date_series[0]
+    swe_y = {k: get_typed_array(v) for k, v in dfSWE.items()}
+    q_y = {k: get_typed_array(v) for k, v in dfQ.items()}
+    swe_range_max = np.max(dfSWE['max']*2)
+    del sweData, flowData, climo, q_bands, dfSWE, dfQ
     
     
     colScheme = [
@@ -513,7 +847,7 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
         'rgb(88,28,89)'
     ]
     trace = []
-    for idx, i in enumerate(dfSWE):
+    for idx, i in enumerate(swe_y):
         if i.isdigit() and yearlySitesNum[i]:
             not_used = ''
             if int(yearlySitesNum[i]) < 0.5 * currNumBasinSites:
@@ -529,13 +863,13 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
             trace.extend(
                 [
                     go.Scatter(
-                        x=date_series,y=dfSWE[i], showlegend=True,
+                        x0=x0, dx=DAY_MS, y=swe_y[i], showlegend=True,
                         name=legend_name, legendgroup=str(i), hovertext='in. SWE',
                         visible=visible, connectgaps=True,
                         line=dict(color=color)
                     ),
                     go.Scatter(
-                        x=date_series, y=dfQ[i], yaxis='y2', 
+                        x0=x0, dx=DAY_MS, y=q_y[i], yaxis='y2', 
                         name=legend_name, legendgroup=str(i), hovertext='cfs',
                         visible=visible, connectgaps=True, showlegend=False,
                         line=dict(color=color, dash='dash')
@@ -546,14 +880,14 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series,y=dfSWE['min'],
+                x0=x0, dx=DAY_MS, y=swe_y['min'],
                     legendgroup='SWEcentiles', name=r'Min',
                     visible=True, line=dict(width=0),connectgaps=True,
                     fillcolor='rgba(237,0,1,0.15)', hoverinfo='none',
                     fill='none', showlegend=False
                 ),
             go.Scatter(
-                x=date_series, y=dfQ['min'], yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['min'], yaxis='y2',
                 legendgroup='Qcentiles', name=r'Min',hoverinfo='none',
                 visible=True, connectgaps=True,fill='none',showlegend=False,
                 line=dict(width=2, color='rgba(100,100,100,0.25)', dash='dash'),
@@ -564,13 +898,13 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series, y=dfSWE['10th'], line=dict(width=0),
+                x0=x0, dx=DAY_MS, y=swe_y['10th'], line=dict(width=0),
                 legendgroup='SWEcentiles', name=r'10%', visible=True,
                 fillcolor='rgba(237,0,1,0.15)',  connectgaps=True,
                 fill='tonexty', showlegend=False, hoverinfo='none'
             ),
             go.Scatter(
-                x=date_series, y=dfQ['10th'], yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['10th'], yaxis='y2',
                 legendgroup='Qcentiles', name=r'10%',
                 visible=True, line=dict(width=0), connectgaps=True,
                 fillcolor='rgba(100,100,100,0.25)',
@@ -582,14 +916,14 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series, y=dfSWE['30th'],
+                x0=x0, dx=DAY_MS, y=swe_y['30th'],
                 legendgroup='SWEcentiles', name=r'30%', visible=True,
                 line=dict(width=0), connectgaps=True,
                 fillcolor='rgba(237,237,0,0.15)',
                 fill='tonexty', showlegend=False, hoverinfo='none'
             ),
             go.Scatter(
-                x=date_series, y=dfQ['30th'], yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['30th'], yaxis='y2',
                     legendgroup='Qcentiles', name=r'30%', visible=True,
                     line=dict(width=0), connectgaps=True,
                     fillcolor='rgba(175,175,175,0.25)',
@@ -601,13 +935,13 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series,y=dfSWE['70th'], connectgaps=True,
+                x0=x0, dx=DAY_MS, y=swe_y['70th'], connectgaps=True,
                 legendgroup='SWEcentiles',name=r'70%',visible=True,
                 fillcolor='rgba(115,237,115,0.15)', line=dict(width=0),
                 fill='tonexty', showlegend=False,hoverinfo='none'
             ),
             go.Scatter(
-                x=date_series, y=dfQ['70th'], yaxis='y2', visible=True,
+                x0=x0, dx=DAY_MS, y=q_y['70th'], yaxis='y2', visible=True,
                 legendgroup='Qcentiles', name=r'70%.', line=dict(width=0),
                 fillcolor='rgba(250,250,250,0.25)', connectgaps=True,
                 fill='tonexty', showlegend=False, hoverinfo='none'
@@ -618,13 +952,13 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series, y=dfSWE['90th'], legendgroup='SWEcentiles',
+                x0=x0, dx=DAY_MS, y=swe_y['90th'], legendgroup='SWEcentiles',
                 connectgaps=True ,name=r'90%', visible=True, 
                 line=dict(width=0), fillcolor='rgba(0,237,237,0.15)',
                 fill='tonexty', showlegend=False, hoverinfo='none'
             ),
             go.Scatter(
-                x=date_series, y=dfQ['90th'], yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['90th'], yaxis='y2',
                 legendgroup='Qcentiles', connectgaps=True,
                 name=r'90%', visible=True, line=dict(width=0),
                 fillcolor='rgba(175,175,175,0.25)',
@@ -636,14 +970,14 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series,y=dfSWE['max'],
+                x0=x0, dx=DAY_MS, y=swe_y['max'],
                 legendgroup='SWEcentiles',name=r'SWE Stats',
                 visible=True,line=dict(width=0),connectgaps=True,
                 fillcolor='rgba(1,0,237,0.15)',
                 fill='tonexty',showlegend=True,hoverinfo='none'
             ),
             go.Scatter(
-                x=date_series,y=dfQ['max'],yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['max'],yaxis='y2',
                 legendgroup='Qcentiles',name=r'Q Stats', visible=True,
                 line=dict(width=2, color='rgba(100,100,100,0.25)', dash='dash'),
                 connectgaps=True, fillcolor='rgba(100,100,100,0.25)',
@@ -655,12 +989,12 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
     trace.extend(
         [
             go.Scatter(
-                x=date_series, y=dfSWE['50th'], name=r'Median', 
+                x0=x0, dx=DAY_MS, y=swe_y['50th'], name=r'Median', 
                 visible=True, hovertext='in. SWE', connectgaps=True,
                 line=dict(color='rgba(0,237,0,0.4)')
             ),
             go.Scatter(
-                x=date_series, y=dfQ['50th'], name=r'Median', yaxis='y2',
+                x0=x0, dx=DAY_MS, y=q_y['50th'], name=r'Median', yaxis='y2',
                 visible=True, hovertext='cfs',connectgaps=True,
                 line=dict(color='rgba(0,237,0,0.4)', dash='dash')
             )
@@ -716,7 +1050,7 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
         ),
         yaxis=dict(
             title=r'Snow Water Equivalent (in.)', hoverformat='.1f',
-            tickformat="0f", range=[0, np.max(dfSWE['max']*2)],
+            tickformat="0f", range=[0, swe_range_max],
             gridcolor='#e8ece6', linecolor='#e8ece6'
         ),
         yaxis2=dict(
@@ -749,6 +1083,609 @@ def updtChart(frcstTriplet, siteName, swe_meta, all_frcst_trips,
         'layout': layout
     }
     
+def get_config_path(config, this_dir):
+    if path.exists(config) and config.lower().endswith('.json'):
+        return config
+    if path.exists(path.join(this_dir, 'config', config)):
+        return path.join(this_dir, 'config', config)
+    return None
+
+def get_export_paths(config_paths, export_path):
+    if len(config_paths) == 1:
+        return [export_path]
+    return [
+        path.join(export_path, path.splitext(path.basename(i))[0]) 
+        for i in config_paths
+    ]
+
+def get_chart_jobs(huc_dicts, export_paths, awdb=None, logger=None):
+    chart_jobs = {}
+    for huc_dict, export_path in zip(huc_dicts, export_paths):
+        for huc in huc_dict.keys():
+            print_and_log(
+                f'Working on forecasts in {huc_dict[huc]} - HUC {huc}',
+                logger
+            )
+            frcsts = get_frcsts(huc=huc, awdb=awdb, logger=logger)
+            active_trips = get_active_frcst_trips(frcsts, logger=logger)
+            if not any([x['stationTriplet'] in active_trips for x in frcsts]):
+                continue
+            huc_folder_dir = path.join(export_path, huc_dict[huc])
+            for frcst in frcsts:
+                plot_name = path.join(huc_folder_dir, frcst['name'] + r'.html')
+                chart_job = chart_jobs.setdefault(
+                    frcst['stationTriplet'], 
+                    {'frcst': frcst, 'plot_names': []}
+                )
+                if plot_name not in chart_job['plot_names']:
+                    chart_job['plot_names'].append(plot_name)
+    return chart_jobs
+
+def get_chart_html(fig, site_name):
+    import plotly.io as pio
+    img_name = f'{site_name}_swe_Q'
+    chart_file_str = pio.to_html(
+        fig, 
+        include_plotlyjs=get_plotly_js(),
+        config=get_plot_config(img_name),
+        validate=False,
+        full_html=True
+    )
+    flavicon = (
+        f'<link rel="shortcut icon" '
+        f'href="{get_favicon()}"></head>'
+    )
+    return chart_file_str.replace(r'</head>', flavicon)
+
+INELIGIBLE_REASONS = [
+    'No valid forecast equation',
+    'No valid flow element',
+    'No snotels used',
+    'No flow data',
+]
+
+def get_ineligible_reason(chart_msg):
+    for reason in INELIGIBLE_REASONS:
+        if chart_msg.startswith(reason):
+            return reason
+    return None
+
+def create_chart(frcst, plot_name, swe_meta, all_frcst_trips, awdb=None, 
+                 logger=None, cache=None, climo_cache=None, registry=None):
+    import plotly.graph_objs as go
+    bt = time.time()
+    site_name = frcst['name']
+    frcst_triplet = frcst['stationTriplet']
+    makedirs(path.dirname(plot_name), exist_ok=True)
+    chart_created = False
+    try:
+        tracking = nullcontext()
+        if cache:
+            tracking = cache.tracking(frcst_triplet)
+        with tracking:
+            chart_data = updtChart(
+                frcstTriplet=frcst_triplet, 
+                siteName=site_name, 
+                swe_meta=swe_meta,
+                all_frcst_trips=all_frcst_trips,
+                awdb=awdb,
+                logger=logger,
+                cache=cache,
+                climo_cache=climo_cache
+            )
+
+        if not type(chart_data) == str:
+            chart_file_str = get_chart_html(go.Figure(chart_data), site_name)
+            with open(plot_name, 'w') as html_file:
+                html_file.write(chart_file_str)
+            chart_created = True
+            if registry:
+                registry.remove(frcst_triplet)
+        else:
+            print_and_log(
+                f'    {chart_data} - No chart created!',
+                logger
+            )
+            reason = get_ineligible_reason(chart_data)
+            if registry and reason:
+                registry.add(frcst_triplet, reason)
+    except Exception as err:
+        print_and_log(
+            f'    Something went wrong, no chart created - {err}',
+            logger
+        )
+    print_and_log(
+        f'    chart created in {round(time.time()-bt,2)} seconds', 
+        logger
+    )
+    return chart_created
+
+def copy_chart(src_path, dst_path):
+    if path.abspath(src_path) == path.abspath(dst_path):
+        return
+    makedirs(path.dirname(dst_path), exist_ok=True)
+    if path.exists(dst_path):
+        remove(dst_path)
+    try:
+        link(src_path, dst_path)
+    except OSError:
+        copy2(src_path, dst_path)
+
+CHART_TIMINGS = {}
+
+def load_chart_timings(timings_path):
+    if path.exists(timings_path):
+        with open(timings_path, 'r') as j:
+            CHART_TIMINGS.update(json.load(j))
+
+def save_chart_timings(timings_path):
+    makedirs(path.dirname(path.abspath(timings_path)), exist_ok=True)
+    with open(timings_path, 'w') as j:
+        json.dump(CHART_TIMINGS, j, indent=1, sort_keys=True)
+
+def record_chart_timing(frcst_triplet, seconds, inputs=None):
+    timing = CHART_TIMINGS.get(frcst_triplet)
+    if timing:
+        seconds = 0.5 * timing['seconds'] + 0.5 * seconds
+    CHART_TIMINGS[frcst_triplet] = {
+        'seconds': round(seconds, 2),
+        'inputs': inputs or (timing or {}).get('inputs'),
+        'updated': dt.now().strftime('%Y-%m-%d')
+    }
+
+def get_chart_cost(frcst_triplet, inputs=None):
+    timing = CHART_TIMINGS.get(frcst_triplet)
+    if timing:
+        return timing['seconds']
+    sized = [i for i in CHART_TIMINGS.values() if i.get('inputs')]
+    if inputs and sized:
+        per_input = sum([i['seconds'] for i in sized]) / sum(
+            [i['inputs'] for i in sized]
+        )
+        return inputs * per_input
+    if CHART_TIMINGS:
+        return float(np.median([i['seconds'] for i in CHART_TIMINGS.values()]))
+    return float(inputs or 1)
+
+def get_chart_schedule(chart_jobs, workers=1):
+    costs = {
+        k: get_chart_cost(k, v.get('inputs')) for k, v in chart_jobs.items()
+    }
+    order = sorted(costs.keys(), key=lambda x: (-costs[x], x))
+    worker_loads = [0.0] * max(workers, 1)
+    for frcst_triplet in order:
+        heapq.heapreplace(
+            worker_loads, worker_loads[0] + costs[frcst_triplet]
+        )
+    return {
+        'order': order,
+        'costs': costs,
+        'predicted': max(worker_loads) if order else 0,
+        'serial': sum(costs.values()),
+        'timed': len([i for i in order if i in CHART_TIMINGS])
+    }
+
+def print_chart_schedule(chart_schedule, chart_jobs, workers=1, logger=None,
+                         num_longest=5):
+    costs = chart_schedule['costs']
+    longest_strs = '\n'.join(
+        [f'    {chart_jobs[i]["frcst"]["name"]} ({i}): '
+         f'{round(costs[i],1)} seconds' 
+         for i in chart_schedule['order'][:num_longest]]
+    )
+    print_and_log(
+        f'Chart schedule for {len(costs)} charts, longest first '
+        f'({chart_schedule["timed"]} with timings from previous runs):\n'
+        f'{longest_strs}\n'
+        f'  Serial chart time: {round(chart_schedule["serial"]/60,1)} minutes\n'
+        f'  Predicted chart time with {workers} worker(s): '
+        f'{round(chart_schedule["predicted"]/60,1)} minutes\n',
+        logger
+    )
+
+def run_chart_jobs(chart_jobs, swe_meta, all_frcst_trips, awdb=None, 
+                   logger=None, workers=1, cache=None, climo_cache=None,
+                   registry=None, order=None, budget=None):
+    def run_chart_job(frcst_triplet):
+        chart_job = chart_jobs[frcst_triplet]
+        bt = time.time()
+        plot_names = chart_job['plot_names']
+        chart_created = create_chart(
+            chart_job['frcst'], 
+            plot_names[0], 
+            swe_meta, 
+            all_frcst_trips, 
+            awdb=awdb, 
+            logger=logger,
+            cache=cache,
+            climo_cache=climo_cache,
+            registry=registry
+        )
+        if chart_created:
+            for plot_name in plot_names[1:]:
+                copy_chart(plot_names[0], plot_name)
+            record_chart_timing(
+                frcst_triplet, time.time() - bt, chart_job.get('inputs')
+            )
+        return chart_created
+
+    if not order:
+        order = list(chart_jobs.keys())
+    results = map_bounded(run_chart_job, order, workers, budget)
+    return dict(zip(order, results))
+
+def get_frcst_plan(frcst_triplet, all_frcst_trips, awdb=None, logger=None):
+    frcst_plan = {'flow_element': None, 'swe_trips': [], 'reason': None}
+    try:
+        equation = get_frcst_eq(frcst_triplet, awdb=awdb, logger=logger)
+        if not equation:
+            frcst_plan['reason'] = 'No valid forecast equation'
+            return frcst_plan
+        flow_element = get_frcst_element(
+            frcst_triplet, awdb=awdb, logger=logger
+        )
+        if not flow_element:
+            frcst_plan['reason'] = 'No valid flow element'
+            return frcst_plan
+        frcst_plan['flow_element'] = FLOW_WINNERS.get(
+            frcst_triplet, flow_element
+        )
+        terms = [j['equationTerms'] for j in equation]
+        swe_trips = get_upstream_snotels(
+            terms, getSWEsites(terms), all_frcst_trips, awdb=awdb, logger=logger
+        )
+        if not swe_trips:
+            frcst_plan['reason'] = 'No snotels used'
+            return frcst_plan
+        frcst_plan['swe_trips'] = sorted(swe_trips)
+    except Exception as err:
+        frcst_plan['reason'] = f'Could not plan - {err}'
+    return frcst_plan
+
+def get_fetch_plan(frcst_triplets, all_frcst_trips, awdb=None, logger=None, 
+                   workers=1):
+    frcst_triplets = list(frcst_triplets)
+    get_plan = lambda x: get_frcst_plan(
+        x, all_frcst_trips, awdb=awdb, logger=logger
+    )
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frcst_plans = list(executor.map(get_plan, frcst_triplets))
+    else:
+        frcst_plans = [get_plan(i) for i in frcst_triplets]
+    frcst_plans = dict(zip(frcst_triplets, frcst_plans))
+    series = {}
+    for frcst_triplet, frcst_plan in frcst_plans.items():
+        if frcst_plan['reason']:
+            continue
+        cache_keys = [get_cache_key('WTEQ', i) for i in frcst_plan['swe_trips']]
+        cache_keys.append(
+            get_cache_key(frcst_plan['flow_element'], frcst_triplet)
+        )
+        for cache_key in cache_keys:
+            series[cache_key] = series.get(cache_key, 0) + 1
+    return {'points': frcst_plans, 'series': series}
+
+def print_fetch_plan(fetch_plan, logger=None):
+    frcst_plans = fetch_plan['points']
+    series = fetch_plan['series']
+    reasons = {}
+    for frcst_plan in frcst_plans.values():
+        reason = frcst_plan['reason'] or 'Eligible for chart'
+        reasons[reason] = reasons.get(reason, 0) + 1
+    swe_keys = [i for i in series.keys() if i.startswith('WTEQ/')]
+    swe_refs = sum([series[i] for i in swe_keys])
+    reason_strs = '\n'.join(
+        [f'    {k}: {v}' for k, v in sorted(reasons.items())]
+    )
+    print_and_log(
+        f'Fetch plan for {len(frcst_plans)} forecast points:\n'
+        f'{reason_strs}\n'
+        f'  Snotel series: {len(swe_keys)} unique of {swe_refs} requested\n'
+        f'  Flow series: {len(series) - len(swe_keys)}\n'
+        f'  Total series to fetch: {len(series)} '
+        f'(saves {sum(series.values()) - len(series)} duplicate downloads)\n',
+        logger
+    )
+
+def prefetch_series(cache_keys, cache, awdb=None, logger=None, workers=1,
+                    budget=None):
+    def prefetch(cache_key):
+        if cache.get(cache_key):
+            return True
+        try:
+            data = fetch_series(cache_key, awdb=awdb, cache=cache)
+        except Exception as err:
+            print_and_log(f'    Could not prefetch {cache_key} - {err}', logger)
+            return False
+        return bool(data)
+
+    bt = time.time()
+    cache_keys = sorted(cache_keys)
+    results = map_bounded(prefetch, cache_keys, workers, budget)
+    print_and_log(
+        f'Prefetched {sum(results)} of {len(cache_keys)} series in '
+        f'{round(time.time()-bt,2)} seconds.\n',
+        logger
+    )
+    return sum(results)
+
+def get_missing_inputs(fetch_plan, cache):
+    frcst_plans = fetch_plan['points']
+    return {
+        'series': [i for i in sorted(fetch_plan['series']) if not cache.get(i)],
+        'elements': sorted([
+            k for k, v in frcst_plans.items() 
+            if v['flow_element'] and not k in FRCST_ELEMENTS
+        ]),
+        'points': {
+            k: v['reason'] for k, v in sorted(frcst_plans.items()) 
+            if v['reason'] and v['reason'].startswith('Could not plan')
+        }
+    }
+
+def print_missing_inputs(missing, missing_path=None, logger=None, 
+                         num_examples=10):
+    missing_strs = []
+    for input_type, inputs in missing.items():
+        if not inputs:
+            continue
+        examples = ', '.join(list(inputs)[:num_examples])
+        if len(inputs) > num_examples:
+            examples = f'{examples}, ...'
+        missing_strs.append(
+            f'  Missing {len(inputs)} {input_type}: {examples}'
+        )
+    if not missing_strs:
+        print_and_log('All inputs found in the local data store.\n', logger)
+        return
+    if missing_path:
+        with open(missing_path, 'w') as j:
+            json.dump(missing, j, indent=1)
+        missing_strs.append(f'  Full list written to {missing_path}')
+    print_and_log(
+        'Offline run is missing inputs from the local data store, affected '
+        'charts will not be created:\n' + '\n'.join(missing_strs) + '\n',
+        logger
+    )
+
+def parse_shard(shard_str):
+    try:
+        shard_index, num_shards = [int(i) for i in shard_str.split('/')]
+    except ValueError:
+        return None
+    if not 1 <= shard_index <= num_shards:
+        return None
+    return shard_index, num_shards
+
+def get_triplet_hash(frcst_triplet):
+    return int(hashlib.sha1(frcst_triplet.encode()).hexdigest(), 16)
+
+def get_year(date_str):
+    try:
+        return int(str(date_str)[:4])
+    except ValueError:
+        return None
+
+def get_shard_inputs(frcst_triplet):
+    this_dir = path.dirname(path.abspath(__file__))
+    frcst_filename = f'{frcst_triplet.replace(":", "_")}.frcst'
+    try:
+        with open(path.join(this_dir, 'frcst_eq', frcst_filename), 'r') as j:
+            terms = [i['equationTerms'] for i in json.load(j)]
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+    return len(getSWEsites(terms))
+
+def get_shard_costs(chart_jobs):
+    begin_years = {
+        k: get_year(v['frcst'].get('beginDate')) for k, v in chart_jobs.items()
+    }
+    ref_year = max([i for i in begin_years.values() if i] or [0]) + 1
+    costs = {}
+    for frcst_triplet, chart_job in chart_jobs.items():
+        end_year = get_year(chart_job['frcst'].get('endDate')) or ref_year
+        begin_year = begin_years[frcst_triplet] or ref_year
+        record_years = max(min(end_year, ref_year) - begin_year, 1)
+        costs[frcst_triplet] = (
+            (get_shard_inputs(frcst_triplet) + 1) * record_years
+        )
+    return costs
+
+def get_shard_plan(chart_jobs, num_shards):
+    costs = get_shard_costs(chart_jobs)
+    order = sorted(costs.keys(), key=lambda x: (-costs[x], get_triplet_hash(x)))
+    shard_loads = [(0, i) for i in range(1, num_shards + 1)]
+    shards = {}
+    for frcst_triplet in order:
+        shard_load, shard_index = heapq.heappop(shard_loads)
+        shards[frcst_triplet] = shard_index
+        heapq.heappush(
+            shard_loads, (shard_load + costs[frcst_triplet], shard_index)
+        )
+    return {
+        'shards': shards,
+        'loads': {i: load for load, i in shard_loads},
+        'total': sum(costs.values())
+    }
+
+def get_shard_jobs(chart_jobs, shard_plan, shard_index):
+    return {
+        k: chart_jobs[k] for k in sorted(chart_jobs.keys()) 
+        if shard_plan['shards'][k] == shard_index
+    }
+
+def get_manifest_path(manifest_dir, shard_index, num_shards):
+    return path.join(manifest_dir, f'shard_{shard_index}_of_{num_shards}.json')
+
+def write_shard_manifest(manifest_dir, shard_index, num_shards, assigned, 
+                         chart_jobs, chart_results, registry):
+    makedirs(manifest_dir, exist_ok=True)
+    assigned = set(assigned)
+    manifest = {
+        'shard': shard_index,
+        'num_shards': num_shards,
+        'created': dt.now().isoformat(timespec='seconds'),
+        'assigned': sorted(assigned),
+        'charts': {
+            k: chart_jobs[k]['plot_names'] for k, v in chart_results.items() 
+            if v
+        },
+        'failed': sorted([k for k, v in chart_results.items() if not v]),
+        'ineligible': {
+            k: v for k, v in registry.entries.items() if k in assigned
+        },
+        'flow_winners': {
+            k: v for k, v in FLOW_WINNERS.items() if k in assigned
+        },
+        'timings': {
+            k: v for k, v in CHART_TIMINGS.items() if k in assigned
+        }
+    }
+    manifest_path = get_manifest_path(manifest_dir, shard_index, num_shards)
+    tmp_path = f'{manifest_path}.tmp'
+    with open(tmp_path, 'w') as j:
+        json.dump(manifest, j, indent=1)
+    replace(tmp_path, manifest_path)
+    return manifest_path
+
+def merge_shard_manifests(manifest_dir, cache_dir, expected=None, 
+                          logger=None):
+    manifests = []
+    if path.isdir(manifest_dir):
+        for manifest_file in sorted(listdir(manifest_dir)):
+            if not manifest_file.startswith('shard_'):
+                continue
+            if not manifest_file.endswith('.json'):
+                continue
+            with open(path.join(manifest_dir, manifest_file), 'r') as j:
+                manifests.append(json.load(j))
+    if not manifests:
+        return None
+    latest = max(manifests, key=lambda x: x['created'])
+    num_shards = latest['num_shards']
+    ignored = [i for i in manifests if not i['num_shards'] == num_shards]
+    manifests = [i for i in manifests if i['num_shards'] == num_shards]
+    missing = sorted(
+        set(range(1, num_shards + 1)) - set([i['shard'] for i in manifests])
+    )
+    flow_winners_path = path.join(cache_dir, 'flow_elements.json')
+    timings_path = path.join(cache_dir, 'chart_timings.json')
+    load_flow_winners(flow_winners_path)
+    load_chart_timings(timings_path)
+    registry = IneligibleRegistry(path.join(cache_dir, 'ineligible.json'))
+    charts = {}
+    failed = set()
+    ineligible = set()
+    duplicates = set()
+    assigned = set()
+    overlaps = set()
+    for manifest in sorted(manifests, key=lambda x: x['shard']):
+        overlaps.update(assigned & set(manifest['assigned']))
+        assigned.update(manifest['assigned'])
+        for frcst_triplet, plot_names in manifest['charts'].items():
+            if frcst_triplet in charts:
+                duplicates.add(frcst_triplet)
+            charts[frcst_triplet] = plot_names
+            registry.remove(frcst_triplet)
+        failed.update(manifest['failed'])
+        for frcst_triplet, entry in manifest['ineligible'].items():
+            registry.entries[frcst_triplet] = entry
+        ineligible.update(manifest['ineligible'].keys())
+        FLOW_WINNERS.update(manifest['flow_winners'])
+        CHART_TIMINGS.update(manifest['timings'])
+    registry.save()
+    save_flow_winners(flow_winners_path)
+    save_chart_timings(timings_path)
+    gaps = []
+    if expected is not None:
+        covered = set(charts.keys()) | failed | ineligible
+        gaps = sorted(set(expected) - covered)
+    merged_path = path.join(manifest_dir, 'manifest.json')
+    with open(merged_path, 'w') as j:
+        json.dump(
+            {
+                'num_shards': num_shards,
+                'merged': dt.now().isoformat(timespec='seconds'),
+                'shards': sorted([i['shard'] for i in manifests]),
+                'charts': charts,
+                'failed': sorted(failed - set(charts.keys())),
+                'gaps': gaps,
+                'overlaps': sorted(overlaps)
+            },
+            j,
+            indent=1
+        )
+    merge_strs = [
+        f'Merged {len(manifests)} of {num_shards} shard manifests, '
+        f'{len(charts)} charts created, {len(failed - set(charts.keys()))} '
+        f'failed.'
+    ]
+    if missing:
+        merge_strs.append(
+            f'  Missing shard(s): {", ".join([str(i) for i in missing])}'
+        )
+    if overlaps:
+        merge_strs.append(
+            f'  {len(overlaps)} forecast point(s) were assigned to more than '
+            f'one shard: {", ".join(sorted(overlaps)[:10])}'
+            f'{" ..." if len(overlaps) > 10 else ""}'
+        )
+    if duplicates:
+        merge_strs.append(
+            f'  {len(duplicates)} charts were built by more than one shard'
+        )
+    if gaps:
+        merge_strs.append(
+            f'  {len(gaps)} forecast point(s) were not built, failed or found '
+            f'ineligible by any shard: {", ".join(gaps[:10])}'
+            f'{" ..." if len(gaps) > 10 else ""}'
+        )
+    if ignored:
+        merge_strs.append(
+            f'  Ignored {len(ignored)} manifest(s) from runs with a different '
+            f'shard count'
+        )
+    return '\n'.join(merge_strs) + '\n'
+
+def create_indexes(huc_dicts, export_paths, all_frcsts, nav=False, 
+                   search=False, site_map=False, huc_layers=True, 
+                   huc_stats=None, gis_path=None, summary=False, 
+                   cache_dir=None, logger=None):
+    from stf_site_map import create_map
+    for huc_dict, export_path in zip(huc_dicts, export_paths):
+        makedirs(export_path, exist_ok=True)
+        if summary and cache_dir:
+            print_and_log(
+                create_summary(export_path, huc_dict, all_frcsts, cache_dir), 
+                logger
+            )
+        if nav:
+            if search:
+                nav_out = create_search_nav(
+                    export_path, 
+                    nav_filename='nav.html', 
+                    frcsts=all_frcsts, 
+                    huc_dict=huc_dict
+                )
+            else:
+                nav_out = create_nav(export_path, nav_filename='nav.html')
+            print_and_log(nav_out, logger)
+        
+        if site_map:
+            df_meta = pd.DataFrame(all_frcsts)
+            print_and_log(
+                create_map(
+                    df_meta, 
+                    export_path, 
+                    huc_dict, 
+                    huc_layers=huc_layers, 
+                    huc_stats=huc_stats,
+                    gis_path=gis_path
+                ), 
+                logger
+            )
+
 if __name__ == '__main__':
     
     import sys
@@ -759,11 +1696,26 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description=cli_desc)
     parser.add_argument("-V", "--version", help="show program version", action="store_true")
     parser.add_argument("-U", "--update", help="Update forecast equations from NRCS webservice.", action="store_true")
-    parser.add_argument("-w", "--workers", help="Set how many i/o threads to use when updating forecast equations (max of 8)")
+    parser.add_argument("-w", "--workers", help="Set how many i/o threads to use when updating forecast equations or creating charts (max of 8)")
     parser.add_argument("-n", "--nav", help="Create nav.html after creating charts", action="store_true")
+    parser.add_argument("-s", "--search", help="Use the search indexed nav.html with lazy loaded HUC menus (use with --nav)", action="store_true")
     parser.add_argument("-m", "--map", help="Create site_map.html after creating charts", action="store_true")
-    parser.add_argument("-e", "--export", help="Export path for charts")
-    parser.add_argument("-c", "--config", help="Provide path or name of config file in config folder. Defaults to all_hucs.json")
+    parser.add_argument("-e", "--export", help="Export path for charts, when more than one config is used each config exports to a sub folder named after the config")
+    parser.add_argument("-c", "--config", help="Provide path(s) or name(s) of config file(s) in config folder. Defaults to all_hucs.json", nargs='+')
+    parser.add_argument("--cache-dir", help="Folder to persist cached climatology to, defaults to data_store")
+    parser.add_argument("--recheck", help="Recheck forecast points previously found to be ineligible for a chart", action="store_true")
+    parser.add_argument("--revalidate", help="Days before an ineligible forecast point is rechecked, defaults to 7", default=7, type=float)
+    parser.add_argument("--plan", help="Resolve equations, snotels and flow elements for all charts, print the fetch plan and exit", action="store_true")
+    parser.add_argument("--shard", help="Only create charts for shard i of N (e.g. 2/4) and write a shard manifest instead of nav.html/site_map.html")
+    parser.add_argument("--merge", help="Merge shard manifests and create nav.html/site_map.html once for all shards", action="store_true")
+    parser.add_argument("--offline", help="Create charts, nav.html and site_map.html only from the local data store, without any network calls", action="store_true")
+    parser.add_argument("--max-age", help="Hours a series saved in the data store is reused before downloading it again, defaults to 1", default=1, type=float)
+    parser.add_argument("--budget", help="Minutes the run may spend calling NRCS services, after which only cached data is used", type=float)
+    parser.add_argument("--max-mem", help="Stream charts within this memory budget in MB, holding series as float32 and pausing new fetches/charts while over budget", type=float)
+    parser.add_argument("--summary", help="Create summary.html/summary.json of current SWE and Q vs median for all charts after creating charts", action="store_true")
+    parser.add_argument("--export-stats", help="Export basin SWE and flow statistics for all charts to a columnar dataset partitioned by HUC (in data_store/basin_stats) after creating charts", action="store_true")
+    parser.add_argument("--changed", help="Only create charts for forecast points added, modified or downstream of a change in the last --update", action="store_true")
+    parser.add_argument("--manifest-dir", help="Folder shard manifests are written to and merged from, defaults to data_store/shards")
     
     args = parser.parse_args()
     
@@ -771,16 +1723,35 @@ if __name__ == '__main__':
         print('stf_nav.py v1.0')
     this_dir = path.dirname(path.abspath(__file__))
     logger = create_log(path.join(this_dir, 'stf_charts.log'))
-    awdb = create_awdb()
+    awdb = None
+    if args.offline:
+        set_offline()
+    elif not args.merge:
+        awdb = create_awdb()
+
+    workers = 1
+    if args.workers:
+        workers = 8
+        if str(args.workers).isdigit():
+            if int(args.workers) <= 8:
+                workers = int(args.workers)
     
+    shard = None
+    if args.shard:
+        shard = parse_shard(args.shard)
+        if not shard:
+            print(f'Invalid shard, use i/N (e.g. 2/4) - {args.shard}')
+            sys.exit(0)
+
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
     if args.update:
-        workers = 1
-        if args.workers:
-            workers = 8
-            if str(args.workers).isdigit():
-                if int(args.workers) <= 8:
-                    workers = int(args.workers)
-        updt_frcst_eqs(awdb=awdb, logger=logger, indent=None, workers=workers)
+        updt_frcst_eqs(
+            awdb=awdb, 
+            logger=logger, 
+            indent=None, 
+            workers=workers, 
+            cache_dir=cache_dir
+        )
         sys.exit(0)
         
     if args.export:
@@ -792,104 +1763,295 @@ if __name__ == '__main__':
     else:
         export_path = path.join(this_dir, 'charts')
         
-    if args.config:
-        if path.exists(args.config) and args.config.lower().endswith('.json'):
-            config_path = args.config
-        elif path.exists(path.join(this_dir, 'config', args.config)):
-            config_path = path.join(this_dir, 'config', args.config)
-        else:
-            print('Invalid config path/file - {args.config}')
+    config_paths = []
+    for config in args.config or ['all_hucs.json']:
+        config_path = get_config_path(config, this_dir)
+        if not config_path:
+            print(f'Invalid config path/file - {config}')
             sys.exit(0)
-    else:
-        config_path = path.join(this_dir, 'config', 'all_hucs.json')
+        config_paths.append(config_path)
+    export_paths = get_export_paths(config_paths, export_path)
     
     s_time = dt.now()
     s_time_str = s_time.strftime('%x %X')
+    config_strs = '\n'.join(
+        [f'  Using configuration located: {i}\n  Exporting charts to: {j}' 
+         for i, j in zip(config_paths, export_paths)]
+    )
     print_and_log(
         f'Starting Snow to Flow Chart generation at {s_time_str}\n'
-        f'  Using configuration located: {config_path}\n'
-        f'  Exporting charts to: {export_path}\n',
+        f'{config_strs}\n',
         logger
     )
-    with open(config_path, 'r') as config:
-        huc_dict = json.load(config)
+    huc_dicts = []
+    for config_path in config_paths:
+        with open(config_path, 'r') as config:
+            huc_dicts.append(json.load(config))
+    manifest_dir = args.manifest_dir or path.join(cache_dir, 'shards')
 
-    hucs = huc_dict.keys()
-    swe_meta = r_get(f'{NRCS_DATA_URL}/metadata/WTEQ/metadata.json').json()
-    all_frcsts = get_frcsts(huc='all', awdb=awdb, logger=logger)
-    all_frcst_trips = [x['stationTriplet'] for x in all_frcsts if isActive(x)]
-    for huc in hucs: 
+    if args.merge:
+        merge_out = merge_shard_manifests(
+            manifest_dir, 
+            cache_dir, 
+            expected=get_chart_jobs(
+                huc_dicts, export_paths, awdb=awdb, logger=logger
+            ).keys(), 
+            logger=logger
+        )
+        if not merge_out:
+            print_and_log(f'No shard manifests found in {manifest_dir}', logger)
+            sys.exit(0)
+        print_and_log(merge_out, logger)
         print_and_log(
-            f'Working on forecasts in {huc_dict[huc]} - HUC {huc}',
+            update_huc_stats(
+                cache_dir, get_swe_meta(cache_dir, offline=True) or {}
+            ), 
             logger
         )
-        frcsts = get_frcsts(huc=huc, awdb=awdb, logger=logger)
-        frcst_triplets = [x['stationTriplet'] for x in frcsts if isActive(x)]
-        if not frcst_triplets:
-            continue
-        for frcst in frcsts:
-            bt = time.time()
-            site_name = frcst['name']
-            frcst_triplet = frcst['stationTriplet']
-            huc_folder_dir = path.join(export_path, huc_dict[huc])
-            makedirs(huc_folder_dir, exist_ok=True)
-            plot_name = path.join(huc_folder_dir, site_name + r'.html')
-            img_name = f'{site_name}_swe_Q'
-            
-            try:
-                chart_data = updtChart(
-                    frcstTriplet=frcst_triplet, 
-                    siteName=site_name, 
-                    swe_meta=swe_meta,
-                    all_frcst_trips=all_frcst_trips,
-                    awdb=awdb,
-                    logger=logger
-                )
+        create_indexes(
+            huc_dicts, 
+            export_paths, 
+            get_frcsts(huc='all', awdb=awdb, logger=logger), 
+            nav=True, 
+            search=args.search, 
+            site_map=True, 
+            huc_stats=load_huc_stats(path.join(cache_dir, 'huc_stats')),
+            gis_path=path.join(this_dir, 'gis'),
+            summary=args.summary,
+            cache_dir=cache_dir,
+            logger=logger
+        )
+        if args.export_stats:
+            print_and_log(
+                export_basin_stats(
+                    cache_dir, 
+                    path.join(cache_dir, 'basin_stats'), 
+                    get_frcsts(huc='all', awdb=awdb, logger=logger)
+                ), 
+                logger
+            )
+        sys.exit(0)
 
-                if not type(chart_data) == str:
-                    fig = go.Figure(chart_data)
-                    py.plot(
-                        fig, 
-                        filename=plot_name, 
-                        auto_open=False,
-                        include_plotlyjs=get_plotly_js(),
-                        config=get_plot_config(img_name),
-                        validate=False
-                    )
-                    flavicon = (
-                        f'<link rel="shortcut icon" '
-                        f'href="{get_favicon()}"></head>'
-                    )
-                    with open(plot_name, 'r') as html_file:
-                        chart_file_str = html_file.read()
-            
-                    with open(plot_name, 'w') as html_file:
-                        html_file.write(
-                            chart_file_str.replace(r'</head>', flavicon)
-                        )
-                else:
-                    print_and_log(
-                        f'    {chart_data} - No chart created!',
-                        logger
-                    )
-            except Exception as err:
-                print_and_log(
-                    f'    Something went wrong, no chart created - {err}',
-                    logger
-                )
+    if args.budget:
+        set_run_budget(args.budget * 60)
+    swe_meta = get_swe_meta(cache_dir, offline=args.offline, logger=logger)
+    if not swe_meta:
+        print_and_log(
+            f'No snotel metadata found in {cache_dir}, run once without '
+            f'--offline to populate the data store.',
+            logger
+        )
+        sys.exit(0)
+    all_frcsts = get_frcsts(huc='all', awdb=awdb, logger=logger)
+    all_frcst_trips = get_active_frcst_trips(all_frcsts, logger=logger)
+    chart_jobs = get_chart_jobs(
+        huc_dicts, export_paths, awdb=awdb, logger=logger
+    )
+    timings_path = path.join(cache_dir, 'chart_timings.json')
+    load_chart_timings(timings_path)
+    if shard:
+        shard_plan = get_shard_plan(chart_jobs, shard[1])
+        chart_jobs = get_shard_jobs(chart_jobs, shard_plan, shard[0])
+        shard_triplets = list(chart_jobs.keys())
+        shard_share = shard_plan['loads'][shard[0]] / max(shard_plan['total'], 1)
+        print_and_log(
+            f'Working on shard {shard[0]} of {shard[1]}, '
+            f'{len(chart_jobs)} forecast points '
+            f'({round(100 * shard_share)}% of the expected cost).\n',
+            logger
+        )
+    if args.changed:
+        changes = load_frcst_changes(cache_dir)
+        if not changes:
             print_and_log(
-                f'    chart created in {round(time.time()-bt,2)} seconds', 
+                f'No forecast equation changes found in {cache_dir}, run with '
+                f'--update first.',
+                logger
+            )
+            sys.exit(0)
+        invalidate = set(changes['invalidate'])
+        chart_jobs = {
+            k: v for k, v in chart_jobs.items() if k in invalidate
+        }
+        print_and_log(
+            f'Working on {len(chart_jobs)} forecast points changed by the '
+            f'equation update of {changes["updated"]}.\n',
+            logger
+        )
+    flow_winners_path = path.join(cache_dir, 'flow_elements.json')
+    load_flow_winners(flow_winners_path)
+    elements_path = path.join(cache_dir, 'station_elements.json')
+    if args.offline:
+        load_frcst_elements(elements_path)
+    registry = IneligibleRegistry(
+        path.join(cache_dir, 'ineligible.json'), 
+        revalidate_days=args.revalidate
+    )
+    if args.recheck:
+        registry.clear()
+    skipped = [i for i in chart_jobs.keys() if registry.get(i)]
+    for frcst_triplet in skipped:
+        chart_jobs.pop(frcst_triplet)
+    if skipped:
+        print_and_log(
+            f'Skipping {len(skipped)} forecast points known to be ineligible '
+            f'for a chart, use --recheck to include them.\n',
+            logger
+        )
+    fetch_plan = get_fetch_plan(
+        chart_jobs.keys(), 
+        all_frcst_trips, 
+        awdb=awdb, 
+        logger=logger, 
+        workers=workers
+    )
+    print_fetch_plan(fetch_plan, logger)
+    if args.plan:
+        sys.exit(0)
+    for frcst_triplet, frcst_plan in fetch_plan['points'].items():
+        if frcst_plan['reason'] in INELIGIBLE_REASONS:
+            registry.add(frcst_triplet, frcst_plan['reason'])
+            chart_jobs.pop(frcst_triplet)
+        elif frcst_triplet in chart_jobs and not frcst_plan['reason']:
+            chart_jobs[frcst_triplet]['inputs'] = len(frcst_plan['swe_trips']) + 1
+    chart_schedule = get_chart_schedule(chart_jobs, workers=workers)
+    print_chart_schedule(chart_schedule, chart_jobs, workers, logger)
+    budget = None
+    series_args = {}
+    climo_args = {}
+    if args.max_mem:
+        budget = MemoryBudget(args.max_mem)
+        series_args = {'compact': True, 'max_bytes': budget.limit // 4}
+        climo_args = {'max_items': 4 * workers}
+        SWE_MEMO.trim(4 * workers)
+        SWE_MEMO.max_items = 4 * workers
+        print_and_log(
+            f'Streaming charts within a {round(args.max_mem)} MB memory '
+            f'budget.\n',
+            logger
+        )
+    if args.offline:
+        series_cache = SeriesCache(cache_dir=cache_dir, **series_args)
+        print_missing_inputs(
+            get_missing_inputs(fetch_plan, series_cache), 
+            path.join(cache_dir, 'offline_missing.json'), 
+            logger
+        )
+    else:
+        series_cache = SeriesCache(
+            cache_dir=cache_dir, max_age=args.max_age * 3600, **series_args
+        )
+        prefetch_series(
+            fetch_plan['series'].keys(), 
+            series_cache, 
+            awdb=awdb, 
+            logger=logger, 
+            workers=workers,
+            budget=budget
+        )
+    climo_cache = ClimoCache(path.join(cache_dir, 'climo'), **climo_args)
+    if budget:
+        budget.add_reliever(lambda: series_cache.trim(budget.limit // 8))
+        budget.add_reliever(lambda: climo_cache.trim(workers))
+        budget.add_reliever(lambda: SWE_MEMO.trim(workers))
+    num_plots = sum([len(i['plot_names']) for i in chart_jobs.values()])
+    print_and_log(
+        f'Creating {len(chart_jobs)} unique charts for {num_plots} chart '
+        f'files using {workers} worker(s).\n',
+        logger
+    )
+    chart_results = run_chart_jobs(
+        chart_jobs, 
+        swe_meta, 
+        all_frcst_trips, 
+        awdb=awdb, 
+        logger=logger, 
+        workers=workers,
+        cache=series_cache,
+        climo_cache=climo_cache,
+        registry=registry,
+        order=chart_schedule['order'],
+        budget=budget
+    )
+    swe_memo_stats = SWE_MEMO.get_stats()
+    if swe_memo_stats['shared']:
+        print_and_log(
+            f'Basin SWE statistics computed {swe_memo_stats["computed"]} '
+            f'time(s) and shared {swe_memo_stats["shared"]} time(s) by '
+            f'forecast points with the same snotels.',
+            logger
+        )
+    if shard:
+        manifest_path = write_shard_manifest(
+            manifest_dir, 
+            *shard, 
+            shard_triplets, 
+            chart_jobs, 
+            chart_results, 
+            registry
+        )
+        print_and_log(
+            f'Wrote shard manifest to {manifest_path}, run with --merge once '
+            f'all shards finish to create nav.html/site_map.html.',
+            logger
+        )
+    else:
+        registry.save()
+        save_flow_winners(flow_winners_path)
+        if not args.offline:
+            save_frcst_elements(elements_path)
+            save_chart_timings(timings_path)
+        huc_stats = None
+        if args.map:
+            print_and_log(
+                update_huc_stats(cache_dir, swe_meta, cache=series_cache), 
+                logger
+            )
+            huc_stats = load_huc_stats(path.join(cache_dir, 'huc_stats'))
+        create_indexes(
+            huc_dicts, 
+            export_paths, 
+            all_frcsts, 
+            nav=args.nav, 
+            search=args.search, 
+            site_map=args.map, 
+            huc_layers=not args.offline,
+            huc_stats=huc_stats,
+            gis_path=path.join(this_dir, 'gis'),
+            summary=args.summary,
+            cache_dir=cache_dir,
+            logger=logger
+        )
+        if args.export_stats:
+            print_and_log(
+                export_basin_stats(
+                    cache_dir, path.join(cache_dir, 'basin_stats'), all_frcsts
+                ), 
                 logger
             )
-    
-    if args.nav:
-        nav_out = create_nav(export_path, nav_filename='nav.html')
-        print_and_log(nav_out, logger)
-    
-    if args.map:
-        df_meta = pd.DataFrame(all_frcsts)
-        print_and_log(create_map(df_meta, export_path, huc_dict))
         
+    if args.offline:
+        print_and_log(
+            f'Offline run, {get_blocked_calls()} network call(s) blocked.', 
+            logger
+        )
+    http_stats = get_http_stats()
+    if sum(http_stats.values()):
+        print_and_log(
+            f'Sitedata requests: {http_stats["not_modified"]} not modified, '
+            f'{http_stats["downloaded"]} downloaded.',
+            logger
+        )
+    tripped = {k: v for k, v in get_breaker_status().items() if v['trips']}
+    for host, breaker in tripped.items():
+        print_and_log(
+            f'Circuit for {host} opened {breaker["trips"]} time(s), '
+            f'{breaker["rejected"]} of {breaker["calls"]} calls skipped.',
+            logger
+        )
+
+    print_and_log(get_memory_report(budget), logger)
+
     e_time = dt.now()
     e_time_str = e_time.strftime('%X %x')
     d_time = ':'.join(str(e_time-s_time).split(':')[:2])
@@ -898,4 +2060,3 @@ if __name__ == '__main__':
         f'Elapsed time: {d_time}',
         logger
     )
-    
\ No newline at end of file
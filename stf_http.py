@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:05:22 2026
+
+Deadlines, a run time budget and per host circuit breakers for NRCS sitedata
+and AWDB webservice calls.
+"""
+
+import time
+import threading
+from urllib.parse import urlparse
+from stf_core import AWDB_HOST
+
+REST_TIMEOUT = (10, 60)
+AWDB_TIMEOUT = 120
+MAX_FAILURES = 5
+RESET_AFTER = 60
+
+class UpstreamUnavailable(Exception):
+    pass
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+class BudgetExceeded(UpstreamUnavailable):
+    pass
+
+class OfflineMode(UpstreamUnavailable):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, host, max_failures=MAX_FAILURES, reset_after=RESET_AFTER):
+        self.host = host
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self.trips = 0
+        self.calls = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            self.calls += 1
+            if self.opened is None:
+                return True
+            if not self.trial and time.time() - self.opened > self.reset_after:
+                self.trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.max_failures:
+                if self.opened is None or self.trial:
+                    self.trips += 1
+                self.opened = time.time()
+                self.trial = False
+
+    def is_open(self):
+        with self.lock:
+            return self.opened is not None
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'state': 'open' if self.opened is not None else 'closed',
+                'failures': self.failures,
+                'trips': self.trips,
+                'calls': self.calls,
+                'rejected': self.rejected
+            }
+
+BREAKERS = {}
+BREAKERS_LOCK = threading.Lock()
+RUN_LIMITS = {'deadline': None, 'offline': False, 'blocked': 0}
+HTTP_STATS = {'not_modified': 0, 'downloaded': 0}
+
+def get_breaker(host):
+    with BREAKERS_LOCK:
+        if not host in BREAKERS:
+            BREAKERS[host] = CircuitBreaker(host)
+        return BREAKERS[host]
+
+def get_breaker_status():
+    with BREAKERS_LOCK:
+        breakers = dict(BREAKERS)
+    return {k: v.get_status() for k, v in sorted(breakers.items())}
+
+def is_available(host):
+    if is_offline() or budget_exceeded():
+        return False
+    return not get_breaker(host).is_open()
+
+def set_run_budget(seconds=None):
+    RUN_LIMITS['deadline'] = None
+    if seconds:
+        RUN_LIMITS['deadline'] = time.time() + seconds
+
+def set_offline(offline=True):
+    RUN_LIMITS['offline'] = offline
+    RUN_LIMITS['blocked'] = 0
+
+def is_offline():
+    return RUN_LIMITS['offline']
+
+def get_blocked_calls():
+    return RUN_LIMITS['blocked']
+
+def get_remaining():
+    if RUN_LIMITS['deadline'] is None:
+        return None
+    return RUN_LIMITS['deadline'] - time.time()
+
+def budget_exceeded():
+    remaining = get_remaining()
+    return remaining is not None and remaining <= 0
+
+def get_timeout(timeout):
+    remaining = get_remaining()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise BudgetExceeded('Run time budget exceeded')
+    if isinstance(timeout, tuple):
+        return tuple([min(i, remaining) for i in timeout])
+    return min(timeout, remaining)
+
+def check_call(host):
+    if is_offline():
+        with BREAKERS_LOCK:
+            RUN_LIMITS['blocked'] += 1
+        raise OfflineMode(f'Offline, not calling {host}')
+    if budget_exceeded():
+        raise BudgetExceeded('Run time budget exceeded')
+    if not get_breaker(host).allow():
+        raise CircuitOpen(f'Circuit open for {host}')
+    return get_breaker(host)
+
+def http_get(url, timeout=REST_TIMEOUT, headers=None):
+    from requests import get as r_get
+    from requests.exceptions import RequestException
+    breaker = check_call(urlparse(url).netloc)
+    try:
+        response = r_get(url, timeout=get_timeout(timeout), headers=headers)
+    except RequestException:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+def get_validators(response):
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators or None
+
+def get_conditional_headers(validators):
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+def get_http_stats():
+    with BREAKERS_LOCK:
+        return dict(HTTP_STATS)
+
+def cached_get(url, cache_key, cache=None, is_valid=bool, timeout=REST_TIMEOUT):
+    validators = cache.get_validators(cache_key) if cache else None
+    response = http_get(
+        url, timeout=timeout, headers=get_conditional_headers(validators)
+    )
+    if response.status_code == 304 and validators:
+        data = cache.touch(cache_key)
+        if data is not None:
+            with BREAKERS_LOCK:
+                HTTP_STATS['not_modified'] += 1
+            return data
+        response = http_get(url, timeout=timeout)
+    if not response.status_code == 200:
+        return None
+    data = response.json()
+    with BREAKERS_LOCK:
+        HTTP_STATS['downloaded'] += 1
+    if cache and is_valid(data):
+        cache.put(cache_key, data, validators=get_validators(response))
+    return data
+
+def get_awdb_transport(**kwargs):
+    from zeep.transports import Transport
+
+    class BudgetTransport(Transport):
+        @property
+        def operation_timeout(self):
+            if self.base_timeout is None and get_remaining() is None:
+                return None
+            return get_timeout(self.base_timeout or get_remaining())
+
+        @operation_timeout.setter
+        def operation_timeout(self, timeout):
+            self.base_timeout = timeout
+
+    return BudgetTransport(**kwargs)
+
+def awdb_call(awdb, method, *args):
+    from zeep.exceptions import Fault
+    breaker = check_call(AWDB_HOST)
+    try:
+        result = getattr(awdb, method)(*args)
+    except Fault:
+        breaker.record_success()
+        raise
+    except BudgetExceeded:
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
+
+if __name__ == '__main__':
+
+    import json
+    import tempfile
+    import argparse
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from stf_cache import SeriesCache
+
+    cli_desc = 'Checks conditional GET revalidation against a local stand-in sitedata server'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_http.py v1.0')
+
+    site_data = {
+        'stationTriplet': '1000:CO:SNTL',
+        'beginDate': '2000-10-01 00:00:00',
+        'endDate': '2000-10-03 00:00:00',
+        'values': [0.1, 0.2, 0.3]
+    }
+    server_log = []
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = f'"{len(site_data["values"])}"'
+            if self.headers.get('If-None-Match') == etag:
+                server_log.append(304)
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = json.dumps(site_data).encode()
+            server_log.append(200)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/DAILY/WTEQ/1000_CO_SNTL.json'
+    cache_key = 'WTEQ/1000:CO:SNTL'
+    cache = SeriesCache(cache_dir=tempfile.mkdtemp(), max_age=60)
+
+    def check(case, expected):
+        data = cache.get(cache_key)
+        if data is None:
+            data = cached_get(url, cache_key, cache)
+        status = server_log[-1] if server_log else None
+        result = 'ok' if status == expected and data == site_data else 'FAILED'
+        print(f'  {case}: server returned {status}, expected {expected} - {result}')
+
+    print(f'Stand-in sitedata server at {url}')
+    check('miss', 200)
+    server_log.append(None)
+    check('hit (fresh, no request)', None)
+    cache.max_age = 0
+    time.sleep(0.01)
+    check('stale, unchanged', 304)
+    site_data['values'].append(0.4)
+    site_data['endDate'] = '2000-10-04 00:00:00'
+    check('stale, changed', 200)
+    print(f'  {get_http_stats()}')
+
+    import stf_core
+    from stf_gen import prefetch_series
+    stf_core.NRCS_DATA_URL = f'http://127.0.0.1:{server.server_address[1]}'
+    cache = SeriesCache(cache_dir=tempfile.mkdtemp(), max_age=0)
+
+    def check_prefetch(case, expected):
+        server_log.append(None)
+        time.sleep(0.01)
+        prefetch_series([cache_key], cache)
+        status = server_log[-1]
+        saved = bool(cache.get_validators(cache_key))
+        data = cache.get(cache_key, max_age=float('inf'))
+        result = 'ok' if status == expected and saved and data == site_data else 'FAILED'
+        print(f'  {case}: server returned {status}, expected {expected} - {result}')
+
+    print('Prefetch path')
+    check_prefetch('miss', 200)
+    check_prefetch('stale, unchanged', 304)
+    site_data['values'].append(0.5)
+    site_data['endDate'] = '2000-10-05 00:00:00'
+    check_prefetch('stale, changed', 200)
+    check_prefetch('stale, unchanged after change', 304)
+    server.shutdown()
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:31:09 2026
+
+Builds quantized, simplified TopoJSON for the HUC map layers, one file per
+HUC level and zoom band. Shared basin boundaries are stored once as arcs and
+simplified once, so neighbouring basins stay gap free at every resolution.
+The site map embeds one band per HUC level, picked for the zoom the level is
+meant to be viewed at (HUC_LEVEL_ZOOMS), and does not switch bands as the
+user zooms, so basin edges are no finer at high zoom than that band.
+"""
+
+import json
+from os import path, makedirs, replace
+import numpy as np
+from stf_utils import get_huc_geo_json
+
+ZOOM_BANDS = {
+    'low': {'max_zoom': 6, 'tolerance': 0.01, 'quantization': 1e4},
+    'mid': {'max_zoom': 9, 'tolerance': 0.002, 'quantization': 1e5},
+    'high': {'max_zoom': 18, 'tolerance': 0.0004, 'quantization': 1e5},
+}
+HUC_LEVEL_ZOOMS = {'2': 5, '4': 6, '6': 8, '8': 9}
+
+def get_band(zoom):
+    for band, band_def in ZOOM_BANDS.items():
+        if zoom <= band_def['max_zoom']:
+            return band
+    return list(ZOOM_BANDS.keys())[-1]
+
+def get_topo_filename(huc_level, band):
+    return f'HUC{huc_level}_{band}.topojson'
+
+def get_huc_topo_path(gis_path, huc_level, zoom=None):
+    if not gis_path:
+        return None
+    if zoom is None:
+        zoom = HUC_LEVEL_ZOOMS.get(str(huc_level), 8)
+    bands = list(ZOOM_BANDS.keys())
+    band_idx = bands.index(get_band(zoom))
+    for band in bands[band_idx:] + bands[:band_idx][::-1]:
+        topo_path = path.join(gis_path, get_topo_filename(huc_level, band))
+        if path.exists(topo_path):
+            return topo_path
+    return None
+
+def load_huc_topo(gis_path, huc_level, zoom=None):
+    topo_path = get_huc_topo_path(gis_path, huc_level, zoom)
+    if not topo_path:
+        return None
+    with open(topo_path, 'r') as tj:
+        return json.load(tj)
+
+def copy_huc_topo(huc_topo):
+    huc_topo = dict(huc_topo)
+    huc_topo['objects'] = {
+        k: dict(v, geometries=[
+            dict(i, properties=dict(i['properties'])) for i in v['geometries']
+        ])
+        for k, v in huc_topo['objects'].items()
+    }
+    return huc_topo
+
+def get_polygons(geometry):
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def get_transform(features, quantization):
+    coords = np.array([
+        pt[:2] for i in features for poly in get_polygons(i['geometry'])
+        for ring in poly for pt in ring
+    ])
+    x0, y0 = coords.min(axis=0)
+    x1, y1 = coords.max(axis=0)
+    return {
+        'scale': [
+            float((x1 - x0) / (quantization - 1)) or 1.0,
+            float((y1 - y0) / (quantization - 1)) or 1.0
+        ],
+        'translate': [float(x0), float(y0)]
+    }
+
+def quantize_ring(ring, transform):
+    (kx, ky), (x0, y0) = transform['scale'], transform['translate']
+    q_ring = []
+    for pt in ring:
+        q_pt = (int(round((pt[0] - x0) / kx)), int(round((pt[1] - y0) / ky)))
+        if not q_ring or not q_ring[-1] == q_pt:
+            q_ring.append(q_pt)
+    if len(q_ring) > 1 and q_ring[0] == q_ring[-1]:
+        q_ring.pop()
+    return q_ring
+
+def get_junctions(rings):
+    neighbors = {}
+    junctions = set()
+    for ring in rings:
+        num_pts = len(ring)
+        for i, pt in enumerate(ring):
+            pair = tuple(sorted([ring[i - 1], ring[(i + 1) % num_pts]]))
+            seen = neighbors.setdefault(pt, pair)
+            if not seen == pair:
+                junctions.add(pt)
+    return junctions
+
+def get_closed_arc(ring):
+    start = ring.index(min(ring))
+    ring = ring[start:] + ring[:start]
+    if ring[-1] < ring[1]:
+        ring = ring[:1] + ring[1:][::-1]
+    return ring + ring[:1]
+
+def cut_ring(ring, junctions):
+    cuts = [i for i, pt in enumerate(ring) if pt in junctions]
+    if not cuts:
+        return [get_closed_arc(ring)]
+    ring = ring[cuts[0]:] + ring[:cuts[0]]
+    ring.append(ring[0])
+    arcs = []
+    arc = [ring[0]]
+    for pt in ring[1:]:
+        arc.append(pt)
+        if pt in junctions:
+            arcs.append(arc)
+            arc = [pt]
+    return arcs
+
+def get_arc_index(arc, arc_lookup, arcs):
+    arc_key = tuple(arc)
+    if arc_key in arc_lookup:
+        return arc_lookup[arc_key]
+    reverse_key = arc_key[::-1]
+    if reverse_key in arc_lookup:
+        return ~arc_lookup[reverse_key]
+    arc_lookup[arc_key] = len(arcs)
+    arcs.append(list(arc))
+    return arc_lookup[arc_key]
+
+def simplify_line(points, tolerance):
+    if len(points) < 3:
+        return points
+    pts = np.array(points, dtype=float)
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        s_idx, e_idx = stack.pop()
+        if e_idx - s_idx < 2:
+            continue
+        seg = pts[e_idx] - pts[s_idx]
+        seg_len = np.hypot(*seg)
+        rel = pts[s_idx + 1:e_idx] - pts[s_idx]
+        if seg_len:
+            dists = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        else:
+            dists = np.hypot(rel[:, 0], rel[:, 1])
+        max_idx = int(np.argmax(dists))
+        if dists[max_idx] > tolerance:
+            mid_idx = s_idx + 1 + max_idx
+            keep[mid_idx] = True
+            stack.extend([(s_idx, mid_idx), (mid_idx, e_idx)])
+    return [points[i] for i in np.flatnonzero(keep)]
+
+def simplify_arc(arc, tolerance, min_points=2):
+    if len(arc) <= min_points:
+        return arc
+    if arc[0] == arc[-1]:
+        pts = np.array(arc, dtype=float)
+        far_idx = int(np.argmax(np.hypot(*(pts - pts[0]).T)))
+        simple = (
+            simplify_line(arc[:far_idx + 1], tolerance)[:-1] +
+            simplify_line(arc[far_idx:], tolerance)
+        )
+        min_points = max(min_points, 4)
+    else:
+        simple = simplify_line(arc, tolerance)
+    if len(simple) < min_points:
+        step = (len(arc) - 1) / (min_points - 1)
+        simple = [arc[int(round(i * step))] for i in range(min_points)]
+    return simple
+
+def encode_arc(arc):
+    arc = np.array(arc, dtype=np.int64)
+    return np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist()
+
+def get_huc_id(feature, huc_level):
+    return str(feature['properties'].get(f'HUC{huc_level}', ''))
+
+def build_huc_topo(features, huc_level, tolerance=0.002, quantization=1e5,
+                   huc_filter='', properties=None):
+    if huc_filter:
+        huc_filter = tuple([huc_filter] if isinstance(huc_filter, str) else
+                           [str(i) for i in huc_filter])
+        features = [
+            i for i in features if get_huc_id(i, huc_level).startswith(huc_filter)
+        ]
+    if not features:
+        return None
+    if not properties:
+        properties = [f'HUC{huc_level}', 'Name']
+    transform = get_transform(features, quantization)
+    q_features = []
+    for feature in features:
+        q_polys = []
+        for poly in get_polygons(feature['geometry']):
+            q_poly = [quantize_ring(ring, transform) for ring in poly]
+            q_poly = [ring for ring in q_poly if len(ring) > 2]
+            if q_poly:
+                q_polys.append(q_poly)
+        q_features.append(q_polys)
+    junctions = get_junctions(
+        [ring for q_polys in q_features for poly in q_polys for ring in poly]
+    )
+    arcs = []
+    arc_lookup = {}
+    geom_arcs = []
+    for q_polys in q_features:
+        polys = []
+        for poly in q_polys:
+            polys.append([
+                [get_arc_index(arc, arc_lookup, arcs) for arc in
+                 cut_ring(ring, junctions)]
+                for ring in poly
+            ])
+        geom_arcs.append(polys)
+    q_tolerance = tolerance / min(transform['scale'])
+    min_points = [2] * len(arcs)
+    for polys in geom_arcs:
+        for poly in polys:
+            for ring in poly:
+                if len(ring) < 3:
+                    for arc_idx in ring:
+                        min_points[arc_idx if arc_idx >= 0 else ~arc_idx] = 3
+    arcs = [
+        encode_arc(simplify_arc(arc, q_tolerance, min_pts))
+        for arc, min_pts in zip(arcs, min_points)
+    ]
+    geometries = []
+    for feature, polys in zip(features, geom_arcs):
+        if not polys:
+            continue
+        geometry = {
+            'type': 'Polygon' if len(polys) == 1 else 'MultiPolygon',
+            'arcs': polys[0] if len(polys) == 1 else polys,
+            'properties': {
+                k: feature['properties'].get(k) for k in properties
+            }
+        }
+        geometries.append(geometry)
+    return {
+        'type': 'Topology',
+        'transform': transform,
+        'objects': {
+            f'HUC{huc_level}': {
+                'type': 'GeometryCollection',
+                'geometries': geometries
+            }
+        },
+        'arcs': arcs
+    }
+
+def write_huc_topo(huc_topo, out_dir, huc_level, band):
+    makedirs(out_dir, exist_ok=True)
+    topo_path = path.join(out_dir, get_topo_filename(huc_level, band))
+    tmp_path = f'{topo_path}.tmp'
+    with open(tmp_path, 'w') as j:
+        json.dump(huc_topo, j, separators=(',', ':'))
+    replace(tmp_path, topo_path)
+    return topo_path
+
+def create_huc_topos(out_dir, huc_levels=['2', '4', '6', '8'], bands=None,
+                     gis_path=None, huc_filter=''):
+    bands = bands or list(ZOOM_BANDS.keys())
+    results = []
+    for huc_level in huc_levels:
+        geo_json = get_huc_geo_json(huc_level, gis_path, cache_dir=out_dir)
+        if not geo_json:
+            results.append(f'  Could not download HUC{huc_level} geometry')
+            continue
+        for band in bands:
+            band_def = ZOOM_BANDS[band]
+            huc_topo = build_huc_topo(
+                geo_json['features'],
+                huc_level,
+                tolerance=band_def['tolerance'],
+                quantization=band_def['quantization'],
+                huc_filter=huc_filter
+            )
+            if not huc_topo:
+                results.append(f'  No HUC{huc_level} basins match {huc_filter}')
+                continue
+            topo_path = write_huc_topo(huc_topo, out_dir, huc_level, band)
+            results.append(
+                f'  HUC{huc_level} {band}: '
+                f'{len(huc_topo["objects"][f"HUC{huc_level}"]["geometries"])} '
+                f'basins, {sum([len(i) for i in huc_topo["arcs"]])} points, '
+                f'{round(path.getsize(topo_path) / 1024)} KB'
+            )
+    return 'Simplified HUC geometry written to {}\n{}'.format(
+        out_dir, '\n'.join(results)
+    )
+
+if __name__ == '__main__':
+
+    import argparse
+
+    cli_desc = 'Builds simplified, quantized HUC TopoJSON for the site map'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-l", "--levels", help="HUC levels to build, defaults to 2 4 6 8", nargs='+', default=['2', '4', '6', '8'])
+    parser.add_argument("-b", "--bands", help=f"Zoom bands to build, defaults to {' '.join(ZOOM_BANDS.keys())}", nargs='+', choices=list(ZOOM_BANDS.keys()))
+    parser.add_argument("-f", "--filter", help="Only keep basins whose HUC id starts with these prefix(es)", nargs='+', default='')
+    parser.add_argument("-g", "--gis-path", help="Folder with full resolution HUC{level}.geojson files, defaults to the hosted files (kept in the --out folder and revalidated weekly)")
+    parser.add_argument("-o", "--out", help="Folder to write the TopoJSON files to, defaults to gis")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_huc_geom.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    print(create_huc_topos(
+        args.out or path.join(this_dir, 'gis'),
+        huc_levels=args.levels,
+        bands=args.bands,
+        gis_path=args.gis_path,
+        huc_filter=args.filter
+    ))
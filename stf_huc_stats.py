@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:12:48 2026
+
+Current SWE percent of median for every HUC2/4/6/8, computed from the snotel
+series already saved to the data store and written as small per level
+property tables that the site map joins to HUC geometry.
+"""
+
+import json
+import warnings
+import datetime
+from os import path, makedirs, listdir, replace
+from datetime import datetime as dt
+import numpy as np
+import pandas as pd
+from stf_utils import padMissingData, nonLeapDaysBetween
+from stf_cache import SeriesCache, get_cache_key
+from stf_climo import get_water_year, get_curr_start
+
+HUC_LEVELS = ['2', '4', '6', '8']
+NUM_YEARS = 30
+MIN_YEARS = 10
+MAX_LAG_DAYS = 3
+
+def get_site_huc(site_meta):
+    huc = str(site_meta.get('huc') or site_meta.get('huc12') or '')
+    if huc.isdigit() and len(huc) % 2:
+        huc = f'0{huc}'
+    return huc
+
+def get_cached_swe_trips(cache_dir):
+    swe_dir = path.join(cache_dir, 'WTEQ')
+    if not path.isdir(swe_dir):
+        return []
+    return sorted([
+        path.splitext(i)[0].replace('_', ':') for i in listdir(swe_dir)
+        if i.endswith('.json')
+    ])
+
+def get_wy_matrix(swe_series, s_date, e_date, num_years=NUM_YEARS):
+    num_days = (num_years + 1) * 366
+    wy_matrix = np.full((len(swe_series), num_days), np.nan, dtype=np.float32)
+    for i, site_data in enumerate(swe_series):
+        site_data = padMissingData(dict(site_data), s_date, e_date)
+        if not site_data:
+            continue
+        values = np.array(site_data['values'], dtype=float)[:num_days]
+        wy_matrix[i, :len(values)] = values
+    return wy_matrix.reshape(len(swe_series), num_years + 1, 366)
+
+def get_station_swe_stats(swe_series, e_date, num_years=NUM_YEARS,
+                          min_years=MIN_YEARS, max_lag=MAX_LAG_DAYS):
+    water_year = get_water_year(e_date)
+    s_date = f'{water_year - num_years - 1}-10-01'
+    wy_matrix = get_wy_matrix(swe_series, s_date, e_date, num_years)
+    s_day = datetime.date.fromisoformat(s_date)
+    e_day = datetime.date.fromisoformat(e_date)
+    num_days = (e_day - s_day).days + 1 + nonLeapDaysBetween(s_day, e_day)
+    curr_day = num_days - 1 - get_curr_start(num_days)
+    curr_day = min(curr_day, 365)
+    lag_days = wy_matrix[:, -1, max(curr_day - max_lag, 0):curr_day + 1]
+    has_value = ~np.isnan(lag_days)
+    last_valid = lag_days.shape[1] - 1 - np.argmax(has_value[:, ::-1], axis=1)
+    day_idx = max(curr_day - max_lag, 0) + last_valid
+    site_idx = np.arange(len(swe_series))
+    current = wy_matrix[site_idx, -1, day_idx]
+    current[~has_value.any(axis=1)] = np.nan
+    por_values = wy_matrix[site_idx, :-1, day_idx]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(por_values, axis=1)
+    median[np.sum(~np.isnan(por_values), axis=1) < min_years] = np.nan
+    return pd.DataFrame(
+        {'current': current, 'median': median},
+        index=[i['stationTriplet'] for i in swe_series]
+    )
+
+def get_huc_swe_stats(station_stats, swe_meta, huc_levels=HUC_LEVELS):
+    station_stats = station_stats.copy()
+    station_stats['huc'] = [
+        get_site_huc(swe_meta.get(i, {})) for i in station_stats.index
+    ]
+    station_stats = station_stats[
+        station_stats['current'].notna() &
+        (station_stats['median'] > 0) &
+        (station_stats['huc'] != '')
+    ]
+    huc_stats = {}
+    for huc_level in huc_levels:
+        huc_ids = station_stats['huc'].str[:int(huc_level)]
+        grouped = station_stats.groupby(huc_ids)
+        level_stats = grouped[['current', 'median']].sum()
+        level_stats['sites'] = grouped.size()
+        level_stats['percent'] = (
+            100 * level_stats['current'] / level_stats['median']
+        ).round(0)
+        huc_stats[huc_level] = level_stats
+    return huc_stats
+
+def get_stats_path(stats_dir, huc_level, data_type='swe'):
+    return path.join(stats_dir, f'HUC{huc_level}_{data_type}.json')
+
+def write_huc_stats(stats_dir, huc_stats, updated, data_type='swe'):
+    makedirs(stats_dir, exist_ok=True)
+    for huc_level, level_stats in huc_stats.items():
+        stats_table = {
+            'level': huc_level,
+            'data_type': data_type,
+            'updated': updated,
+            'fields': [f'{data_type}_percent', f'{data_type}_sites'],
+            'hucs': {
+                k: [int(v['percent']), int(v['sites'])]
+                for k, v in level_stats.iterrows()
+            }
+        }
+        stats_path = get_stats_path(stats_dir, huc_level, data_type)
+        tmp_path = f'{stats_path}.tmp'
+        with open(tmp_path, 'w') as j:
+            json.dump(stats_table, j, separators=(',', ':'))
+        replace(tmp_path, stats_path)
+
+def load_huc_stats(stats_dir, huc_levels=HUC_LEVELS, data_types=['swe']):
+    huc_stats = {}
+    for huc_level in huc_levels:
+        for data_type in data_types:
+            stats_path = get_stats_path(stats_dir, huc_level, data_type)
+            if not path.exists(stats_path):
+                continue
+            with open(stats_path, 'r') as j:
+                huc_stats.setdefault(huc_level, {})[data_type] = json.load(j)
+    return huc_stats
+
+def update_huc_stats(cache_dir, swe_meta, cache=None, e_date=None,
+                     stats_dir=None):
+    if not cache:
+        cache = SeriesCache(cache_dir=cache_dir)
+    if not e_date:
+        today = dt.utcnow() - datetime.timedelta(hours=8)
+        e_date = today.date().isoformat()
+    if not stats_dir:
+        stats_dir = path.join(cache_dir, 'huc_stats')
+    swe_series = [
+        cache.get(get_cache_key('WTEQ', i), max_age=float('inf'))
+        for i in get_cached_swe_trips(cache_dir)
+    ]
+    swe_series = [
+        i for i in swe_series
+        if i and i.get('values') and i.get('beginDate') and i.get('endDate')
+    ]
+    if not swe_series:
+        return f'No snotel series found in {cache_dir}, HUC SWE stats not updated.'
+    station_stats = get_station_swe_stats(swe_series, e_date)
+    huc_stats = get_huc_swe_stats(station_stats, swe_meta)
+    write_huc_stats(stats_dir, huc_stats, e_date)
+    num_hucs = ', '.join(
+        [f'{len(v)} HUC{k}' for k, v in huc_stats.items()]
+    )
+    return (
+        f'HUC SWE % of median for {e_date} from {len(swe_series)} snotels '
+        f'({num_hucs}) written to {stats_dir}'
+    )
+
+if __name__ == '__main__':
+
+    import argparse
+    from stf_gen import get_swe_meta
+
+    cli_desc = 'Computes HUC SWE % of median from snotel series in the data store'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("--cache-dir", help="Data store folder with snotel series and metadata, defaults to data_store")
+    parser.add_argument("-d", "--date", help="Date to compute stats for (YYYY-MM-DD), defaults to today")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_huc_stats.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
+    swe_meta = get_swe_meta(cache_dir, offline=True) or {}
+    print(update_huc_stats(cache_dir, swe_meta, e_date=args.date))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:52:06 2026
+
+Measures `python -X importtime` for each snow to flow CLI entry point and keeps
+a history so slow imports creeping back in show up between runs.
+"""
+
+import sys
+import json
+import time
+import subprocess
+from os import path, makedirs, replace
+
+ENTRY_POINTS = [
+    'stf_gen',
+    'stf_nav',
+    'stf_site_map',
+    'stf_api',
+    'stf_service',
+    'stf_huc_stats',
+    'stf_huc_geom',
+    'stf_export',
+    'stf_summary',
+]
+MAX_HISTORY = 50
+
+def parse_import_times(importtime_str):
+    import_times = {}
+    for line in importtime_str.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        import_times[name.strip()] = int(cumulative_us)
+    return import_times
+
+def run_importtime(statement, this_dir):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=this_dir,
+        capture_output=True,
+        text=True
+    )
+    if not result.returncode == 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_import_times(result.stderr)
+
+def get_import_time(module, this_dir, runs=3, startup=()):
+    best = None
+    for _ in range(runs):
+        import_times = run_importtime(f'import {module}', this_dir)
+        if best is None or import_times[module] < best[module]:
+            best = import_times
+    heaviest = sorted(
+        [
+            (k, v) for k, v in best.items()
+            if not k.startswith('stf_') and not '.' in k and not k in startup
+        ],
+        key=lambda x: x[1],
+        reverse=True
+    )[:3]
+    return {
+        'ms': round(best[module] / 1000, 1),
+        'heaviest': {k: round(v / 1000, 1) for k, v in heaviest}
+    }
+
+def load_history(history_path):
+    if not path.exists(history_path):
+        return []
+    try:
+        with open(history_path, 'r') as j:
+            return json.load(j)
+    except (ValueError, OSError):
+        return []
+
+def save_history(history_path, history):
+    makedirs(path.dirname(path.abspath(history_path)), exist_ok=True)
+    tmp_path = f'{history_path}.tmp'
+    with open(tmp_path, 'w') as j:
+        json.dump(history[-MAX_HISTORY:], j, indent=1)
+    replace(tmp_path, history_path)
+
+def check_import_times(this_dir, history_path, modules=ENTRY_POINTS, runs=3,
+                       max_ms=None):
+    history = load_history(history_path)
+    prev_times = history[-1]['times'] if history else {}
+    times = {}
+    over_budget = []
+    startup = set(run_importtime('pass', this_dir).keys())
+    print(f'Import times, best of {runs} (python -X importtime):')
+    for module in modules:
+        times[module] = get_import_time(module, this_dir, runs, startup)
+        curr_ms = times[module]['ms']
+        prev_ms = prev_times.get(module, {}).get('ms')
+        change_str = ''
+        if prev_ms is not None:
+            change_str = f' ({curr_ms - prev_ms:+.1f} ms vs last run)'
+        heaviest_str = ', '.join(
+            [f'{k} {v} ms' for k, v in times[module]['heaviest'].items()]
+        )
+        print(f'  {module}: {curr_ms} ms{change_str} - heaviest: {heaviest_str}')
+        if max_ms and curr_ms > max_ms:
+            over_budget.append(module)
+    history.append({
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'times': times
+    })
+    save_history(history_path, history)
+    print(f'History written to {history_path}')
+    return over_budget
+
+if __name__ == '__main__':
+
+    import argparse
+
+    cli_desc = 'Tracks import time for each snow to flow CLI entry point'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-m", "--modules", help=f"Modules to time, defaults to {' '.join(ENTRY_POINTS)}", nargs='+', default=ENTRY_POINTS)
+    parser.add_argument("-r", "--runs", help="Runs per module, the fastest is kept, defaults to 3", default=3, type=int)
+    parser.add_argument("--max-ms", help="Exit with an error if any module takes longer than this to import", type=float)
+    parser.add_argument("-o", "--out", help="History file, defaults to data_store/import_times.json")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_import_times.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    history_path = args.out or path.join(this_dir, 'data_store', 'import_times.json')
+    over_budget = check_import_times(
+        this_dir,
+        history_path,
+        modules=args.modules,
+        runs=args.runs,
+        max_ms=args.max_ms
+    )
+    if over_budget:
+        print(f'Over the {args.max_ms} ms import budget: {", ".join(over_budget)}')
+        sys.exit(1)
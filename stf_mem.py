@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:02:37 2026
+
+Memory budget for streaming chart runs. Tracks process RSS, trims resident
+caches and holds back new fetch/chart work while the budget is exceeded, and
+reports peak RSS at the end of a run.
+"""
+
+import gc
+import sys
+import time
+import threading
+from os import sysconf
+from concurrent.futures import ThreadPoolExecutor
+
+MB = 1024 * 1024
+
+def get_rss():
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+def get_peak_rss():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+def format_mb(num_bytes):
+    if num_bytes is None:
+        return 'unknown'
+    return f'{round(num_bytes / MB)} MB'
+
+class MemoryBudget:
+    def __init__(self, max_mb, check_interval=0.25):
+        self.limit = int(max_mb * MB)
+        self.check_interval = check_interval
+        self.cond = threading.Condition()
+        self.active = 0
+        self.relievers = []
+        self.peak = 0
+        self.waits = 0
+        self.waited = 0.0
+        self.trims = 0
+        self.enabled = get_rss() is not None
+
+    def add_reliever(self, reliever):
+        self.relievers.append(reliever)
+
+    def sample(self):
+        rss = get_rss()
+        if rss and rss > self.peak:
+            self.peak = rss
+        return rss
+
+    def is_over(self):
+        if not self.enabled:
+            return False
+        return self.sample() > self.limit
+
+    def relieve(self):
+        for reliever in self.relievers:
+            reliever()
+        gc.collect()
+        self.trims += 1
+
+    def acquire(self):
+        with self.cond:
+            if self.is_over():
+                self.relieve()
+                bt = time.time()
+                waited = False
+                while self.active and self.is_over():
+                    waited = True
+                    self.cond.wait(self.check_interval)
+                if waited:
+                    self.waits += 1
+                    self.waited += time.time() - bt
+            self.active += 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def get_stats(self):
+        self.sample()
+        return {
+            'limit': self.limit,
+            'peak': self.peak,
+            'waits': self.waits,
+            'waited': round(self.waited, 2),
+            'trims': self.trims
+        }
+
+def map_bounded(func, items, workers=1, budget=None):
+    def run_item(item):
+        try:
+            return func(item)
+        finally:
+            if budget:
+                budget.release()
+            slots.release()
+
+    items = list(items)
+    if workers <= 1:
+        results = []
+        for item in items:
+            if budget:
+                budget.acquire()
+            try:
+                results.append(func(item))
+            finally:
+                if budget:
+                    budget.release()
+        return results
+    slots = threading.BoundedSemaphore(workers)
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            slots.acquire()
+            if budget:
+                budget.acquire()
+            futures.append(executor.submit(run_item, item))
+    return [i.result() for i in futures]
+
+def get_memory_report(budget=None):
+    peak_rss = get_peak_rss()
+    if budget:
+        stats = budget.get_stats()
+        peak_rss = max(peak_rss or 0, stats['peak']) or None
+        return (
+            f'Peak RSS: {format_mb(peak_rss)} (budget {format_mb(stats["limit"])}'
+            f', caches trimmed {stats["trims"]} time(s), workers held back '
+            f'{stats["waits"]} time(s) for {stats["waited"]} seconds).'
+        )
+    return f'Peak RSS: {format_mb(peak_rss)}.'
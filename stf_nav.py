@@ -6,10 +6,11 @@ Created on Thu May  2 06:33:43 2019
 """
 
 import os
+import json
 from functools import reduce
 from datetime import datetime as dt
 from pathlib import Path
-from stf_utils import get_favicon, get_bor_seal, get_bootstrap
+from stf_core import get_favicon, get_bor_seal, get_bootstrap
 
 BOR_FLAVICON = get_favicon()
 BOR_SEAL = get_bor_seal()
@@ -52,10 +53,22 @@ HEADER_STR = f'''
     <button class="btn btn-outline-info btn-md">
     <a target="_blank" href="./site_map.html">
     <i class="fa fa-external-link" aria-hidden="true"></i>
-    Map Based Navigation</a></button><br>
+    Map Based Navigation</a></button>
 '''
 
-log_btn = '<a href="./ff_gen.log" class="btn btn-success mt-3" role="button">LOG FILE</a>'
+SUMMARY_BTN_STR = '''
+    <button class="btn btn-outline-info btn-md">
+    <a href="./summary.html">
+    <i class="fa fa-table" aria-hidden="true"></i>
+    Current Conditions Summary</a></button>
+'''
+
+def get_header_str(data_dir):
+    if Path(data_dir, 'summary.html').exists():
+        return f'{HEADER_STR}{SUMMARY_BTN_STR}<br>\n'
+    return f'{HEADER_STR}<br>\n'
+
+log_btn ='<a href="./ff_gen.log" class="btn btn-success mt-3" role="button">LOG FILE</a>'
 FOOTER_STR = '''
 </div>
 <script>
@@ -73,6 +86,140 @@ $(document).ready(function(){
 </html>
 '''
 
+SEARCH_STR = '''
+    <input id="site-search" class="form-control form-control-lg mt-3" type="search"
+        placeholder="Search forecast points by name, HUC or triplet..."
+        autocomplete="off">
+    <div id="search-results" class="list-group mt-1"></div>
+    <div id="huc-menus"></div>
+'''
+
+SEARCH_FOOTER_STR = '''
+</div>
+<script>
+var NAV_FIELDS = [];
+var NAV_FOLDERS = [];
+var NAV_SITES = [];
+
+function navEntry(row) {
+  var entry = {};
+  for (var i = 0; i < NAV_FIELDS.length; i++) {
+    entry[NAV_FIELDS[i]] = row[i];
+  }
+  entry.folder = NAV_FOLDERS[entry.folder];
+  return entry;
+}
+
+function fuzzyScore(query, text) {
+  text = text.toLowerCase();
+  if (text.indexOf(query) === 0) { return 0; }
+  var words = text.split(/[\\s:_\\-]+/);
+  for (var i = 0; i < words.length; i++) {
+    if (words[i].indexOf(query) === 0) { return 1; }
+  }
+  if (text.indexOf(query) > -1) { return 2; }
+  var pos = 0;
+  var gaps = 0;
+  for (var j = 0; j < query.length; j++) {
+    var found = text.indexOf(query[j], pos);
+    if (found < 0) { return -1; }
+    gaps += found - pos;
+    pos = found + 1;
+  }
+  return 3 + gaps / text.length;
+}
+
+function searchSites(query, limit) {
+  var hits = [];
+  for (var i = 0; i < NAV_SITES.length; i++) {
+    var site = navEntry(NAV_SITES[i]);
+    var scores = [site.name, site.huc, site.triplet].map(function(s) {
+      return s ? fuzzyScore(query, String(s)) : -1;
+    }).filter(function(s) { return s > -1; });
+    if (scores.length) {
+      hits.push([Math.min.apply(null, scores), site]);
+    }
+  }
+  hits.sort(function(a, b) {
+    return a[0] - b[0] || a[1].name.localeCompare(b[1].name);
+  });
+  return hits.slice(0, limit).map(function(h) { return h[1]; });
+}
+
+function siteLink(site, cls) {
+  var a = document.createElement('a');
+  a.className = cls;
+  a.href = site.path;
+  a.innerHTML = '<b><i>' + site.name + '</i></b>';
+  if (site.triplet) {
+    a.innerHTML += ' <small class="text-muted">' + site.triplet + '</small>';
+  }
+  return a;
+}
+
+function buildHucMenus() {
+  var menus = document.getElementById('huc-menus');
+  NAV_FOLDERS.forEach(function(folder, idx) {
+    var count = NAV_SITES.filter(function(r) {
+      return navEntry(r).folder === folder;
+    }).length;
+    var div = document.createElement('div');
+    div.className = 'dropdown';
+    var btn = document.createElement('button');
+    btn.className = 'btn btn-outline-primary btn-lg dropdown-toggle mt-3';
+    btn.type = 'button';
+    btn.setAttribute('data-toggle', 'dropdown');
+    btn.innerHTML = folder.replace(/_/g, ' ').toUpperCase() +
+      ' <span class="badge badge-light">' + count + '</span>';
+    var ul = document.createElement('ul');
+    ul.className = 'dropdown-menu';
+    $(div).on('show.bs.dropdown', function() {
+      if (ul.childElementCount) { return; }
+      NAV_SITES.map(navEntry).filter(function(s) {
+        return s.folder === folder;
+      }).forEach(function(site) {
+        var li = document.createElement('li');
+        li.appendChild(siteLink(site, 'dropdown-item'));
+        ul.appendChild(li);
+      });
+    });
+    div.appendChild(btn);
+    div.appendChild(ul);
+    menus.appendChild(div);
+  });
+}
+
+$(document).ready(function(){
+  $.getJSON('./NAV_INDEX_FILENAME', function(nav_index) {
+    NAV_FIELDS = nav_index.fields;
+    NAV_FOLDERS = nav_index.folders;
+    NAV_SITES = nav_index.sites;
+    buildHucMenus();
+  });
+  $('#site-search').on('input', function() {
+    var query = $(this).val().trim().toLowerCase();
+    var results = document.getElementById('search-results');
+    results.innerHTML = '';
+    if (!query) { return; }
+    searchSites(query, 25).forEach(function(site) {
+      results.appendChild(
+        siteLink(site, 'list-group-item list-group-item-action')
+      );
+    });
+  });
+  $('#site-search').on('keydown', function(e) {
+    var first = $('#search-results a').first();
+    if (e.key === 'Enter' && first.length) {
+      window.location.href = first.attr('href');
+    }
+  });
+});
+</script>
+
+</body>
+</html>
+'''
+
 def remove_items(key_list, items_dict):
     for key in key_list:
         items_dict.pop(key, None)
@@ -151,7 +298,7 @@ def create_nav(data_dir, nav_filename='nav.html'):
 
         nl = '\n'
         nav_html_str = (
-            f'{HEADER_STR}{nl}{buttons_str}{nl}{FOOTER_STR}'
+            f'{get_header_str(data_dir)}{nl}{buttons_str}{nl}{FOOTER_STR}'
         )
         write_nav_dict = {
             Path(data_dir, nav_filename): nav_html_str,
@@ -164,6 +311,81 @@ def create_nav(data_dir, nav_filename='nav.html'):
     except Exception as err:
         return f'\nFailed to created navigation file(s) in {data_dir} - {err}'
 
+def get_site_lookup(frcsts, huc_dict=None):
+    site_lookup = {}
+    for frcst in frcsts or []:
+        folder = None
+        if huc_dict:
+            huc = str(frcst.get('huc', ''))
+            folder = next(
+                (v for k, v in huc_dict.items() if huc.startswith(k)), None
+            )
+        site_lookup[(folder, frcst['name'])] = frcst
+        site_lookup.setdefault((None, frcst['name']), frcst)
+    return site_lookup
+
+def get_nav_index(data_dir, frcsts=None, huc_dict=None):
+    walk_dict = get_folders(data_dir)
+    to_remove = ['.git', 'assets']
+    walk_dict = remove_items(to_remove, walk_dict)
+    site_lookup = get_site_lookup(frcsts, huc_dict)
+    folders = []
+    sites = []
+    for folder, dd_items in sorted(walk_dict.items()):
+        if not dd_items:
+            continue
+        filenames = sorted(
+            str(k) for k in dd_items.keys() if str(k).endswith('.html')
+        )
+        if not filenames:
+            continue
+        folder_idx = len(folders)
+        folders.append(folder)
+        for filename in filenames:
+            site_name = filename.replace('.html', '')
+            frcst = site_lookup.get(
+                (folder, site_name), site_lookup.get((None, site_name), {})
+            )
+            sites.append([
+                site_name,
+                str(frcst.get('huc', ''))[:8],
+                frcst.get('stationTriplet', ''),
+                folder_idx,
+                Path('.', folder, filename).as_posix()
+            ])
+    return {
+        'fields': ['name', 'huc', 'triplet', 'folder', 'path'],
+        'folders': folders,
+        'sites': sites
+    }
+
+def create_search_nav(data_dir, nav_filename='nav.html', frcsts=None,
+                      huc_dict=None, index_filename='nav_index.json'):
+    nl = '\n'
+    try:
+        nav_index = get_nav_index(data_dir, frcsts=frcsts, huc_dict=huc_dict)
+        with open(Path(data_dir, index_filename), 'w') as j:
+            json.dump(nav_index, j, separators=(',', ':'))
+        footer_str = SEARCH_FOOTER_STR.replace(
+            'NAV_INDEX_FILENAME', index_filename
+        )
+        nav_html_str = (
+            f'{get_header_str(data_dir)}{nl}{SEARCH_STR}{nl}{footer_str}'
+        )
+        write_nav_dict = {
+            Path(data_dir, nav_filename): nav_html_str,
+            Path(data_dir, 'index.html'): nav_html_str
+        }
+        write_file(write_nav_dict)
+        num_sites = len(nav_index['sites'])
+        return (
+            f'\nSearch navigation file(s) created for {num_sites} '
+            f'charts in {data_dir}\n'
+        )
+
+    except Exception as err:
+        return f'\nFailed to created navigation file(s) in {data_dir} - {err}'
+
 if __name__ == '__main__':
 
     import sys
@@ -174,7 +396,9 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description=cli_desc)
     parser.add_argument("-V", "--version", help="show program version", action="store_true")
     parser.add_argument("-p", "--path", help="path to create nav.html for")
-    
+    parser.add_argument("-s", "--search", help="Create a search indexed nav.html with lazy loaded HUC menus", action="store_true")
+    parser.add_argument("-c", "--config", help="Path to stf charts config file, used to add HUCs/triplets to the search index")
+
     
     args = parser.parse_args()
     
@@ -191,5 +415,20 @@ if __name__ == '__main__':
     else:      
         data_dir = os.path.join(this_dir, 'charts')
 
-    sys_out = create_nav(data_dir)
+    if args.search:
+        frcsts = None
+        huc_dict = None
+        all_frcst_path = path.join(this_dir, 'frcst_eq', 'all_frcsts.json')
+        if path.exists(all_frcst_path):
+            with open(all_frcst_path, 'r') as j:
+                frcsts = json.load(j)
+        if args.config:
+            config_path = args.config
+            if not path.exists(config_path):
+                config_path = path.join(this_dir, 'config', args.config)
+            with open(config_path, 'r') as config:
+                huc_dict = json.load(config)
+        sys_out = create_search_nav(data_dir, frcsts=frcsts, huc_dict=huc_dict)
+    else:
+        sys_out = create_nav(data_dir)
     print(sys_out)
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:02:17 2026
+
+Long running Snow to Flow service, keeps the AWDB client, metadata, equations
+and time series resident and only rebuilds charts whose inputs changed.
+"""
+
+import json
+import time
+import threading
+from queue import Queue, Empty
+from os import path, replace
+from datetime import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from stf_utils import create_awdb
+from stf_cache import SeriesCache, ClimoCache
+from stf_gen import print_and_log, create_log
+from stf_gen import get_frcsts, get_chart_jobs, create_chart, copy_chart
+from stf_gen import get_config_path, get_export_paths, fetch_series
+from stf_gen import create_indexes, get_swe_meta, get_active_frcst_trips
+
+class StfService:
+    def __init__(self, huc_dicts, export_paths, cache, climo_cache=None, workers=4,
+                 refresh_interval=3600, metadata_interval=86400,
+                 status_path=None, nav=False, search=False, site_map=False,
+                 logger=None):
+        self.huc_dicts = huc_dicts
+        self.export_paths = export_paths
+        self.cache = cache
+        self.climo_cache = climo_cache
+        self.workers = workers
+        self.refresh_interval = refresh_interval
+        self.metadata_interval = metadata_interval
+        self.status_path = status_path
+        self.nav = nav
+        self.search = search
+        self.site_map = site_map
+        self.logger = logger
+        self.awdb = create_awdb()
+        self.queue = Queue()
+        self.queued = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.chart_jobs = {}
+        self.new_files = 0
+        self.status = {
+            'started': dt.now().isoformat(timespec='seconds'),
+            'state': 'starting',
+            'last_metadata_refresh': None,
+            'last_refresh': None,
+            'next_refresh': None,
+            'queue_depth': 0,
+            'charts_built': 0,
+            'charts_failed': 0,
+            'series_cached': 0,
+            'last_stale_series': 0,
+            'last_changed_series': 0,
+        }
+
+    def update_status(self, **kwargs):
+        with self.lock:
+            self.status.update(kwargs)
+            self.status['queue_depth'] = self.queue.qsize()
+            self.status['series_cached'] = len(self.cache.keys())
+            status = dict(self.status)
+        if self.status_path:
+            tmp_path = f'{self.status_path}.tmp'
+            with open(tmp_path, 'w') as j:
+                json.dump(status, j, indent=2)
+            replace(tmp_path, self.status_path)
+        return status
+
+    def load_metadata(self):
+        print_and_log('Refreshing snotel and forecast point metadata.', self.logger)
+        self.swe_meta = get_swe_meta(
+            self.cache.cache_dir, logger=self.logger
+        ) or {}
+        self.all_frcsts = get_frcsts(
+            huc='all', awdb=self.awdb, logger=self.logger
+        )
+        self.all_frcst_trips = get_active_frcst_trips(
+            self.all_frcsts, logger=self.logger
+        )
+        chart_jobs = get_chart_jobs(
+            self.huc_dicts,
+            self.export_paths,
+            awdb=self.awdb,
+            logger=self.logger
+        )
+        new_triplets = set(chart_jobs.keys()) - set(self.chart_jobs.keys())
+        self.chart_jobs = chart_jobs
+        self.metadata_time = time.time()
+        self.update_status(last_metadata_refresh=dt.now().isoformat(timespec='seconds'))
+        return new_triplets
+
+    def queue_charts(self, frcst_triplets):
+        for frcst_triplet in sorted(frcst_triplets):
+            if not frcst_triplet in self.chart_jobs:
+                continue
+            with self.lock:
+                if frcst_triplet in self.queued:
+                    continue
+                self.queued.add(frcst_triplet)
+            self.queue.put(frcst_triplet)
+        self.update_status()
+
+    def run_worker(self):
+        while not self.stop_event.is_set():
+            try:
+                frcst_triplet = self.queue.get(timeout=1)
+            except Empty:
+                continue
+            try:
+                chart_job = self.chart_jobs[frcst_triplet]
+                plot_names = chart_job['plot_names']
+                is_new = not path.exists(plot_names[0])
+                chart_created = create_chart(
+                    chart_job['frcst'],
+                    plot_names[0],
+                    self.swe_meta,
+                    self.all_frcst_trips,
+                    awdb=self.awdb,
+                    logger=self.logger,
+                    cache=self.cache,
+                    climo_cache=self.climo_cache
+                )
+                if chart_created:
+                    for plot_name in plot_names[1:]:
+                        copy_chart(plot_names[0], plot_name)
+                with self.lock:
+                    self.queued.discard(frcst_triplet)
+                    if chart_created:
+                        self.status['charts_built'] += 1
+                        self.new_files += int(is_new)
+                    else:
+                        self.status['charts_failed'] += 1
+            finally:
+                self.queue.task_done()
+                self.update_status()
+
+    def start_workers(self):
+        for i in range(self.workers):
+            worker = threading.Thread(target=self.run_worker, daemon=True)
+            worker.start()
+
+    def refresh_series(self):
+        stale_keys = self.cache.stale_keys(self.refresh_interval)
+        changed_keys = []
+        for cache_key in stale_keys:
+            if self.stop_event.is_set():
+                break
+            prev_sig = self.cache.sig(cache_key)
+            try:
+                data = fetch_series(cache_key, awdb=self.awdb, cache=self.cache)
+            except Exception as err:
+                print_and_log(f'    Could not refresh {cache_key} - {err}', self.logger)
+                continue
+            if data and not self.cache.sig(cache_key) == prev_sig:
+                changed_keys.append(cache_key)
+        affected = self.cache.get_dependents(changed_keys)
+        print_and_log(
+            f'Refreshed {len(stale_keys)} stale series, {len(changed_keys)} '
+            f'changed, rebuilding {len(affected)} charts.',
+            self.logger
+        )
+        self.update_status(
+            last_stale_series=len(stale_keys),
+            last_changed_series=len(changed_keys)
+        )
+        return affected
+
+    def finish_cycle(self):
+        self.queue.join()
+        if not self.new_files:
+            return
+        self.new_files = 0
+        create_indexes(
+            self.huc_dicts,
+            self.export_paths,
+            self.all_frcsts,
+            nav=self.nav,
+            search=self.search,
+            site_map=self.site_map,
+            gis_path=path.join(path.dirname(path.abspath(__file__)), 'gis'),
+            summary=bool(self.cache.cache_dir),
+            cache_dir=self.cache.cache_dir,
+            logger=self.logger
+        )
+
+    def run(self):
+        self.load_metadata()
+        self.start_workers()
+        self.update_status(state='building')
+        self.queue_charts(self.chart_jobs.keys())
+        self.new_files = 1
+        self.finish_cycle()
+        while not self.stop_event.is_set():
+            next_refresh = dt.fromtimestamp(time.time() + self.refresh_interval)
+            self.update_status(
+                state='idle',
+                last_refresh=dt.now().isoformat(timespec='seconds'),
+                next_refresh=next_refresh.isoformat(timespec='seconds')
+            )
+            if self.stop_event.wait(self.refresh_interval):
+                break
+            self.update_status(state='refreshing')
+            affected = set()
+            if time.time() - self.metadata_time > self.metadata_interval:
+                affected.update(self.load_metadata())
+            affected.update(self.refresh_series())
+            self.update_status(state='building')
+            self.queue_charts(affected)
+            self.finish_cycle()
+        self.update_status(state='stopped')
+
+    def stop(self):
+        self.stop_event.set()
+
+def serve_status(service, port, host='127.0.0.1'):
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.rstrip('/') in ['', '/status']:
+                self.send_error(404)
+                return
+            body = json.dumps(service.update_status()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    return server
+
+if __name__ == '__main__':
+
+    import sys
+    import argparse
+
+    cli_desc = 'Runs snow to flow chart generation as a long running service'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-w", "--workers", help="Set how many chart worker threads to use (max of 8)", default=4)
+    parser.add_argument("-n", "--nav", help="Create nav.html when new charts are created", action="store_true")
+    parser.add_argument("-s", "--search", help="Use the search indexed nav.html (use with --nav)", action="store_true")
+    parser.add_argument("-m", "--map", help="Create site_map.html when new charts are created", action="store_true")
+    parser.add_argument("-e", "--export", help="Export path for charts")
+    parser.add_argument("-c", "--config", help="Provide path(s) or name(s) of config file(s) in config folder. Defaults to all_hucs.json", nargs='+')
+    parser.add_argument("-r", "--refresh", help="Minutes between stale series refreshes, defaults to 60", default=60, type=float)
+    parser.add_argument("--metadata-refresh", help="Hours between metadata refreshes, defaults to 24", default=24, type=float)
+    parser.add_argument("--cache-dir", help="Folder to persist cached time series to, defaults to data_store")
+    parser.add_argument("--status", help="Path of status file, defaults to stf_service_status.json")
+    parser.add_argument("-p", "--port", help="Serve service status as json on this local port", type=int)
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_service.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    logger = create_log(path.join(this_dir, 'stf_charts.log'))
+
+    workers = 8
+    if str(args.workers).isdigit() and int(args.workers) <= 8:
+        workers = max(int(args.workers), 1)
+
+    if args.export:
+        if path.isdir(args.export):
+            export_path = args.export
+        else:
+            print(f'\nInvalid export path - {args.export}')
+            sys.exit(0)
+    else:
+        export_path = path.join(this_dir, 'charts')
+
+    config_paths = []
+    for config in args.config or ['all_hucs.json']:
+        config_path = get_config_path(config, this_dir)
+        if not config_path:
+            print(f'Invalid config path/file - {config}')
+            sys.exit(0)
+        config_paths.append(config_path)
+    export_paths = get_export_paths(config_paths, export_path)
+    huc_dicts = []
+    for config_path in config_paths:
+        with open(config_path, 'r') as config:
+            huc_dicts.append(json.load(config))
+
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
+    status_path = args.status or path.join(this_dir, 'stf_service_status.json')
+    service = StfService(
+        huc_dicts,
+        export_paths,
+        SeriesCache(cache_dir=cache_dir, max_age=args.refresh * 60),
+        climo_cache=ClimoCache(path.join(cache_dir, 'climo')),
+        workers=workers,
+        refresh_interval=args.refresh * 60,
+        metadata_interval=args.metadata_refresh * 3600,
+        status_path=status_path,
+        nav=args.nav,
+        search=args.search,
+        site_map=args.map,
+        logger=logger
+    )
+    if args.port:
+        serve_status(service, args.port)
+    print_and_log(
+        f'Starting Snow to Flow service at {dt.now().strftime("%x %X")}\n'
+        f'  Refreshing stale series every {args.refresh} minutes\n'
+        f'  Writing status to: {status_path}\n',
+        logger
+    )
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        service.stop()
+        service.update_status(state='stopped')
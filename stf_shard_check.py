@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:31:18 2026
+
+Runs `stf_gen.py --offline --shard i/N` in N local processes, each with its
+own data store like separate nodes would have, merges their manifests and
+checks every forecast point was assigned to exactly one shard.
+"""
+
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from io import StringIO
+from os import path, makedirs
+from contextlib import redirect_stdout
+
+def seed_data_store(cache_dir):
+    from stf_cache import SeriesCache, get_cache_key
+    SeriesCache(cache_dir=cache_dir).put(
+        get_cache_key('metadata', 'WTEQ'),
+        [{
+            'stationTriplet': '0:XX:SNTL',
+            'beginDate': '2000-10-01 00:00:00',
+            'endDate': '2100-01-01 00:00:00'
+        }]
+    )
+
+def get_gen_args(this_dir, configs, cache_dir, export_path, manifest_dir):
+    return [
+        sys.executable, path.join(this_dir, 'stf_gen.py'), '--offline',
+        '-c', *configs,
+        '--cache-dir', cache_dir,
+        '-e', export_path,
+        '--manifest-dir', manifest_dir
+    ]
+
+def get_expected(this_dir, configs, export_path):
+    from stf_gen import get_config_path, get_chart_jobs
+    huc_dicts = []
+    for config in configs:
+        with open(get_config_path(config, this_dir), 'r') as j:
+            huc_dicts.append(json.load(j))
+    with redirect_stdout(StringIO()):
+        chart_jobs = get_chart_jobs(huc_dicts, [export_path] * len(huc_dicts))
+    return set(chart_jobs.keys())
+
+def check_shards(this_dir, num_shards, configs, work_dir):
+    export_path = path.join(work_dir, 'charts')
+    manifest_dir = path.join(work_dir, 'shards')
+    makedirs(export_path, exist_ok=True)
+    bt = time.time()
+    procs = []
+    for shard_index in range(1, num_shards + 1):
+        cache_dir = path.join(work_dir, f'node_{shard_index}')
+        seed_data_store(cache_dir)
+        procs.append(subprocess.Popen(
+            get_gen_args(
+                this_dir, configs, cache_dir, export_path, manifest_dir
+            ) + ['--shard', f'{shard_index}/{num_shards}'],
+            cwd=work_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True
+        ))
+    errors = []
+    for shard_index, proc in enumerate(procs, 1):
+        out = proc.communicate()[0]
+        if not proc.returncode == 0:
+            errors.append(f'shard {shard_index} exited with {proc.returncode}')
+            print(out)
+    print(
+        f'Ran {num_shards} shard processes in {round(time.time()-bt,2)} '
+        f'seconds.'
+    )
+    cache_dir = path.join(work_dir, 'merge')
+    seed_data_store(cache_dir)
+    merge = subprocess.run(
+        get_gen_args(this_dir, configs, cache_dir, export_path, manifest_dir) +
+        ['--merge'],
+        cwd=work_dir,
+        capture_output=True,
+        text=True
+    )
+    if not merge.returncode == 0:
+        last_line = (merge.stderr.strip().splitlines() or [''])[-1]
+        print(f'  merge exited with {merge.returncode} - {last_line}')
+    merged_path = path.join(manifest_dir, 'manifest.json')
+    if not path.exists(merged_path):
+        return errors + ['no merged manifest written']
+    with open(merged_path, 'r') as j:
+        merged = json.load(j)
+
+    expected = get_expected(this_dir, configs, export_path)
+    assigned = set()
+    overlaps = set()
+    for shard_index in range(1, num_shards + 1):
+        shard_path = path.join(
+            manifest_dir, f'shard_{shard_index}_of_{num_shards}.json'
+        )
+        if not path.exists(shard_path):
+            errors.append(f'shard {shard_index} wrote no manifest')
+            continue
+        with open(shard_path, 'r') as j:
+            shard_assigned = set(json.load(j)['assigned'])
+        print(f'  shard {shard_index}: {len(shard_assigned)} forecast points')
+        overlaps.update(assigned & shard_assigned)
+        assigned.update(shard_assigned)
+    print(
+        f'  merge: {len(merged["charts"])} charts, {len(merged["failed"])} '
+        f'failed, {len(merged["gaps"])} gaps, {len(merged["overlaps"])} '
+        f'overlaps'
+    )
+    if merged['gaps'] or merged['overlaps']:
+        errors.append('merge reported gaps or overlaps')
+    if overlaps:
+        errors.append(f'{len(overlaps)} forecast points in more than one shard')
+    if not assigned == expected:
+        errors.append(
+            f'{len(expected - assigned)} forecast points in no shard, '
+            f'{len(assigned - expected)} unexpected'
+        )
+    return errors
+
+if __name__ == '__main__':
+
+    import argparse
+
+    cli_desc = 'Checks sharded chart runs cover every forecast point exactly once'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-n", "--num-shards", help="Number of shard processes to run, defaults to 4", default=4, type=int)
+    parser.add_argument("-c", "--config", help="Config file(s) to shard, defaults to all_hucs.json", nargs='+', default=['all_hucs.json'])
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_shard_check.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as work_dir:
+        errors = check_shards(this_dir, args.num_shards, args.config, work_dir)
+    if errors:
+        print('Shard check FAILED:\n' + '\n'.join([f'  {i}' for i in errors]))
+        sys.exit(1)
+    print('Shard check ok, every forecast point was assigned to exactly one shard.')
@@ -15,6 +15,8 @@ from stf_utils import add_optional_tilesets, add_huc_layer
 from stf_utils import clean_coords, add_huc_chropleth, get_colormap
 from stf_utils import get_bor_seal, get_favicon, get_icon_color
 from stf_utils import get_default_js, get_default_css
+from stf_utils import join_huc_stats
+from stf_huc_geom import load_huc_topo, copy_huc_topo
 
 pd.options.mode.chained_assignment = None
 
@@ -192,7 +194,13 @@ def get_legend(obj_types=[], data_sources=[]):
   '''
     return legend_dd
 
-def create_map(meta, data_dir, huc_dict):
+def create_map(meta, data_dir, huc_dict, huc_layers=True, huc_stats=None,
+               gis_path=None):
+    """
+    HUC layers use one simplified TopoJSON band per level from gis_path, the
+    band for that level's display zoom. Bands are not switched on zoom, so
+    zooming in past it shows the same simplified edges.
+    """
     meta = meta.drop_duplicates(subset='stationTriplet')
     meta['latitude'] = clean_coords(meta['latitude'])
     meta['longitude'] = clean_coords(
@@ -209,20 +217,54 @@ def create_map(meta, data_dir, huc_dict):
         sitetype_map.fit_bounds(bounds)
         add_markers(sitetype_map, meta.copy(), huc_dict, data_dir)
         
-        # for huc_level in ['2', '4', '6', '8']:
-        #     show_layer = True if huc_level == '2' else False
-        #     add_huc_layer(
-        #         sitetype_map, 
-        #         level=huc_level, 
-        #         show=show_layer
-        #     )
-            # for data_type in ['swe', 'prec']:
-            #     add_huc_chropleth(
-            #         sitetype_map, 
-            #         data_type=data_type, 
-            #         show=False, 
-            #         huc_level=huc_level
-            #     )
+        huc_layers_added = False
+        for huc_level in ['2', '4', '6', '8']:
+            huc_topo = load_huc_topo(gis_path, huc_level)
+            if not huc_layers and not huc_topo:
+                continue
+            huc_layers_added = True
+            show_layer = True if huc_level == '2' else False
+            add_huc_layer(
+                sitetype_map, 
+                level=huc_level, 
+                show=show_layer,
+                topo_json=huc_topo
+            )
+            level_stats = (huc_stats or {}).get(huc_level, {})
+            data_types = ['swe', 'prec']
+            if huc_stats is not None:
+                data_types = list(level_stats.keys())
+            for data_type in data_types:
+                try:
+                    topo_json = None
+                    if data_type in level_stats and huc_topo:
+                        topo_json = copy_huc_topo(huc_topo)
+                        join_huc_stats(
+                            topo_json['objects'][f'HUC{huc_level}']['geometries'], 
+                            level_stats[data_type], 
+                            huc_level
+                        )
+                    elif data_type in level_stats:
+                        print(
+                            f'No simplified HUC {huc_level} geometry in '
+                            f'{gis_path}, skipping {data_type} layer, run '
+                            f'stf_huc_geom.py to build it.'
+                        )
+                        continue
+                    elif not huc_layers:
+                        continue
+                    add_huc_chropleth(
+                        sitetype_map, 
+                        data_type=data_type, 
+                        show=False, 
+                        huc_level=huc_level,
+                        topo_json=topo_json
+                    )
+                except Exception as err:
+                    print(
+                        f'Could not add HUC {huc_level} {data_type} '
+                        f'layer to map! - {err}'
+                    )
         add_optional_tilesets(sitetype_map)
         folium.LayerControl('topleft').add_to(sitetype_map)
         FloatImage(
@@ -230,7 +272,8 @@ def create_map(meta, data_dir, huc_dict):
             bottom=1,
             left=1
         ).add_to(sitetype_map)
-        # get_colormap().add_to(sitetype_map)
+        if huc_layers_added:
+            get_colormap().add_to(sitetype_map)
         # MousePosition(prefix="Location: ").add_to(sitetype_map)
         legend = folium.Element(get_legend())
         sitetype_map.get_root().html.add_child(legend)
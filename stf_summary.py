@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:05:26 2026
+
+Cross-basin current conditions for every charted forecast point: current
+basin SWE and Q, percent of median and percentile rank against the period of
+record, computed from the climatology cache in one batched array pass and
+written as a sortable summary.html plus summary.json next to nav.html.
+"""
+
+import json
+import datetime
+import warnings
+from os import path
+from pathlib import Path
+import numpy as np
+from stf_cache import ClimoCache
+from stf_utils import nonLeapDaysBetween, get_color_lookup
+from stf_nav import BOR_FLAVICON, BOOTSTRAP_CSS, get_updt_str
+
+NUM_DAYS = 366
+MIN_YEARS = 10
+MAX_LAG_DAYS = 3
+ELEMENTS = ['swe', 'q']
+SUMMARY_FIELDS = [
+    'name', 'triplet', 'huc', 'path', 'sites', 'years',
+    'swe', 'swe_median', 'swe_pct', 'swe_rank',
+    'q', 'q_median', 'q_pct', 'q_rank'
+]
+
+def get_curr_day(updated, water_year):
+    s_day = datetime.date(int(water_year) - 1, 10, 1)
+    e_day = datetime.date.fromisoformat(updated[:10])
+    return min((e_day - s_day).days + nonLeapDaysBetween(s_day, e_day), 365)
+
+def get_day_index(curr_values, curr_days, max_lag=MAX_LAG_DAYS):
+    window_idx = np.clip(
+        curr_days[:, None] - np.arange(max_lag, -1, -1), 0, NUM_DAYS - 1
+    )
+    window = np.take_along_axis(curr_values, window_idx, axis=1)
+    has_value = ~np.isnan(window)
+    last_valid = window.shape[1] - 1 - np.argmax(has_value[:, ::-1], axis=1)
+    day_idx = window_idx[np.arange(len(curr_values)), last_valid]
+    current = curr_values[np.arange(len(curr_values)), day_idx]
+    current[~has_value.any(axis=1)] = np.nan
+    return day_idx, current
+
+def get_summary_stats(current, por_values, min_years=MIN_YEARS):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(por_values, axis=1)
+        num_years = np.sum(~np.isnan(por_values), axis=1)
+        below = np.sum(por_values < current[:, None], axis=1)
+        equal = np.sum(por_values == current[:, None], axis=1)
+        rank = 100 * (below + 0.5 * equal) / num_years
+        percent = 100 * current / median
+    no_stats = np.isnan(current) | (num_years < min_years)
+    median[num_years < min_years] = np.nan
+    rank[no_stats] = np.nan
+    percent[no_stats | ~(median > 0)] = np.nan
+    return {
+        'median': median, 'percent': percent, 'rank': rank,
+        'years': num_years
+    }
+
+def load_summary_inputs(climo_cache, frcst_triplets):
+    points = []
+    curr_values = {i: [] for i in ELEMENTS}
+    for frcst_triplet in frcst_triplets:
+        current = climo_cache.get_current(frcst_triplet)
+        if not current:
+            continue
+        points.append((frcst_triplet, current))
+        for element in ELEMENTS:
+            values = np.full(NUM_DAYS, np.nan, dtype=np.float32)
+            element_values = np.array(current[element][:NUM_DAYS], dtype=float)
+            values[:len(element_values)] = element_values
+            curr_values[element].append(values)
+    curr_values = {
+        k: np.array(v, dtype=np.float32).reshape(-1, NUM_DAYS)
+        for k, v in curr_values.items()
+    }
+    return points, curr_values
+
+def get_por_values(climo_cache, points, day_idx):
+    por_values = {i: [] for i in ELEMENTS}
+    for i, (frcst_triplet, current) in enumerate(points):
+        climo = climo_cache.get_latest(frcst_triplet) or {}
+        for element in ELEMENTS:
+            years = climo.get(f'{element}_years') or {}
+            por_values[element].append([
+                v[day_idx[element][i]] if len(v) > day_idx[element][i]
+                else None for k, v in years.items()
+                if int(k) < current['water_year']
+            ])
+    num_years = max(
+        [len(i) for v in por_values.values() for i in v] or [0]
+    )
+    por_arrays = {}
+    for element, values in por_values.items():
+        por_array = np.full((len(points), num_years), np.nan, dtype=np.float32)
+        for i, point_values in enumerate(values):
+            por_array[i, :len(point_values)] = np.array(
+                point_values, dtype=float
+            )
+        por_arrays[element] = por_array
+    return por_arrays
+
+def get_chart_path(frcst, huc_dict, export_path):
+    huc = str(frcst.get('huc', ''))
+    folder = next((v for k, v in huc_dict.items() if huc.startswith(k)), None)
+    if not folder:
+        return None
+    chart_path = Path(folder, f'{frcst["name"]}.html')
+    if not Path(export_path, chart_path).exists():
+        return ''
+    return Path('.', chart_path).as_posix()
+
+def get_summary(cache_dir, frcsts, huc_dict, export_path):
+    climo_cache = ClimoCache(path.join(cache_dir, 'climo'))
+    frcsts = {i['stationTriplet']: i for i in frcsts}
+    chart_paths = {
+        k: get_chart_path(v, huc_dict, export_path) for k, v in frcsts.items()
+    }
+    frcst_triplets = [k for k, v in chart_paths.items() if v is not None]
+    points, curr_values = load_summary_inputs(climo_cache, frcst_triplets)
+    if not points:
+        return None
+    curr_days = np.array(
+        [get_curr_day(i['updated'], i['water_year']) for _, i in points]
+    )
+    day_idx = {}
+    current = {}
+    for element in ELEMENTS:
+        day_idx[element], current[element] = get_day_index(
+            curr_values[element], curr_days
+        )
+    por_values = get_por_values(climo_cache, points, day_idx)
+    stats = get_summary_stats(
+        np.concatenate([current[i] for i in ELEMENTS]),
+        np.vstack([por_values[i] for i in ELEMENTS])
+    )
+    num_points = len(points)
+    columns = {'years': stats['years'][:num_points]}
+    for i, element in enumerate(ELEMENTS):
+        idx = slice(i * num_points, (i + 1) * num_points)
+        decimals = 1 if element == 'swe' else 0
+        columns[element] = np.round(current[element].astype(float), decimals)
+        columns[f'{element}_median'] = np.round(
+            stats['median'][idx].astype(float), decimals
+        )
+        columns[f'{element}_pct'] = np.round(stats['percent'][idx])
+        columns[f'{element}_rank'] = np.round(stats['rank'][idx])
+    rows = []
+    for i, (frcst_triplet, curr) in enumerate(points):
+        frcst = frcsts[frcst_triplet]
+        row = {
+            'name': frcst['name'],
+            'triplet': frcst_triplet,
+            'huc': str(frcst.get('huc', ''))[:8],
+            'path': chart_paths[frcst_triplet],
+            'sites': curr['sites'],
+        }
+        for field in SUMMARY_FIELDS[5:]:
+            value = columns[field][i].item()
+            row[field] = None if value != value else value
+        rows.append([row[i] for i in SUMMARY_FIELDS])
+    return {
+        'updated': max([i['updated'] for _, i in points])[:10],
+        'fields': SUMMARY_FIELDS,
+        'rows': rows
+    }
+
+SUMMARY_HEADER_STR = f'''
+<!DOCTYPE html>
+<html>
+    <head>
+          <meta name="viewport" content="width=device-width, initial-scale=1">
+          <link rel="icon" href="{BOR_FLAVICON}">
+          <link rel="stylesheet" href="{BOOTSTRAP_CSS}">''' + '''
+    <style>
+        th { cursor: pointer; white-space: nowrap; }
+        td.num, th.num { text-align: right; }
+    </style>
+    </head>
+<body>
+<div class="container-fluid">
+'''
+
+SUMMARY_FOOTER_STR = '''
+<table class="table table-sm table-hover mt-3">
+  <thead class="thead-light">
+    <tr>
+      <th data-field="name">Forecast Point</th>
+      <th data-field="huc">HUC8</th>
+      <th data-field="sites" class="num">Snotels</th>
+      <th data-field="swe" class="num">SWE (in.)</th>
+      <th data-field="swe_median" class="num">Median SWE</th>
+      <th data-field="swe_pct" class="num">SWE % Median</th>
+      <th data-field="swe_rank" class="num">SWE Rank</th>
+      <th data-field="q" class="num">Q (cfs)</th>
+      <th data-field="q_median" class="num">Median Q</th>
+      <th data-field="q_pct" class="num">Q % Median</th>
+      <th data-field="q_rank" class="num">Q Rank</th>
+    </tr>
+  </thead>
+  <tbody id="summary-rows"></tbody>
+</table>
+</div>
+<script>
+var SUMMARY = SUMMARY_DATA;
+var COLORS = SUMMARY_COLORS;
+var sortField = 'swe_pct';
+var sortDesc = false;
+
+function summaryEntry(row) {
+  var entry = {};
+  for (var i = 0; i < SUMMARY.fields.length; i++) {
+    entry[SUMMARY.fields[i]] = row[i];
+  }
+  return entry;
+}
+
+function pctColor(pct) {
+  if (pct === null) { return ''; }
+  var idx = Math.round(Math.min(Math.max(pct, 50), 150)) - 50;
+  return ' style="background-color: ' + COLORS[idx] + '"';
+}
+
+function fmt(value) {
+  return value === null ? '' : value.toLocaleString();
+}
+
+function renderSummary() {
+  var entries = SUMMARY.rows.map(summaryEntry);
+  entries.sort(function(a, b) {
+    var x = a[sortField];
+    var y = b[sortField];
+    if (x === y) { return 0; }
+    if (x === null) { return 1; }
+    if (y === null) { return -1; }
+    return (x < y ? -1 : 1) * (sortDesc ? -1 : 1);
+  });
+  var html = entries.map(function(e) {
+    var name = e.path ? '<a href="' + encodeURI(e.path) + '">' + e.name + '</a>' : e.name;
+    return '<tr><td>' + name + '</td><td>' + e.huc + '</td>' +
+      '<td class="num">' + fmt(e.sites) + '</td>' +
+      '<td class="num">' + fmt(e.swe) + '</td>' +
+      '<td class="num">' + fmt(e.swe_median) + '</td>' +
+      '<td class="num"' + pctColor(e.swe_pct) + '>' + fmt(e.swe_pct) + '</td>' +
+      '<td class="num">' + fmt(e.swe_rank) + '</td>' +
+      '<td class="num">' + fmt(e.q) + '</td>' +
+      '<td class="num">' + fmt(e.q_median) + '</td>' +
+      '<td class="num"' + pctColor(e.q_pct) + '>' + fmt(e.q_pct) + '</td>' +
+      '<td class="num">' + fmt(e.q_rank) + '</td></tr>';
+  });
+  document.getElementById('summary-rows').innerHTML = html.join('');
+}
+
+var headers = document.querySelectorAll('th[data-field]');
+for (var i = 0; i < headers.length; i++) {
+  headers[i].addEventListener('click', function() {
+    var field = this.getAttribute('data-field');
+    sortDesc = field === sortField ? !sortDesc : false;
+    sortField = field;
+    renderSummary();
+  });
+}
+renderSummary();
+</script>
+
+</body>
+</html>
+'''
+
+def get_summary_html(summary):
+    nl = '\n'
+    colors = list(get_color_lookup())
+    header_str = (
+        f'{SUMMARY_HEADER_STR}'
+        f'    <h2>Snow to Flow Current Conditions</h2><h6>{get_updt_str()}</h6>{nl}'
+        f'    <p>Current basin SWE and Q for {len(summary["rows"])} forecast '
+        f'points as of {summary["updated"]}, as percent of the period of '
+        f'record median and percentile rank (0 = lowest, 100 = highest) for '
+        f'the same day of the water year. Click a column to sort.</p>{nl}'
+        f'    <a class="btn btn-outline-info btn-md" href="./nav.html">'
+        f'Snow to Flow Navigator</a>{nl}'
+        f'    <a class="btn btn-outline-info btn-md" target="_blank" '
+        f'href="./site_map.html">Map Based Navigation</a>{nl}'
+    )
+    footer_str = SUMMARY_FOOTER_STR.replace(
+        'SUMMARY_DATA', json.dumps(summary, separators=(',', ':'))
+    ).replace('SUMMARY_COLORS', json.dumps(colors))
+    return f'{header_str}{footer_str}'
+
+def create_summary(export_path, huc_dict, frcsts, cache_dir,
+                   summary_filename='summary.html'):
+    try:
+        summary = get_summary(cache_dir, frcsts, huc_dict, export_path)
+        if not summary:
+            return f'\nNo basin statistics found in {cache_dir}, summary not created.'
+        with open(Path(export_path, 'summary.json'), 'w') as j:
+            json.dump(summary, j, separators=(',', ':'))
+        with open(Path(export_path, summary_filename), 'w') as html_file:
+            html_file.write(get_summary_html(summary))
+        return (
+            f'\nCurrent conditions summary created for '
+            f'{len(summary["rows"])} forecast points in {export_path}\n'
+        )
+
+    except Exception as err:
+        return f'\nFailed to create current conditions summary in {export_path} - {err}'
+
+if __name__ == '__main__':
+
+    import sys
+    import argparse
+    from stf_gen import get_frcsts, get_config_path, get_export_paths
+
+    cli_desc = 'Creates summary.html/summary.json of current conditions for all charts from the data store'
+    parser = argparse.ArgumentParser(description=cli_desc)
+    parser.add_argument("-V", "--version", help="show program version", action="store_true")
+    parser.add_argument("-e", "--export", help="Export path the charts were created in, defaults to charts")
+    parser.add_argument("-c", "--config", help="Provide path(s) or name(s) of config file(s) in config folder. Defaults to all_hucs.json", nargs='+')
+    parser.add_argument("--cache-dir", help="Data store folder with cached climatology, defaults to data_store")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print('stf_summary.py v1.0')
+    this_dir = path.dirname(path.abspath(__file__))
+    cache_dir = args.cache_dir or path.join(this_dir, 'data_store')
+    config_paths = []
+    for config in args.config or ['all_hucs.json']:
+        config_path = get_config_path(config, this_dir)
+        if not config_path:
+            print(f'Invalid config path/file - {config}')
+            sys.exit(0)
+        config_paths.append(config_path)
+    export_paths = get_export_paths(
+        config_paths, args.export or path.join(this_dir, 'charts')
+    )
+    frcsts = get_frcsts(huc='all')
+    for config_path, export_path in zip(config_paths, export_paths):
+        with open(config_path, 'r') as config:
+            huc_dict = json.load(config)
+        print(create_summary(export_path, huc_dict, frcsts, cache_dir))
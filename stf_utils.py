@@ -9,33 +9,42 @@ import os
 import csv
 import json
 import math
+import base64
 import calendar as cal
 from os import path
+from bisect import bisect_left
+from functools import lru_cache
 from datetime import datetime as dt
-import pandas as pd
-import numpy as np
-import folium
-import branca
-from zeep import Client
-from zeep.transports import Transport
-from zeep.cache import InMemoryCache
-
-STATIC_URL = 'https://www.usbr.gov/uc/water/hydrodata/assets'
+from stf_core import STATIC_URL, AWDB_HOST, get_awdb_wsdl, get_huc_geojson_url
+from stf_core import parse_awdb_date, isActive, index_by_triplet, ordinal
+from stf_core import get_plotly_js, get_favicon, get_bootstrap, get_bor_seal
+from stf_core import get_default_js, get_default_css, get_plot_config
+from stf_core import get_obj_type_name, get_icon_color, get_fa_icon
+from stf_core import get_log_scale_dd
+from stf_http import AWDB_TIMEOUT, REST_TIMEOUT, check_call
+from stf_http import get_awdb_transport
 
 this_dir = os.path.dirname(os.path.abspath(__file__))
 static_dir = os.path.join(os.path.dirname(this_dir), r'static')
 
 def create_awdb():
-    wsdl = r'https://wcc.sc.egov.usda.gov/awdbWebService/services?WSDL'
-    transport = Transport(timeout=300, cache=InMemoryCache())
-    awdb = Client(wsdl=wsdl, transport=transport).service
+    from zeep import Client
+    from zeep.cache import InMemoryCache
+    wsdl = get_awdb_wsdl()
+    breaker = check_call(AWDB_HOST)
+    transport = get_awdb_transport(
+        timeout=REST_TIMEOUT[1], 
+        operation_timeout=AWDB_TIMEOUT, 
+        cache=InMemoryCache()
+    )
+    try:
+        awdb = Client(wsdl=wsdl, transport=transport).service
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
     return awdb
 
-def isActive(x):
-    endDate = dt.strptime(x['endDate'], "%Y-%m-%d %H:%M:%S").date()
-    if endDate > dt.today().date():
-        return True
-    
 def isAbove(x,elev):
     if x['elevation'] >= elev:
         return True
@@ -50,13 +59,40 @@ def isYearsOld(x,yrs):
     if int(s[:4]) < c:
         return True
     
+class FrcstIndex:
+    def __init__(self, frcsts):
+        self.frcsts = sorted(frcsts, key=lambda x: str(x['huc']))
+        self.hucs = [str(x['huc']) for x in self.frcsts]
+        self.by_triplet = index_by_triplet(self.frcsts)
+        self.end_dates = {
+            x['stationTriplet']: parse_awdb_date(x['endDate']) 
+            for x in self.frcsts if x.get('endDate')
+        }
+        self.refresh()
+        
+    def refresh(self, today=None):
+        self.today = today or dt.today().date()
+        self.active_triplets = set(
+            k for k, v in self.end_dates.items() if v > self.today
+        )
+        
+    def get_active_triplets(self):
+        if not self.today == dt.today().date():
+            self.refresh()
+        return self.active_triplets
+        
+    def by_huc(self, huc='all'):
+        if huc == 'all':
+            return list(self.frcsts)
+        huc = str(huc)
+        s_idx = bisect_left(self.hucs, huc)
+        e_idx = bisect_left(self.hucs, huc + '\uffff', lo=s_idx)
+        return self.frcsts[s_idx:e_idx]
+
 def get_last_non_zero_index(d, default=366):
     rev = (len(d) - idx for idx, item in enumerate(reversed(d), 1) if item)
     return next(rev, default)
 
-def ordinal(n):
-    return "%d%s" % (n,"tsnrhtdd"[(math.floor(n//10)%10!=1)*(n%10<4)*n%10::4])
-
 def fillMissingData(x,daysBack):
     daysBack = -1*daysBack
     if math.isnan(sum(x[daysBack:])) or not x:
@@ -66,6 +102,7 @@ def fillMissingData(x,daysBack):
             daysBack = len(x)
         if math.isnan(x[-1]):
             x[-1] = [i for i in x if not math.isnan(i)][-1]
+        import pandas as pd
         y = x[daysBack:]
         x[:] = (x[:daysBack] + 
          pd.DataFrame(y).interpolate().values.ravel().tolist())
@@ -89,19 +126,18 @@ def padMissingData(x,_sDate,_eDate):
     if not x['endDate']:
         print(x)
         return None                            
-    eDateChkSite = dt.strptime(x['endDate'],"%Y-%m-%d %H:%M:%S").date()
-    eDateChkBasin = dt.strptime(_eDate,"%Y-%m-%d").date()
+    eDateChkSite = parse_awdb_date(x['endDate'])
+    eDateChkBasin = parse_awdb_date(_eDate, "%Y-%m-%d")
     if eDateChkBasin > eDateChkSite:
         eDiff = ((eDateChkBasin - eDateChkSite).days + 
                  nonLeapDaysBetween(eDateChkSite, eDateChkBasin))
-        x['values'] = list(x['values'] + [np.nan]*eDiff)
-    sDateChkSite = dt.strptime(
-            x['beginDate'],"%Y-%m-%d %H:%M:%S").date()
-    sDateChkBasin =dt.strptime(_sDate,"%Y-%m-%d").date()
+        x['values'] = list(x['values'] + [math.nan]*eDiff)
+    sDateChkSite = parse_awdb_date(x['beginDate'])
+    sDateChkBasin = parse_awdb_date(_sDate, "%Y-%m-%d")
     if sDateChkBasin < sDateChkSite:
         sDiff = ((sDateChkSite - sDateChkBasin).days + 
                  nonLeapDaysBetween(sDateChkBasin, sDateChkSite))
-        x['values'] = list([np.nan]*sDiff + x['values'])
+        x['values'] = list([math.nan]*sDiff + x['values'])
     if sDateChkBasin > sDateChkSite: 
         sDiff = ((sDateChkBasin - sDateChkSite).days + 
                  nonLeapDaysBetween(sDateChkSite,sDateChkBasin))
@@ -175,88 +211,8 @@ def getUpstreamUSGS(terms):
 #             i['upstreamForecast']]))
     return upstream_trips
 
-def get_plotly_js():
-    
-    return f'{STATIC_URL}/plotly.js'
-
-def get_favicon():
-    
-    return f'{STATIC_URL}/img/favicon.ico'
-
-def get_bootstrap():
-    
-    return {
-        'css': f'{STATIC_URL}/bootstrap/css/bootstrap.min.css',
-        'js': f'{STATIC_URL}/bootstrap/js/bootstrap.bundle.js',
-        'jquery': f'{STATIC_URL}/jquery.js',
-        'popper': f'{STATIC_URL}/popper.js',
-        'fa': f'{STATIC_URL}/font-awesome/css/font-awesome.min.css',
-    }
-
-def get_bor_seal(orient='default', grey=False):
-    
-    color = 'cmyk'
-    if grey:
-        color = 'grey'
-    seal_dict = {
-        'default': f'BofR-horiz-{color}.png',
-        'shield': 'BofR-shield-cmyk.png',
-        'vert': f'BofR-vert-{color}.png',
-        'horz': f'BofR-horiz-{color}.png'
-        }
-    return f'{STATIC_URL}/img/{seal_dict[orient]}'
-
-def get_default_js():
-    
-    bootstrap_dict = get_bootstrap()
-    return [
-        ('leaflet', 
-         f'{STATIC_URL}/leaflet/js/leaflet.js'),
-        ('jquery', 
-         bootstrap_dict['jquery']),
-        ('popper', 
-         bootstrap_dict['popper']),
-        ('bootstrap', 
-         bootstrap_dict['js']),
-        ('awesome_markers', 
-         f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome-markers.min.js'),
-    ]
-
-def get_default_css():
-    
-    bootstrap_dict = get_bootstrap()
-    return [
-        ('leaflet_css', 
-         f'{STATIC_URL}/leaflet/css/leaflet.css'),
-        ('bootstrap_css', 
-         bootstrap_dict['css']),
-        ('awesome_markers_font_css', 
-          bootstrap_dict['fa']),
-        ('awesome_markers_css', 
-        f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome-markers.css'),
-        ('awesome_rotate_css', 
-         f'{STATIC_URL}/leaflet-awesome-markers/leaflet.awesome.rotate.css'),
-    ]
-
-
-def get_plot_config(img_filename):
-    return {
-        'modeBarButtonsToRemove': [
-            'sendDataToCloud',
-            'lasso2d',
-            'select2d'
-        ],
-        'showAxisDragHandles': True,
-        'showAxisRangeEntryBoxes': True,
-        'displaylogo': False,
-        'toImageButtonOptions': {
-            'filename': img_filename,
-            'width': 1200,
-            'height': 700
-        }
-    }
-
 def add_optional_tilesets(folium_map):
+    import folium
     url_list = ['https://server.arcgisonline.com/ArcGIS/rest/services/World_Topo_Map/MapServer/tile/{z}/{y}/{x}', 
                 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Street_Map/MapServer/tile/{z}/{y}/{x}',
                 'https://server.arcgisonline.com/ArcGIS/rest/services/NatGeo_World_Map/MapServer/tile/{z}/{y}/{x}',
@@ -288,13 +244,14 @@ def add_optional_tilesets(folium_map):
         folium.TileLayer(tileset, name=name).add_to(folium_map)
 
 def add_huc_layer(huc_map, level=2, huc_geojson_path=None, embed=False, 
-                  show=True, huc_filter=''):
+                  show=True, huc_filter='', topo_json=None):
+    import folium
     try:
         if type(huc_filter) == int:
             huc_filter = str(huc_filter)
         weight = -0.25 * float(level) + 2.5
         if not huc_geojson_path:
-            huc_geojson_path = f'{STATIC_URL}/gis/HUC{level}.geojson'
+            huc_geojson_path = get_huc_geojson_url(level)
         else:
             embed = True
         if huc_filter:
@@ -306,6 +263,15 @@ def add_huc_layer(huc_map, level=2, huc_geojson_path=None, embed=False,
             huc_style = lambda x: {
                 'fillColor': '#ffffff00', 'color': '#1f1f1faa', 'weight': weight
             }
+        if topo_json:
+            folium.TopoJson(
+                topo_json,
+                f'objects.HUC{level}',
+                name=f'HUC {level}',
+                style_function=huc_style,
+                show=show
+            ).add_to(huc_map)
+            return
         folium.GeoJson(
             huc_geojson_path,
             name=f'HUC {level}',
@@ -317,6 +283,7 @@ def add_huc_layer(huc_map, level=2, huc_geojson_path=None, embed=False,
         print(f'Could not add HUC {level} layer to map! - {err}')
 
 def clean_coords(coord_series, force_neg=False):
+    import pandas as pd
     
     coord_series = coord_series.apply(
         pd.to_numeric, 
@@ -352,23 +319,43 @@ def clean_coords(coord_series, force_neg=False):
     return clean_series
 
 def add_huc_chropleth(m, data_type='swe', show=False, huc_level='6', 
-                      gis_path='gis', huc_filter='', use_topo=False):
+                      gis_path='gis', huc_filter='', use_topo=False, 
+                      geo_json=None, topo_json=None):
+    import folium
     
     huc_str = f'HUC{huc_level}'
     stat_type_dict = {'swe': 'Median', 'prec': 'Avg.'}
     stat_type = stat_type_dict.get(data_type, '')
     layer_name = f'{huc_str} % {stat_type} {data_type.upper()}'
-    if use_topo:
+    style_function = lambda x: style_chropleth(
+        x, data_type=data_type, huc_level=huc_level, huc_filter=huc_filter
+    )
+    if topo_json:
+        use_topo = True
+    elif use_topo:
         topo_json_path = path.join(gis_path, f'{huc_str}.topojson')
         with open(topo_json_path, 'r') as tj:
             topo_json = json.load(tj)
+    if use_topo:
         if huc_filter:
             topo_json = filter_topo_json(
                 topo_json, huc_level=huc_level, filter_str=huc_filter
             )
-    style_function = lambda x: style_chropleth(
-        x, data_type=data_type, huc_level=huc_level, huc_filter=huc_filter
-    )
+        bake_chropleth_styles(
+            topo_json['objects'][huc_str]['geometries'], 
+            data_type=data_type, 
+            huc_level=huc_level, 
+            huc_filter=huc_filter
+        )
+        style_function = get_baked_style
+    elif geo_json:
+        bake_chropleth_styles(
+            geo_json['features'], 
+            data_type=data_type, 
+            huc_level=huc_level, 
+            huc_filter=huc_filter
+        )
+        style_function = get_baked_style
     tooltip = folium.features.GeoJsonTooltip(
         ['Name', f'{data_type}_percent', f'{data_type}_updt'],
         aliases=['Basin Name:', f'{layer_name}:', 'Updated:']
@@ -389,11 +376,11 @@ def add_huc_chropleth(m, data_type='swe', show=False, huc_level='6',
             tooltip=tooltip
         ).add_to(m)
     else:
-        json_path = f'{STATIC_URL}/gis/HUC{huc_level}.geojson'
+        json_path = geo_json or get_huc_geojson_url(huc_level)
         folium.GeoJson(
             json_path,
             name=layer_name,
-            embed=False,
+            embed=bool(geo_json),
             overlay=True,
             control=True,
             smooth_factor=2.0,
@@ -403,44 +390,115 @@ def add_huc_chropleth(m, data_type='swe', show=False, huc_level='6',
         ).add_to(m)
 
 def style_chropleth(feature, data_type='swe', huc_level='2', huc_filter=''):
-    colormap = get_colormap()
     if type(huc_filter) == int:
         huc_filter = str(huc_filter)
     huc_level = str(huc_level)
     stat_value = feature['properties'].get(f'{data_type}_percent', 'N/A')
     huc_id = str(feature['properties'].get(f'HUC{huc_level}', 'N/A'))
-    if not stat_value == 'N/A':
+    try:
         stat_value = float(stat_value)
+    except (TypeError, ValueError):
+        stat_value = math.nan
     
+    if math.isnan(stat_value) or not huc_id.startswith(huc_filter):
+        return {'fillOpacity': 0, 'weight': 0, 'fillColor': '#00000000'}
     return {
-        'fillOpacity': 
-            0 if stat_value == 'N/A' or 
-            not huc_id.startswith(huc_filter) else 
-            0.75,
+        'fillOpacity': 0.75,
         'weight': 0,
-        'fillColor': 
-            '#00000000' if stat_value == 'N/A' or 
-            not huc_id.startswith(huc_filter) else 
-            colormap(stat_value)
+        'fillColor': get_chropleth_color(stat_value)
     }
 
+def bake_chropleth_styles(features, data_type='swe', huc_level='2', 
+                          huc_filter=''):
+    for feature in features:
+        feature['properties']['style'] = style_chropleth(
+            feature, 
+            data_type=data_type, 
+            huc_level=huc_level, 
+            huc_filter=huc_filter
+        )
+    return features
+
+def get_baked_style(feature):
+    return feature['properties']['style']
+
+@lru_cache(maxsize=None)
+def get_color_lookup(low=50, high=150):
+    colormap = get_colormap(low=low, high=high)
+    return tuple([colormap(i) for i in range(low, high + 1)])
+
+def get_chropleth_color(stat_value, low=50, high=150):
+    color_lookup = get_color_lookup(low=low, high=high)
+    return color_lookup[int(round(min(max(stat_value, low), high))) - low]
+
 def get_colormap(low=50, high=150):
+    import branca
     
+    step = (high - low) / 4
     colormap = branca.colormap.LinearColormap(
         colors=[
-            (255,51,51,150), 
-            (255,255,51,150), 
-            (51,255,51,150), 
-            (51,153,255,150), 
-            (153,51,255,150)
+            tuple([j / 255 for j in i]) for i in [
+                (255,51,51,150), 
+                (255,255,51,150), 
+                (51,255,51,150), 
+                (51,153,255,150), 
+                (153,51,255,150)
+            ]
         ], 
-        index=[50, 75, 100, 125, 150], 
-        vmin=50,
-        vmax=150
+        index=[low + i * step for i in range(0, 5)], 
+        vmin=low,
+        vmax=high
     )
     colormap.caption = '% of Average Precipitation or % Median Snow Water Equivalent'
     return colormap
 
+HUC_GEOJSON_MAX_AGE = 7 * 86400
+
+def get_huc_geo_json(huc_level, gis_path=None, cache_dir=None, 
+                     max_age=HUC_GEOJSON_MAX_AGE):
+    from requests.exceptions import RequestException
+    from stf_http import UpstreamUnavailable, cached_get
+    from stf_cache import SeriesCache, get_cache_key
+    huc_geojson_path = path.join(gis_path or '', f'HUC{huc_level}.geojson')
+    if gis_path and path.exists(huc_geojson_path):
+        with open(huc_geojson_path, 'r') as gj:
+            return json.load(gj)
+    cache = None
+    cache_key = get_cache_key('geojson', f'HUC{huc_level}')
+    if cache_dir:
+        cache = SeriesCache(cache_dir=cache_dir, max_age=max_age)
+        geo_json = cache.get(cache_key)
+        if geo_json:
+            return geo_json
+    try:
+        return cached_get(
+            get_huc_geojson_url(huc_level), 
+            cache_key, 
+            cache, 
+            is_valid=lambda x: bool(x.get('features')),
+            timeout=(10, 120)
+        )
+    except (UpstreamUnavailable, RequestException):
+        if not cache:
+            raise
+        geo_json = cache.get(cache_key, max_age=float('inf'))
+        if not geo_json:
+            raise
+        return geo_json
+
+def join_huc_stats(features, stats_table, huc_level):
+    huc_attr = f'HUC{huc_level}'
+    fields = stats_table['fields']
+    data_type = stats_table['data_type']
+    huc_values = stats_table['hucs']
+    for feature in features:
+        properties = feature['properties']
+        values = huc_values.get(str(properties.get(huc_attr, '')))
+        for idx, field in enumerate(fields):
+            properties[field] = values[idx] if values else 'N/A'
+        properties[f'{data_type}_updt'] = stats_table['updated']
+    return features
+
 def filter_geo_json(geo_json_path, huc_level=2, filter_str=''):
    
     filter_attr = f'HUC{huc_level}'
@@ -461,154 +519,13 @@ def filter_topo_json(topo_json, huc_level=2, filter_str=''):
     topo_json['geometries'] = geometries
     return topo_json
         
-def get_obj_type_name(obj_type='default'):
-    
-    obj_type_dict = {
-            'default': 'map-pin',
-            0: 'reservoir',
-            1: 'basin',
-            2: 'climate site (rain)',
-            3: 'confluence',
-            4: 'diversion',
-            5: 'hydro power plant',
-            6: 'reach',
-            7: 'reservoir',
-            8: 'climate site (snow)',
-            9: 'stream gage',
-            10: 'hydro plant unit',
-            11: 'canal',
-            12: 'acoustic velocity meter',
-            13: 'water quality site',
-            14: 'riverware data object',
-            300: 'bio eval. site',
-            305: 'agg. diversion site',
-            'SCAN': 'climate site (rain)',
-            'PRCP': 'climate site (rain)',
-            'BOR': 'reservoir',
-            'SNTL': 'climate site (snow)',
-            'SNOW': 'climate site (snow)',
-            'SNTLT': 'climate site (snow)',
-            'USGS': 'stream gage',
-            'MSNT': 'climate site (snow)',
-            'MPRC': 'climate site (rain)'
-        }
-    return obj_type_dict.get(obj_type, 'N/A')
-
-def get_icon_color(row, source='awdb'):
-    
-    if source.lower() == 'hdb':
-        obj_owner = 'BOR'
-        if not row.empty:
-            if row['site_metadata.scs_id']:
-                obj_owner = 'NRCS'
-            if row['site_metadata.usgs_id']:
-                obj_owner = 'USGS'
-    if source.lower() == 'awdb':
-        obj_owner = row
-    color_dict = {
-        'BOR': 'blue',
-        'NRCS': 'red',
-        'USGS': 'green',
-        'COOP': 'gray',
-        'SNOW': 'darkred',
-        'PRCP': 'lightred',
-        'SNTL': 'red',
-        'SNTLT': 'lightred',
-        'SCAN': 'lightred',
-        'MSNT': 'orange',
-        'MPRC': 'beige',
-        
+def get_typed_array(values, decimals=2):
+    import numpy as np
+    values = np.round(np.asarray(values, dtype=float), decimals)
+    return {
+        'dtype': 'f4',
+        'bdata': base64.b64encode(values.astype(np.float32).tobytes()).decode()
     }
-    icon_color = color_dict.get(obj_owner, 'black')
-    return icon_color
-
-def get_fa_icon(obj_type='default', source='hdb'):
-    
-    if source.lower() == 'hdb':
-        fa_dict = {
-            'default': 'map-pin',
-            0: 'tint',
-            1: 'sitemap',
-            2: 'umbrella',
-            3: 'arrow-down',
-            4: 'exchange',
-            5: 'plug',
-            6: 'arrows-v',
-            7: 'tint',
-            8: 'snowflake-o',
-            9: 'tachometer',
-            10: 'cogs',
-            11: 'arrows-h',
-            12: 'rss',
-            13: 'flask',
-            14: 'table',
-            300: 'info',
-            305: 'exchange'
-        }
-    if source.lower() == 'awdb':
-        fa_dict = {
-            'default': 'map-pin',
-            'SCAN': 'umbrella',
-            'PRCP': 'umbrella',
-            'BOR': 'tint',
-            'SNTL': 'snowflake-o',
-            'SNOW': 'snowflake-o',
-            'SNTLT': 'snowflake-o',
-            'USGS': 'tachometer',
-            'MSNT': 'snowflake-o',
-            'MPRC': 'umbrella'
-        }
-    fa_icon = fa_dict.get(obj_type, 'map-pin')
-    return fa_icon
-
-def get_log_scale_dd():
-    log_scale_dd = [
-        {
-            'active': 0,
-            'showactive': True,
-            'x': 1.1,
-            'y': -0.025,
-            'xanchor': 'left',
-            'yanchor': 'top',
-            'bgcolor': 'rgba(0,0,0,0)',
-            'type': 'buttons',
-            'direction': 'down',
-            'font': {
-                'size': 10
-            },
-            'buttons': [
-                {
-                    'label': 'Linear Scale',
-                    'method': 'relayout',
-                    'args': [
-                        'yaxis2', 
-                            {
-                                'type': 'linear', 'rangemode': 'nonnegative',
-                                'overlaying': 'y', 'side':'right', 
-                                'anchor':'free', 'position': 1,
-                                'title': 'Q (cfs)','tickformat': "f", 
-                                'tick0': 0
-                            }
-                    ]
-                },
-                {
-                    'label': 'Log Scale',
-                    'method': 'relayout',
-                    'args': [
-                        'yaxis2',
-                            {
-                                'type': 'log', 'rangemode': 'nonnegative',
-                                'overlaying': 'y', 'side':'right', 
-                                'anchor':'free', 'position': 1,
-                                'title': 'Q (cfs)','tickformat': "f", 
-                                'tick0': 1, 'dtick': 'D2'
-                            }
-                    ]
-                },
-            ]
-        }
-    ]
-    return log_scale_dd
 
 if __name__ == '__main__':
     import os